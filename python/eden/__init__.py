@@ -1,6 +1,8 @@
 from gym.envs.registration import register
 from eden.core import *
 from eden.five_env import FiveEden
+from eden.vec_env import EdenVecEnv, EdenThreadVecEnv
+from eden.reset_pool import ResetPool
 
 register(
     id='eden-v0',
@@ -0,0 +1,145 @@
+'''
+Binary action log.
+
+A log holds one episode: a fixed header (magic, version, seed, agent count,
+action width, config hash) followed by one float32 (n_agents, width) record
+per step, so it can be mapped straight back into a (steps, n_agents, width)
+array. Writers still open at interpreter exit are closed then, so the last
+partial chunk reaches the file.
+'''
+import atexit
+import os
+import queue
+import struct
+import threading
+import weakref
+import numpy as np
+from typing import Any, Dict, Tuple
+
+MAGIC = b'EDENACT\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIiII32s')
+
+_open_writers = weakref.WeakSet()
+
+
+def episode_path(path: str, episode: int) -> str:
+    '''
+    File of the episode-th episode (0 for the first) logged under path: path
+    formatted with episode if it holds an {episode} field, otherwise path
+    itself for the first episode and <root>.<episode><ext> for later ones.
+    '''
+    if '{episode}' in path:
+        return path.format(episode=episode)
+    if episode == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{episode}{ext}"
+
+
+class ActionLogWriter:
+    '''
+    Collects step actions into fixed size chunks on the caller's thread and
+    leaves the file writes to a background thread. At most `max_chunks`
+    chunks wait for the disk; beyond that write() blocks until one drains.
+    An error of the background thread is raised by the next write() or close().
+    '''
+    def __init__(
+            self,
+            path: str,
+            seed: int,
+            n_agents: int,
+            config_hash: bytes,
+            width: int = 3,
+            chunk_steps: int = 1024,
+            max_chunks: int = 16
+    ) -> None:
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, seed, n_agents, width, config_hash))
+        self._chunk = np.empty((chunk_steps, n_agents, width), dtype=np.float32)
+        self._fill = 0
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        _open_writers.add(self)
+
+    def write(self, actions) -> None:
+        self._raise_error()
+        self._chunk[self._fill] = actions
+        self._fill += 1
+        if self._fill == len(self._chunk):
+            self._flush()
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._file = None
+        _open_writers.discard(self)
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise IOError("ActionLogWriter: writing the action log failed") from error
+
+    def _flush(self) -> None:
+        if self._fill > 0:
+            self._queue.put(self._chunk[:self._fill].tobytes())
+            self._fill = 0
+
+    def _run(self) -> None:
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is not None:
+                # keep draining so that write() never blocks on a full queue
+                continue
+            try:
+                self._file.write(data)
+            except Exception as error:
+                self._error = error
+
+
+@atexit.register
+def _close_writers() -> None:
+    for writer in list(_open_writers):
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+def load_action_log(path: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    '''
+    Read a log written by ActionLogWriter.
+
+    [Return]
+        header: dict with seed, n_agents, width and config_hash
+        actions: read-only float32 array of shape (steps, n_agents, width),
+                 memory mapped from the file. A trailing partial record, e.g.
+                 from a crashed run, is ignored.
+    '''
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError(f"{path} is too short to be an action log")
+    magic, version, seed, n_agents, width, config_hash = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an action log")
+    if version != VERSION:
+        raise ValueError(f"{path} has action log version {version}, expected {VERSION}")
+    header = {'seed': seed, 'n_agents': n_agents, 'width': width, 'config_hash': config_hash}
+
+    record_bytes = n_agents * width * 4
+    steps = (os.path.getsize(path) - HEADER.size) // record_bytes if record_bytes > 0 else 0
+    if steps == 0:
+        return header, np.empty((0, n_agents, width), dtype=np.float32)
+    actions = np.memmap(path, dtype=np.float32, mode='r', offset=HEADER.size,
+                        shape=(steps, n_agents, width))
+    return header, actions
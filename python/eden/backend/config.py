@@ -1,10 +1,24 @@
 '''class BackendInfo'''
 #from _typeshed import ReadOnlyBuffer
 import csv
+import hashlib
 import os
 from typing import Dict, List
 
 
+def config_hash(config_dir='./config') -> bytes:
+    '''sha256 digest over the names and contents of the files in config_dir'''
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(config_dir)):
+        path = os.path.join(config_dir, name)
+        if not os.path.isfile(path):
+            continue
+        digest.update(name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
 class BackendConfig:
     def __init__(self, config_dir='./config'):
         self.action_list = [
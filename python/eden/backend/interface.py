@@ -1,23 +1,79 @@
 import os
 import numpy as np
-from typing import List
+from typing import List, Tuple
 
 import eden.backend.eden_py as cpp_game
 
+
+def _as_padded(data, lengths, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = np.frombuffer(lengths, dtype=np.int32)
+    return np.frombuffer(data, dtype=np.float32).reshape(len(lengths), width), lengths
+
+
 class Backend:
     def __init__(self, config_dir:str) -> None:
         """
+        Array contract shared by every backend: observe() and result() return a
+        zero padded float32 array of shape (n_agents, max_len) together with an
+        int32 vector holding the valid length of each row. A dead agent has
+        length 0. The arrays view a buffer reused by the next call, copy them
+        if they have to outlive it.
         """
         self._cppbackend = cpp_game.Env(config_dir)
 
     def update(self, actions) -> None:
-        if type(actions) is np.ndarray:
+        self._cppbackend.update(self._prepare_actions(actions))
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Run one tick and fetch everything a step needs in a single call.
+        Returns (observation, observation lengths, result, alive mask), laid
+        out as in observe() and result().
+        """
+        obs_data, obs_len, obs_width, res_data, res_len, res_width = \
+            self._cppbackend.step(self._prepare_actions(actions))
+        obs, lengths = _as_padded(obs_data, obs_len, obs_width)
+        result, _ = _as_padded(res_data, res_len, res_width)
+        return obs, lengths, result, lengths > 0
+
+    def step_n(self, actions, repeat: int, every_tick: bool = True
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Run the same actions for up to repeat ticks in a single call, stopping
+        after a tick in which an agent died or the done condition set with
+        set_done_condition() fired. Returns (observation, observation lengths,
+        result, ticks run) with a leading tick axis, e.g. observations are
+        (ticks, n_agents, max_len); without every_tick only the last tick is
+        fetched and the tick axis has length 1.
+        """
+        obs_data, obs_len, obs_width, res_data, res_len, res_width, ticks = \
+            self._cppbackend.step_n(self._prepare_actions(actions), repeat, every_tick)
+        obs, lengths = _as_padded(obs_data, obs_len, obs_width)
+        result, _ = _as_padded(res_data, res_len, res_width)
+        shape = (ticks if every_tick else 1, self.agent_count)
+        return obs.reshape(*shape, obs_width), lengths.reshape(shape), result.reshape(*shape, res_width), ticks
+
+    def set_done_condition(self, position: np.ndarray, attribute: np.ndarray,
+                           backpack: np.ndarray, equipment: np.ndarray) -> None:
+        """
+        Hand the tables of a DoneCondition to the native side for step_n.
+        """
+        self._cppbackend.set_done_condition(
+            *(np.ascontiguousarray(table, dtype=np.float32) for table in (position, attribute, backpack, equipment)))
+
+    @staticmethod
+    def _prepare_actions(actions):
+        """
+        Arrays are handed to the binding as a C contiguous float32 or int32
+        (N, 3) buffer and read there in place; lists of lists still work.
+        """
+        if isinstance(actions, np.ndarray):
             assert(len(actions.shape) == 2), "action dim should be 2"
-            actions = actions.astype(np.float32).tolist()
-        else:
-            assert(type(actions) is list), "action is neither numpy array nor list"
-        print(actions)
-        self._cppbackend.update(actions)
+            if actions.dtype != np.float32 and actions.dtype != np.int32:
+                actions = actions.astype(np.float32)
+            return np.ascontiguousarray(actions)
+        assert(type(actions) is list), "action is neither numpy array nor list"
+        return actions
 
     def reset(self, seed:int = 0) -> None:
         self._cppbackend.reset(seed)
@@ -25,11 +81,34 @@ class Backend:
     def run_script(self, script:str) -> str:
         return self._cppbackend.run_script(script)
 
-    def observe(self) -> List[List[float]]:
-        return self._cppbackend.observe()
+    def snapshot(self):
+        """
+        In-memory copy of the whole native world. Restoring it, into this or
+        any other Backend of the same config, continues from that tick.
+        """
+        return self._cppbackend.snapshot()
+
+    def restore(self, snapshot) -> None:
+        self._cppbackend.restore(snapshot)
 
-    def result(self) -> List[List[float]]:
-        return self._cppbackend.result()
+    def replay(self, actions: np.ndarray, chunk_steps: int = 4096) -> None:
+        """
+        Tick once per step of a (steps, n_agents, width) action array, chunk_steps
+        ticks per native call, without building an observation in between.
+        """
+        actions = np.asarray(actions)
+        assert(len(actions.shape) == 3), "replay action dim should be 3"
+        for start in range(0, len(actions), chunk_steps):
+            chunk = actions[start:start + chunk_steps]
+            if chunk.dtype != np.float32 and chunk.dtype != np.int32:
+                chunk = chunk.astype(np.float32)
+            self._cppbackend.replay(np.ascontiguousarray(chunk))
+
+    def observe(self) -> Tuple[np.ndarray, np.ndarray]:
+        return _as_padded(*self._cppbackend.observe())
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        return _as_padded(*self._cppbackend.result())
     
     def ui(self, agent_id: int) -> List[float]:
         return self._cppbackend.get_ui(agent_id)
@@ -39,7 +118,80 @@ class Backend:
         return self._cppbackend.agent_count()[0]
     
 
+class BatchBackend:
+    def __init__(self, config_dir:str, num_worlds:int, num_threads:int = 0) -> None:
+        """
+        num_worlds independent worlds of one config, stepped together by one
+        call into the native BatchEnv on its own pool of num_threads threads
+        (0: one per core). Arrays follow the Backend contract with a leading
+        world axis, e.g. observations are (num_worlds, n_agents, max_len).
+
+        By default the worlds do NOT tick in parallel: they run one after
+        another on the calling thread, as native Game calls are serialized
+        until set_concurrent_games(True) is called, see there.
+        """
+        self._cppbackend = cpp_game.BatchEnv(config_dir, num_worlds, num_threads)
+        self.num_worlds = num_worlds
+
+    def update(self, actions) -> None:
+        self._cppbackend.update(self._prepare_actions(actions))
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Tick every world once, actions being (num_worlds, n_agents, 3).
+        Returns (observation, observation lengths, result, alive mask).
+        """
+        obs_data, obs_len, obs_width, res_data, res_len, res_width = \
+            self._cppbackend.step(self._prepare_actions(actions))
+        obs, lengths = self._stack(obs_data, obs_len, obs_width)
+        result, _ = self._stack(res_data, res_len, res_width)
+        return obs, lengths, result, lengths > 0
+
+    def reset(self, world:int, seed:int = 0) -> None:
+        self._cppbackend.reset(world, seed)
+
+    def observe(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self._stack(*self._cppbackend.observe())
+
+    @property
+    def agent_count(self) -> int:
+        return self._cppbackend.agent_count()[0]
+
+    def _stack(self, data, lengths, width: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows, lengths = _as_padded(data, lengths, width)
+        # explicit agent count: with every agent dead the rows are 0 wide
+        shape = (self.num_worlds, len(lengths) // self.num_worlds)
+        return rows.reshape(*shape, width), lengths.reshape(shape)
+
+    @staticmethod
+    def _prepare_actions(actions):
+        if isinstance(actions, np.ndarray):
+            assert(len(actions.shape) == 3), "batch action dim should be 3"
+            if actions.dtype != np.float32 and actions.dtype != np.int32:
+                actions = actions.astype(np.float32)
+            return np.ascontiguousarray(actions)
+        assert(type(actions) is list), "action is neither numpy array nor list"
+        return actions
+
+
+def set_concurrent_games(enabled: bool) -> None:
+    """
+    Let native calls of distinct backends run at the same time, e.g. the
+    envs of an EdenThreadVecEnv or the worlds of a BatchBackend. Off by
+    default: it is only safe if the native Game keeps no global or static
+    state, which has not been verified. Set it before any thread starts
+    using a backend.
+    """
+    cpp_game.set_concurrent_games(enabled)
+
+
 def create(config_dir:str) -> Backend:
     if not os.path.exists(config_dir):
         raise FileNotFoundError(f"config directory {config_dir} not found.")
-    return Backend(config_dir=config_dir)
\ No newline at end of file
+    return Backend(config_dir=config_dir)
+
+
+def create_batch(config_dir:str, num_worlds:int, num_threads:int = 0) -> BatchBackend:
+    if not os.path.exists(config_dir):
+        raise FileNotFoundError(f"config directory {config_dir} not found.")
+    return BatchBackend(config_dir=config_dir, num_worlds=num_worlds, num_threads=num_threads)
@@ -0,0 +1,79 @@
+'''
+On-disk checkpoint of an Eden episode.
+
+The native Game cannot be serialized, but it is deterministic given its seed
+and actions. A checkpoint therefore holds the seed, every step action and
+run_script call of the episode, and the env's Python state (see
+Eden._save_fields). Loading resets the backend to the seed and replays the
+episode natively in a few large calls, then checks the replayed world
+against the saved observation.
+
+The file is a compressed npz: a JSON header (magic, version, config hash,
+seed, scripts and the scalar fields), the (steps, n_agents, width) float32
+actions, and one array per array field.
+'''
+import json
+import os
+import numpy as np
+from typing import Any, Dict, List, Tuple
+
+MAGIC = 'EDENCKPT'
+VERSION = 1
+_FIELD = 'field.'
+
+
+def save_checkpoint(
+        path: str,
+        config_hash: bytes,
+        seed: int,
+        actions: np.ndarray,
+        scripts: List[Tuple[int, str]],
+        fields: Dict[str, Any]
+) -> None:
+    '''
+    [Args]
+        path:        file to write; it is replaced only once complete, so a
+                     preempted save leaves the previous checkpoint intact
+        config_hash: eden.backend.config.config_hash of the env's config
+        seed:        seed of the episode's reset
+        actions:     (steps, n_agents, width) actions of every step since the reset
+        scripts:     (step, script) of every run_script call, step being the number
+                     of steps taken before it
+        fields:      Python state of the env, arrays or JSON values
+    '''
+    arrays = {_FIELD + name: value for name, value in fields.items() if isinstance(value, np.ndarray)}
+    header = {
+        'magic': MAGIC,
+        'version': VERSION,
+        'config_hash': config_hash.hex(),
+        'seed': int(seed),
+        'scripts': [[step, script] for step, script in scripts],
+        'fields': {name: value for name, value in fields.items() if not isinstance(value, np.ndarray)},
+    }
+    partial = path + '.partial'
+    with open(partial, 'wb') as f:
+        np.savez_compressed(f, header=np.array(json.dumps(header)),
+                            actions=np.asarray(actions, dtype=np.float32), **arrays)
+    os.replace(partial, path)
+
+
+def load_checkpoint(path: str) -> Tuple[Dict[str, Any], np.ndarray, Dict[str, Any]]:
+    '''
+    Read a file written by save_checkpoint.
+
+    [Return]
+        header:  dict with config_hash (bytes), seed and scripts as (step, script) tuples
+        actions: (steps, n_agents, width) float32 actions
+        fields:  the Python state of the env
+    '''
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data['header']))
+        assert header.get('magic') == MAGIC, f"{path} is not an Eden checkpoint"
+        assert header['version'] == VERSION, \
+            f"checkpoint version {header['version']} is not supported, expected {VERSION}"
+        actions = data['actions']
+        fields = dict(header.pop('fields'))
+        fields.update({name[len(_FIELD):]: data[name] for name in data.files if name.startswith(_FIELD)})
+    header['config_hash'] = bytes.fromhex(header['config_hash'])
+    header['scripts'] = [(step, script) for step, script in header['scripts']]
+    return header, actions, fields
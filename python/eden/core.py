@@ -5,22 +5,61 @@ import math
 import json
 import numpy as np
 import eden.backend.interface as game
-from eden.backend.config import BackendConfig
+from eden.action_log import ActionLogWriter, episode_path
+from eden.backend.config import BackendConfig, config_hash
+from eden.checkpoint import save_checkpoint, load_checkpoint
+from eden.done_condition import DoneCondition
+from eden.env_state import EnvState
+from eden.obs_layout import ObsLayout
+from eden.score_table import ScoreTable
+from eden.step_info import StepInfo
+from eden.vision import decode_landform, paste_diamond, window_origin, window_inside, minimap_cell, minimap_center
 from gym import spaces
 from collections import OrderedDict
 from typing import List, Optional, Tuple, Dict, Any
 
+# MatEden observation dtypes, see MatEden.__init__
+MAT_OBS_DTYPES = ('int8', 'int16', 'float16', 'float32')
+# Observation modes of MatEden and FiveEden: 'dense' encodes the whole map,
+# 'sparse' a table of the seen entities, see Eden._fill_entities
+OBS_MODES = ('dense', 'sparse')
+# Values per entity row in sparse mode: class id, x, y, mask
+ENTITY_STRIDE = 4
 
 class Eden(gym.Env):
     def __init__(
             self,
             config_dir='./config',
-            empty_info=False
+            empty_info=False,
+            action_log=None,
+            info_format='dict',
+            checkpointable=False,
+            max_obs_len=None
     ) -> None:
-
+        """
+        action_log: optional path. Every episode started by reset() records
+        its seed and step actions in its own file, see eden.action_log.episode_path:
+        the first episode in action_log itself, unless it holds an {episode} field.
+        info_format: 'dict' returns the info as a list of per-agent dicts,
+        'array' returns the eden.step_info.StepInfo columns, reused each step.
+        checkpointable: keep every step action of the episode in memory, which
+        save_checkpoint() needs. clone_state() does not copy them, so an env put
+        back by restore_state() can only be saved if the state was cloned right
+        after reset().
+        max_obs_len: width the observation buffers start at, by default the bound
+        from the agents' vision, see the max_obs_len property.
+        """
+        assert info_format in ['dict', 'array'], f"Eden: unknown info_format {info_format}"
         self._backend = game.create(config_dir)
         self._backend_cfg = BackendConfig(config_dir)
         self.empty_info = empty_info
+        self.info_format = info_format
+        self.config_hash = config_hash(config_dir)
+        self.action_log = action_log
+        self.checkpointable = checkpointable
+        self._action_writer = None
+        # episodes logged so far, numbering the action log files
+        self._logged_episodes = 0
 
         done_filepath = os.path.join(config_dir, "game_done.json")
         score_filepath = os.path.join(config_dir, 'score.json')
@@ -29,256 +68,509 @@ class Eden(gym.Env):
         self.done_condition = json.load(open(done_filepath, 'r'))
         self.reward_table   = json.load(open(score_filepath, 'r'))
 
-        self.total_step = 0
-        self.prev_obs = None
-        self.curr_obs = None
-        self.results = None
-
         self.map_size_x = int(self.backend_cfg.general_dict['MapSizeX'])
         self.map_size_y = int(self.backend_cfg.general_dict['MapSizeY'])
         self.synthesize_list = self.backend_cfg.synthesis_list
         self.backpack_size = int(list(self.backend_cfg.agent_dict.values())[0]['BackpackSize'])
         self.equipment_size = len(list(self.backend_cfg.agent_dict.values())[0]['Slot'].split(';'))
         self.attribute_name = list(list(self.backend_cfg.agent_dict.values())[0]['Attribute'].keys())
+        self._max_obs_len = max_obs_len
+
+        # Observations are rows padded to max_obs_len in two buffers swapped every step:
+        # curr_obs is written in place while prev_obs keeps the previous tick for deltas.
+        # Both grow when a longer row comes in. lengths holds the valid length of every
+        # row and alive = lengths > 0.
+        n_agents = self._backend.agent_count
+        self._obs_buffers = [np.zeros((n_agents, self.max_obs_len), dtype=np.float32) for _ in range(2)]
+        self._obs_widths = [0, 0]
+        self._obs_index = 0
+        self.total_step = 0
+        # eden.reset_pool.ResetPool handing out pre-generated worlds to reset()
+        self.reset_pool = None
+        # ticks run by the last step, see step(repeat=), the rows of each of them
+        # when there were several, who was alive before a fast forward and the
+        # tick of that step, for step_rewards
+        self.last_ticks = 0
+        self._tick_rows = None
+        self._start_alive = None
+        self._step_tick = -1
+        # seed, step actions (if checkpointable) and run_script calls of the episode,
+        # for save_checkpoint. The actions fill _history[:_history_len], which doubles when full
+        self._episode_seed = None
+        self._history = np.zeros((0, n_agents, 3), dtype=np.float32)
+        self._history_len = 0
+        self._scripts = []
+        # bumped by every step, reset and run_script; curr_obs and the layout are
+        # cached for the tick they were read at
+        self.tick = 0
+        self._obs_tick = -1
+        self._layout = None
+        self._layout_tick = -1
+        # landform does not change within an episode; decoded on first use after reset
+        self._landform = None
+        self._landform_layer_cache = None
+        self.curr_obs = self._obs_buffers[0]
+        self.prev_obs = None
+        self.lengths = np.zeros(n_agents, dtype=np.int32)
+        self.alive = np.zeros(n_agents, dtype=bool)
+        self.results = None
+        self.score_table = ScoreTable(self.reward_table, self.backend_cfg, self.map_size_x, self.map_size_y)
+        self.done_table = DoneCondition(self.done_condition, self.backend_cfg, self.map_size_x, self.map_size_y)
+        self._backend.set_done_condition(
+            self.done_table.position, self.done_table.attribute, self.done_table.backpack, self.done_table.equipment)
+        self.step_info = StepInfo(self.backend_cfg, self.score_table, self._backend.agent_count)
+        # eden.done_condition.DONE_* code of every agent after the last step
+        self.done_code = None
 
         # agent's observation_space and action_space variate in Eden env
         self.action_space = None
         self.observation_space = None
 
-    def step(self, action: np.ndarray) -> Tuple[np.ndarray, np.ndarray, bool, Dict[str, Any]]:
-        self.total_step += 1
-        self._backend.update(action)
-        self.prev_obs = self.curr_obs
-        self.curr_obs = np.array(self._backend.observe())
-        self.results = self._backend.result()
+    def step(
+            self,
+            action: np.ndarray,
+            repeat: int = 1,
+            fast_forward: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, bool, Dict[str, Any]]:
+        """
+        [Args]
+            action:       (n_agents, 3) actions
+            repeat:       run the actions for up to repeat ticks in one backend call. It stops
+                          after a tick in which an agent died or a game_done.json condition
+                          fired. The reward is summed over the ticks run and the info deltas
+                          span all of them; last_ticks holds how many ran.
+            fast_forward: when every live agent is Idle, skip fetching the observations between
+                          the ticks. The action and position rewards of the skipped ticks are
+                          then those of the last tick, the attribute reward that of the whole
+                          change. An agent that died on the last tick scores Idle at its start
+                          position for the ticks before, without their attribute change.
+        [Return]
+            (obs, reward, done, info). obs is (n_agents, longest row) and not a copy: it views
+            one of two buffers the env writes observations into in turn, so the step after next
+            overwrites it. Copy it to keep it longer. The same holds for reset() and for MatEden
+            and FiveEden.
+        """
+        assert repeat >= 1, f"repeat should be positive, got {repeat}"
+        self.tick += 1
+        self._step_tick = self.tick
+        self._tick_rows = None
+        if repeat == 1:
+            obs, lengths, results, _ = self._backend.step(action)
+            ticks = 1
+        else:
+            every_tick = not (fast_forward and self._all_idle(action))
+            if not every_tick:
+                self._start_alive = self.alive.copy()
+            obs, lengths, results, ticks = self._backend.step_n(action, repeat, every_tick)
+            if every_tick and ticks > 1:
+                # views of the backend's buffers, valid until the next backend call
+                self._tick_rows = (obs, lengths, results)
+            # the rows are padded to the longest of all ticks, keep those of the last
+            obs, lengths, results = obs[-1, :, :int(lengths[-1].max(initial=0))], lengths[-1], results[-1]
+        self.total_step += ticks
+        self.last_ticks = ticks
+        if self._action_writer is not None:
+            for _ in range(ticks):
+                self._action_writer.write(action)
+        if self.checkpointable:
+            self._record_actions(np.broadcast_to(np.asarray(action, dtype=np.float32),
+                                                 (ticks,) + self._history.shape[1:]))
+        self._load_obs(obs, lengths, swap=True)
+        self.results = results.copy()
         done = self._done()
         info = self._info(action)
-        reward = self._reward(info)
-        return self.curr_obs, reward, done, info
+        reward = self.step_rewards(self.score_table)
+        return self._raw_observation(), reward, done, info
+
+    def step_rewards(self, score_table: ScoreTable) -> np.ndarray:
+        """
+        Rewards of the last step under score_table, summed over the ticks it ran
+        as step() sums its own, e.g. for a wrapper scoring with another score.json.
+        Only valid right after step(), before anything else changes the world.
+        """
+        assert self._step_tick == self.tick, "Eden: step_rewards is only valid right after step"
+        if self._tick_rows is not None:
+            obs, lengths, results = self._tick_rows
+            prev = self.prev_obs[:, :obs.shape[2]]
+            reward = 0.0
+            for tick in range(len(obs)):
+                reward = reward + score_table.rewards(results[tick], obs[tick], prev, lengths[tick] > 0)
+                prev = obs[tick]
+            return reward
+        reward = score_table.rewards(self.results, self.curr_obs, self.prev_obs, self.alive)
+        if self.last_ticks > 1:
+            # fast forward: the skipped ticks score as the last one, without the attribute change,
+            # but an agent that died on the last tick was Idle where it stood before them
+            skipped = score_table.rewards(self.results, self.curr_obs, None, self.alive)
+            died = self._start_alive & ~self.alive
+            if np.any(died):
+                results = self.results.copy()
+                results[died, 0] = self.backend_cfg.action_list.index('Idle')
+                skipped[died] = score_table.rewards(results, self.prev_obs, None, died)[died]
+            reward = reward + skipped * (self.last_ticks - 1)
+        return reward
+
+    def _all_idle(self, action) -> bool:
+        action = np.asarray(action)
+        return bool(np.all(action[self.alive, 0] == self.backend_cfg.action_list.index('Idle')))
 
     def reset(self, seed: int = 0) -> np.ndarray:
-        self._backend.reset(seed)
-        self.total_step = 0
+        """
+        Start an episode on the world of seed. A world reset_pool has generated
+        for seed is restored instead of being generated again. The returned
+        observation is a buffer the env reuses two steps later, as in step().
+        """
+        state = self.reset_pool.take(seed) if self.reset_pool is not None else None
+        if state is not None:
+            self.restore_state(state)
+        else:
+            self._backend.reset(seed)
+            self.tick += 1
+            self._landform = None
+            self.total_step = 0
+            self._episode_seed = seed
+            self._history_len = 0
+            self._scripts = []
+            self._load_obs(*self._backend.observe(), swap=False)
+            self.prev_obs = None
+            self.results = None
+            self._observe_reset()
+        if self.action_log is not None:
+            self.close()
+            self._action_writer = ActionLogWriter(
+                episode_path(self.action_log, self._logged_episodes), seed,
+                self._backend.agent_count, self.config_hash)
+            self._logged_episodes += 1
+        if self.reset_pool is not None:
+            self.reset_pool.refill()
+        return self._observation()
+
+    def _observe_reset(self) -> None:
+        """Build the observations of a freshly generated world."""
+        pass
+
+    def replay(self, actions: np.ndarray) -> np.ndarray:
+        """
+        Tick through a (steps, n_agents, 3) action array, e.g. the actions of an
+        action log, in native calls via Backend.replay. No reward, done or info is
+        computed on the way; the observation after the last step is returned, as
+        reset() does. The actions are logged and kept as if they had been stepped.
+        """
+        actions = np.asarray(actions)
+        self._backend.replay(actions)
+        self.tick += 1
+        self.total_step += len(actions)
+        if self._action_writer is not None:
+            for action in actions:
+                self._action_writer.write(action)
+        if self.checkpointable:
+            self._record_actions(np.asarray(actions, dtype=np.float32))
+        self._load_obs(*self._backend.observe(), swap=False)
         self.prev_obs = None
-        self.curr_obs = np.array(self._backend.observe())
         self.results = None
-        return self.curr_obs
+        self._observe_reset()
+        return self._observation()
 
     def run_script(self, script: str) -> str:
+        self.tick += 1
+        self._landform = None
+        self._scripts.append((self._history_len, script))
         return self._backend.run_script(script)
 
-    def _reward(self, info):
-        rewards = []
-        for action_result in info:
-            # action
-            reward = self._action_reward(action_result)
-            # attribute
-            attr_icrem = action_result['attr_increment']
-            for key in attr_icrem.keys():
-                if key in self.reward_table['Attribute'].keys():
-                    reward += attr_icrem[key] * self.reward_table['Attribute'][key]
-                else:
-                    reward += attr_icrem[key] * self.reward_table['Attribute']['default']
-            # dead
-            if action_result['dead'] is True:
-                reward += self.reward_table['Dead']
-            # position
-            if action_result['position'] in self.reward_table['ScorePoint'].keys():
-                reward += self.reward_table['ScorePoint'][action_result['position']]
-            rewards.append(reward)
-        return rewards
-
-    def _action_reward(self, action_result):
-        reward = 0
-        if 'Idle' in action_result['action'] :
-            result = self.reward_table['Idle']
-            reward = result['default']
-        elif 'Attack' in action_result['action']:
-            result = self.reward_table['Attack']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default_' + action_result['result']]
-                else:
-                    reward = result[action_result['target']+'_'+action_result['result']]
-        elif 'Collect' in action_result['action']:
-            result = self.reward_table['Collect']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-        elif 'Discard' in action_result['action']:
-            result = self.reward_table['Discard']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-                reward *= float(action_result['result'])
-        elif 'Move' in action_result['action']:
-            result = self.reward_table['Move']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                reward = result['default']
-        elif 'Synthesize' in action_result['action']:
-            result = self.reward_table['Synthesize']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-                reward *= float(action_result['result'])
-        elif 'Pickup' in action_result['action']:
-            result = self.reward_table['Pickup']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-                reward *= float(action_result['result'])
-        elif 'Equip' in action_result['action']:
-            result = self.reward_table['Equip']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default_' + action_result['result']]
-                else:
-                    reward = result[action_result['target']+'_'+action_result['result']]
-        elif 'Consume' in action_result['action']:
-            result = self.reward_table['Consume']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-        return reward
+    def _record_actions(self, actions: np.ndarray) -> None:
+        """Append (steps, n_agents, 3) actions to the history, doubling its capacity when full."""
+        end = self._history_len + len(actions)
+        if end > len(self._history):
+            grown = np.zeros((max(end, 2 * len(self._history), 64),) + self._history.shape[1:], dtype=np.float32)
+            grown[:self._history_len] = self._history[:self._history_len]
+            self._history = grown
+        self._history[self._history_len:end] = actions
+        self._history_len = end
+
+    def close(self) -> None:
+        if self._action_writer is not None:
+            writer, self._action_writer = self._action_writer, None
+            writer.close()
+
+    def __del__(self):
+        # flush the last partial chunk of the action log
+        if getattr(self, '_action_writer', None) is not None:
+            self.close()
+
+    def clone_state(self) -> EnvState:
+        """
+        Snapshot the env, native world included, to come back to with restore_state().
+        Costs one copy of the world and of the env's observations, not a replay.
+        """
+        return EnvState(self._backend.snapshot(), self._save_fields(), self.config_hash)
+
+    def restore_state(self, state: EnvState) -> np.ndarray:
+        """
+        Put the env back at the tick of a clone_state() and return the observation there,
+        as reset() does. An action log ends here, as its episode can no longer be replayed,
+        and so does the history of a checkpointable env unless the state was cloned right
+        after reset(): states do not carry the actions, see save_checkpoint().
+        """
+        assert state.config_hash == self.config_hash, "Eden: state was cloned from an env of another config"
+        self.close()
+        self._backend.restore(state.world)
+        self.tick += 1
+        self._load_fields(state.fields)
+        return self._observation()
+
+    def save_checkpoint(self, path: str) -> None:
+        """
+        Write the episode so far to path, see eden.checkpoint. The native world is
+        stored as its seed plus the actions and scripts since reset(), which
+        load_checkpoint replays natively.
+        """
+        assert self.checkpointable, "Eden: save_checkpoint needs an env created with checkpointable=True"
+        assert self._episode_seed is not None, \
+            "Eden: save_checkpoint needs an episode started by reset() or load_checkpoint(), not restore_state()"
+        fields = self._save_fields()
+        del fields['seed']
+        save_checkpoint(path, self.config_hash, self._episode_seed, self._history[:self._history_len],
+                        self._scripts, fields)
+
+    def load_checkpoint(self, path: str) -> np.ndarray:
+        """
+        Continue the episode saved by save_checkpoint and return its observation, as
+        reset() does. Loading is a replay: the world is generated from the seed again
+        and ticked through every saved action, so it costs as many native ticks as the
+        episode ran. An action log ends here, as it does at restore_state().
+        """
+        header, actions, fields = load_checkpoint(path)
+        assert header['config_hash'] == self.config_hash, f"Eden: {path} was saved with another config"
+        self.close()
+        self._backend.reset(header['seed'])
+        replayed = 0
+        for step, script in header['scripts']:
+            self._backend.replay(actions[replayed:step])
+            self._backend.run_script(script)
+            replayed = step
+        self._backend.replay(actions[replayed:])
+        obs, lengths = self._backend.observe()
+        width = fields['curr_obs'].shape[1]
+        assert np.array_equal(lengths, fields['lengths']) and np.array_equal(obs[:, :width], fields['curr_obs']), \
+            f"Eden: replaying {path} did not reach the saved world"
+        fields['seed'] = header['seed']
+        self.tick += 1
+        self._load_fields(fields)
+        if self.checkpointable:
+            self._record_actions(actions)
+        self._scripts = list(header['scripts'])
+        return self._observation()
+
+    def _observation(self) -> np.ndarray:
+        """The observation reset() and step() return, of the current tick."""
+        return self._raw_observation()
+
+    def _raw_observation(self) -> np.ndarray:
+        """curr_obs up to the longest row."""
+        return self.curr_obs[:, :self._obs_widths[self._obs_index]]
+
+    def _save_fields(self) -> Dict[str, Any]:
+        """Copy of the Python state of the env, extended by subclasses with their own."""
+        self.obs  # observe again if the world changed outside step
+        index = self._obs_index
+        return {
+            'total_step': self.total_step,
+            'curr_obs': self.curr_obs[:, :self._obs_widths[index]].copy(),
+            'lengths': self.lengths.copy(),
+            'prev_obs': None if self.prev_obs is None else self.prev_obs[:, :self._obs_widths[1 - index]].copy(),
+            'results': None if self.results is None else self.results.copy(),
+            'done_code': None if self.done_code is None else self.done_code.copy(),
+            'landform': self._landform,
+            # the actions are not copied: only a state of a fresh episode can be saved after restoring it
+            'seed': self._episode_seed if self.total_step == 0 and not self._scripts else None,
+        }
+
+    def _load_fields(self, fields: Dict[str, Any]) -> None:
+        """Inverse of _save_fields, copying out of fields so they can be loaded again."""
+        self.total_step = fields['total_step']
+        self._obs_index = 1
+        self.prev_obs = None if fields['prev_obs'] is None else self._fill_buffer(0, fields['prev_obs'])
+        self._load_obs(fields['curr_obs'], fields['lengths'], swap=False)
+        self.results = None if fields['results'] is None else fields['results'].copy()
+        self.done_code = None if fields['done_code'] is None else fields['done_code'].copy()
+        self._landform = fields['landform']
+        self._landform_layer_cache = None
+        self._episode_seed = fields['seed']
+        self._history_len = 0
+        self._scripts = []
+
+    def _load_obs(self, obs: np.ndarray, lengths: np.ndarray, swap: bool) -> None:
+        """Copy a padded backend observation into the current buffer, after swapping buffers if asked."""
+        if swap:
+            self._obs_index = 1 - self._obs_index
+            self.prev_obs = self.curr_obs
+        self.curr_obs = self._fill_buffer(self._obs_index, obs)
+        self.lengths[:] = lengths
+        np.greater(self.lengths, 0, out=self.alive)
+        self._obs_tick = self.tick
+
+    def _fill_buffer(self, index: int, obs: np.ndarray) -> np.ndarray:
+        """Copy a padded observation into observation buffer index, zeroing what is left of an older one."""
+        width = obs.shape[1]
+        if width > self._obs_buffers[index].shape[1]:
+            self._grow_buffers(width)
+        buffer = self._obs_buffers[index]
+        buffer[:, :width] = obs
+        if self._obs_widths[index] > width:
+            buffer[:, width:self._obs_widths[index]] = 0
+        self._obs_widths[index] = width
+        return buffer
+
+    def _grow_buffers(self, width: int) -> None:
+        """Widen both observation buffers to width, keeping their rows and what refers to them."""
+        for index, buffer in enumerate(self._obs_buffers):
+            grown = np.zeros((buffer.shape[0], width), dtype=buffer.dtype)
+            grown[:, :self._obs_widths[index]] = buffer[:, :self._obs_widths[index]]
+            self._obs_buffers[index] = grown
+            if self.curr_obs is buffer:
+                self.curr_obs = grown
+            if self.prev_obs is buffer:
+                self.prev_obs = grown
+
+    def _reward(self) -> np.ndarray:
+        return self.score_table.rewards(self.results, self.curr_obs, self.prev_obs, self.alive)
 
     def _info(self, action):
         if self.empty_info:
             return []
-        info = []
-        for agent_id, result in enumerate(self.results):
-            if len(self.curr_obs[agent_id]) < 1:
-                info.append({
-                    'position': 'None',
-                    'action': 'None',
-                    'attr_increment': {},
-                    'dead': True
-                })
-                continue
-            # position
-            position = f"{int(self.curr_obs[agent_id][4])}-{int(self.curr_obs[agent_id][5])}"
-            # action
-            action_name = self._backend_cfg.action_list[int(result[0])]
-            # target
-            target = 'None'
-            if action_name == 'Move':
-                target = f"({int(action[agent_id][1])},{int(action[agent_id][2])})"
-            elif action_name != 'Idle':
-                type_name = self._backend_cfg.type_list[int(result[1])]
-                type_id = f"{type_name}:{int(result[2])}"
-                if type_id in self._backend_cfg.typeid2name.keys():
-                    target = self._backend_cfg.typeid2name[type_id]
-            # result
-            result_int = int(result[3])
-            result_str = 'fail'
-            if action_name == 'Attack':
-                if result_int == 1:
-                    result_str = 'hit'
-                elif result_int == 2:
-                    result_str = 'kill'
-            elif action_name == 'Equip':
-                if result_int == 1:
-                    result_str = 'equip'
-                elif result_int == 2:
-                    result_str = 'undress'
-            elif action_name in ['Pickup', 'Discard', 'Synthesize']:
-                if result_int > 0:
-                    result_str = str(result_int)
-            else:
-                if result_int > 0:
-                    result_str = 'success'
-            # attribute increment
-            name_int = int(result[4])
-            increment = {}
-            if self.prev_obs is not None:
-                for attribute_id in range(int(self.curr_obs[agent_id][6])):
-                    delta = self.curr_obs[agent_id][7 + attribute_id] - self.prev_obs[agent_id][7 + attribute_id]
-                    if abs(delta) > 1e-4:
-                        increment[self.backend_cfg.attribute_dict[name_int][attribute_id]] = delta
-            info.append({
-                'position': position,
-                'action': action_name,
-                'target': target,
-                'result': result_str,
-                'attr_increment': increment,
-                'dead': False
-            })
-        return info
-    
+        self.step_info.update(action, self.results, self.curr_obs, self.prev_obs, self.alive)
+        if self.info_format == 'array':
+            return self.step_info
+        return self.step_info.to_dicts()
+
     def _done(self) -> np.ndarray:
-        done = np.zeros((self._backend.agent_count), dtype=bool)
-        for agent_id, (obs, result) in enumerate(zip(self.curr_obs, self.results)):
-            if len(obs) < 1:
-                done[agent_id] = True
-                continue
-            # position
-            if list(obs[4:6]) in self.done_condition["position"]:
-                done[agent_id] = True
-                continue
-            # attribute
-            name_int = result[4]
-            for attr_id, attr_value in enumerate(obs[7:7+int(obs[6])]):
-                attr_name = self._backend_cfg.attribute_dict[name_int][attr_id]
-                if attr_name in self.done_condition["attribute"].keys():
-                    if attr_value <= self.done_condition["attribute"][attr_name]:
-                        done[agent_id] = True
-                        break
-            if done[agent_id]:
-                continue
-            # backpack
-            cursor = 8 + int(obs[6])
-            for bp_slot in range(self.backpack_size):
-                name_int = int(obs[cursor + bp_slot * 2])
-                if name_int < 0:
-                    continue
-                name = self._backend_cfg.typeid2name[f'item:{name_int}']
-                count = int(obs[cursor + bp_slot * 2 + 1])
-                if name in self.done_condition["backpack"]:
-                    if count >= self.done_condition["backpack"][name]:
-                        done[agent_id] = True
-                        break
-            if done[agent_id]:
-                continue
-            # equipment
-            cursor += self.backpack_size * 2 + 1
-            for eq_slot in range(self.equipment_size):
-                name_int = int(obs[cursor + eq_slot])
-                if name_int < 0:
-                    continue
-                name = self._backend_cfg.typeid2name[f'item:{name_int}']
-                if name in self.done_condition["equipment"]:
-                    done[agent_id] = True
-                    break
+        done, self.done_code = self.done_table(self.curr_obs, self.results, self.alive)
         return done
 
+    @property
+    def max_obs_len(self) -> int:
+        """
+        Expected bound on the raw observation length of any agent, unless given to
+        __init__: the fixed blocks plus, in each of the four sighting blocks, three
+        floats per cell of the widest vision diamond, i.e. the largest Vision or
+        NightVision of an agent with every buff raising it. A cell holding several
+        sightings of one block makes a longer row; the env's buffers then grow,
+        while EdenVecEnv, which pads to this width, raises.
+        """
+        if self._max_obs_len is not None:
+            return self._max_obs_len
+        boosts = {'Vision': 0.0, 'NightVision': 0.0}
+        for buff in self.backend_cfg.buff_dict.values():
+            for name in boosts:
+                boosts[name] += max(0.0, buff['Enhance'].get(name, 0.0))
+        length, radius = 0, 0
+        for agent in self.backend_cfg.agent_dict.values():
+            fixed = 4 + 2 + 1 + len(agent['Attribute']) + 1 + 2 * int(agent['BackpackSize']) + \
+                    1 + len(agent['Slot'].split(';'))
+            length = max(length, fixed)
+            for name, boost in boosts.items():
+                radius = max(radius, int(np.floor(agent['Attribute'].get(name, 0.0) + boost)))
+        cells = min(2 * radius * (radius + 1) + 1, self.map_size_x * self.map_size_y)
+        return length + 4 * (1 + 3 * cells)
+
     @property
     def obs(self) -> np.ndarray:
-        return np.array(self._backend.observe())
+        """
+        The observation of the current tick, i.e. curr_obs. The backend is only
+        observed again when the world changed outside step and reset (run_script),
+        and then curr_obs, lengths and alive are refreshed in place.
+        """
+        if self._obs_tick != self.tick:
+            self._load_obs(*self._backend.observe(), swap=False)
+        return self.curr_obs
+
+    @property
+    def layout(self) -> ObsLayout:
+        """ObsLayout of obs, parsed once per tick."""
+        obs = self.obs
+        if self._layout_tick != self.tick:
+            self._layout = ObsLayout(obs, self.lengths)
+            self._layout_tick = self.tick
+        return self._layout
+
+    @property
+    def landform(self) -> np.ndarray:
+        """Landform NameInt of every cell, a (map_size_x, map_size_y) grid read from the ui once per episode."""
+        if self._landform is None:
+            self._landform = decode_landform(self._backend.ui(0), self.map_size_x, self.map_size_y)
+        return self._landform
+
+    def _landform_layer(self, nameint_map: Dict[int, int]) -> np.ndarray:
+        """landform with every NameInt replaced through nameint_map, cached along with landform."""
+        landform = self.landform
+        if self._landform_layer_cache is None or self._landform_layer_cache[0] is not landform:
+            self._landform_layer_cache = (landform, self._lookup(nameint_map)[landform])
+        return self._landform_layer_cache[1]
+
+    def _fill_entities(self, out: np.ndarray, lookups: List[Tuple[str, np.ndarray]], capacity: int) -> None:
+        """
+        Write what every live agent sees into out[:, :ENTITY_STRIDE * capacity] as capacity
+        rows of (class id, x, y, mask): the agent itself as class 1 first, then the sightings
+        nearest first, ties in lookups order. Sightings past capacity are dropped and the
+        unused rows are left as they are.
+
+        [Args]
+            out:      (n_agents, >= ENTITY_STRIDE * capacity) observation, written in place
+            lookups:  (block name, NameInt -> class id array) pairs, e.g. ('being', being_lookup)
+            capacity: entity rows per agent
+        """
+        agents = np.flatnonzero(self.alive)
+        if len(agents) == 0:
+            return
+        owner, cells, classes = self._objects(lookups, agents)
+        distance = np.abs(cells - self.layout.position[owner].astype(np.int64)).sum(axis=1)
+        distance[:len(agents)] = -1
+        # lexsort is stable, so entities at the same distance keep their block order
+        order = np.lexsort((distance, owner))
+        owner, classes, cells = owner[order], classes[order], cells[order]
+        rank = np.arange(len(owner)) - np.searchsorted(owner, owner)
+        keep = rank < capacity
+        owner, column = owner[keep], ENTITY_STRIDE * rank[keep]
+        out[owner, column] = classes[keep]
+        out[owner, column + 1] = cells[keep, 0]
+        out[owner, column + 2] = cells[keep, 1]
+        out[owner, column + 3] = 1
+
+    def _objects(self, lookups: List[Tuple[str, np.ndarray]], agents: np.ndarray) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        What the given live agents see, in the order the object maps are written: every agent
+        itself as class 1, then the sightings of the lookups' blocks.
+
+        [Return]
+            owner: (m,) agent id of every object
+            cells: (m, 2) int (x, y)
+            class: (m,) class id through the lookups
+        """
+        layout = self.layout
+        owners = [agents]
+        cells = [layout.position[agents]]
+        classes = [np.ones(len(agents), dtype=np.int64)]
+        for name, lookup in lookups:
+            owner, sighted = layout.entries(name, agents)
+            owners.append(owner)
+            cells.append(sighted[:, 1:3])
+            classes.append(lookup[sighted[:, 0].astype(np.int64)])
+        return np.concatenate(owners), np.concatenate(cells).astype(np.int64), np.concatenate(classes)
+
+    @staticmethod
+    def _scatter_last(out: np.ndarray, index: np.ndarray, values: np.ndarray) -> None:
+        """out.reshape(-1)[index] = values, where an index given twice keeps its last value."""
+        _, last = np.unique(index[::-1], return_index=True)
+        last = len(index) - 1 - last
+        out.reshape(-1)[index[last]] = values[last]
+
+    @staticmethod
+    def _lookup(nameint_map: Dict[int, int], default: int = 0) -> np.ndarray:
+        """nameint_map as an array indexed by NameInt, default for the NameInts it lacks."""
+        lookup = np.full(max(nameint_map.keys(), default=-1) + 1, default, dtype=np.int64)
+        lookup[list(nameint_map.keys())] = list(nameint_map.values())
+        return lookup
 
     @property
     def backend(self):
@@ -293,12 +585,36 @@ class MatEden(Eden):
     def __init__(
             self,
             multiplier=20,
+            obs_dtype='float32',
+            obs_mode='dense',
+            max_entities=64,
+            egocentric=False,
+            window=8,
+            minimap=0,
             **kwargs) -> None:
         """
         The type (or NameInt in the backend) of an object as well as landform will be mapped into a unique number.
         The map is: NameInt -> $CLASS_NAME_nameint_map[NameInt]
 
+        obs_dtype: dtype of the observation matrices, one of MAT_OBS_DTYPES. Every class id
+        must be exact in it; attributes are truncated to integers and saturate at its range.
+        obs_mode: 'dense' observes (obs_height, obs_width) matrices of the landform map, the
+        object map and the function bar. 'sparse' observes rows of max_entities entities
+        (class id, x, y, mask), see Eden._fill_entities, followed by the function bar, and
+        has no landform map. Actions are the same in both modes.
+        egocentric: the landform and object maps cover the (2 * window + 1) square centered on
+        the agent instead of the whole map, -2 off the map, and clicks on them target the cells
+        of that window. minimap > 0 adds (minimap, minimap) rows under the function bar: a
+        coarse object map of the whole map with the agent itself on top, where a click moves
+        towards the cell. Egocentric only, dense obs_mode only.
         """
+        assert np.dtype(obs_dtype).name in MAT_OBS_DTYPES, \
+            f"MatEden: obs_dtype should be one of {MAT_OBS_DTYPES}, got {obs_dtype}"
+        assert obs_mode in OBS_MODES, f"MatEden: obs_mode should be one of {OBS_MODES}, got {obs_mode}"
+        assert max_entities > 0, f"MatEden: max_entities should be positive, got {max_entities}"
+        assert not (egocentric and obs_mode == 'sparse'), "MatEden: egocentric needs the dense obs_mode"
+        assert window >= 0, f"MatEden: window should not be negative, got {window}"
+        assert minimap >= 0 and (egocentric or minimap == 0), "MatEden: minimap needs egocentric"
         super().__init__(**kwargs)
 
         # Get the dict of landform/agent/being, etc. types. key is nameint, value is mapped observation representation
@@ -375,225 +691,267 @@ class MatEden(Eden):
         # Get the shape of observation matrix
         # Observation consists of an object map (full map size), a backpack map(backpack_size), an
         # equipment map(slot size), a synthesis map(synthesize dict length size), an attribute list.
-        self.obs_width = self.map_size_y
-        self.obs_height = self.map_size_x * 2
+        # The landform and object maps cover the whole map, or the window around the agent when egocentric
+        self.egocentric = egocentric
+        self.window = window
+        self.minimap = minimap
+        self._map_shape = (2 * window + 1, 2 * window + 1) if egocentric else (self.map_size_x, self.map_size_y)
+        self.obs_width = max(self._map_shape[1], minimap)
+        self.obs_height = self._map_shape[0] * 2
         self.obs_height += math.ceil(
             (self.backpack_size +
              self.equipment_size +
              len(self.synthesize_list) +
-             len(self.attribute_name)) / self.map_size_y)
+             len(self.attribute_name)) / self.obs_width)
+        self.obs_height += minimap
+        # first rows of the function bar and of the minimap
+        self._func_row = self._map_shape[0] * 2
+        self._minimap_row = self.obs_height - minimap
+        self.obs_mode = obs_mode
+        self.max_entities = max_entities
+        self._entity_length = ENTITY_STRIDE * max_entities
+        # Values are class ids, attributes or -1. Class ids must be exact, attributes saturate
+        self.obs_dtype = np.dtype(obs_dtype)
+        if self.obs_dtype.kind == 'i':
+            self._obs_low, self._obs_high = np.iinfo(self.obs_dtype).min, np.iinfo(self.obs_dtype).max
+            exact_high = self._obs_high
+        else:
+            self._obs_low, self._obs_high = np.finfo(self.obs_dtype).min, np.finfo(self.obs_dtype).max
+            exact_high = 2 ** (np.finfo(self.obs_dtype).nmant + 1)
+        max_code = max([1] + [code for name in ["agent", "landform", "being", "item", "resource"]
+                              for code in self.nameint_map[name].values()])
+        if max_code > exact_high:
+            raise AssertionError(f"MatEden: class id {max_code} does not fit obs_dtype {self.obs_dtype.name}, "
+                                 f"use a wider dtype or a smaller multiplier")
+        if obs_mode == 'sparse' and max(self.map_size_x, self.map_size_y) - 1 > exact_high:
+            raise AssertionError(f"MatEden: map coordinates do not fit obs_dtype {self.obs_dtype.name}")
+        if obs_mode == 'sparse':
+            func_bar_length = self.backpack_size + self.equipment_size + len(self.synthesize_list) + \
+                              len(self.attribute_name)
+            obs_shape = (self._backend.agent_count, self._entity_length + func_bar_length)
+        else:
+            obs_shape = (self._backend.agent_count, self.obs_height, self.obs_width)
         self.observation_space = spaces.Box(
-            low=np.zeros((self._backend.agent_count, self.obs_height, self.obs_width)) - 1,
-            high=np.zeros((self._backend.agent_count, self.obs_height, self.obs_width)) + np.inf,
-            shape=(self._backend.agent_count, self.obs_height, self.obs_width),
-            dtype=np.float32
+            low=self._obs_low,
+            high=self._obs_high,
+            shape=obs_shape,
+            dtype=self.obs_dtype
         )
         # print("MatEden observation space: ", self.observation_space)
         self.action_space = spaces.Tuple(
-            [spaces.MultiDiscrete((2, self.obs_height, self.obs_width), dtype=np.int)
+            [spaces.MultiDiscrete((2, self.obs_height, self.obs_width), dtype=np.int64)
              for _ in range(self.backend.agent_count)])
         # print("MatEden action space: ", self.action_space)
 
-    def step(self, action: Tuple[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, bool, Dict[str, Any]]:
-        tri_code_actions = []
-        for idx, act in enumerate(action):
-            tri_code_actions.append(self._select_action(idx, act[1], act[2], act[0]))
-        # self._backend.update(tri_code_actions)
+        # Action decoding tables, see _decode_actions
+        # act_type of clicking an object map cell, by object type and click type (0 or 1)
+        object_act = {"agent": (2, 1), "being": (2, 1), "item": (3, 3), "resource": (2, 2)}
+        self._object_act = np.array([object_act.get(name, (0, 0)) for name in self.object_type_list])
+        # Function bar slots hold backpack, equipment and synthesize items, then attributes
+        slot_lengths = [self.backpack_size, self.equipment_size, len(self.synthesize_list), len(self.attribute_name)]
+        self._func_bar_length = sum(slot_lengths)
+        self._slot_kind = np.repeat(np.arange(len(slot_lengths)), slot_lengths)
+        # act_type of clicking a slot, by slot kind, click type == 1 and whether the item is equipment
+        self._slot_act = np.array([
+            [[4, 5], [7, 7]],  # backpack: consume or equip, discard
+            [[5, 5], [5, 5]],  # equipment
+            [[6, 6], [6, 6]],  # synthesize
+            [[0, 0], [0, 0]],  # attribute
+        ])
+        self._item_invlookup = self._lookup(self._item_invmap, default=-1)
+        equip_nameints = [int(x.split(':')[-1]) for x in self.backend_cfg.equip_list]
+        self._item_is_equipment = np.isin(self._item_invlookup, equip_nameints)
+        # (n_agents, func bar length) item codes and attributes, -1 where empty
+        self._func_bar = np.full((self._backend.agent_count, self._func_bar_length), -1, dtype=np.int64)
+        # NameInt -> class id as arrays, for encoding all agents at once
+        self._item_lookup = self._lookup(self._item_nameint_map)
+        self._synthesize_codes = self._item_lookup[list(self.synthesize_list)]
+        self._entity_lookups = [(name, self._lookup(self.nameint_map[name]))
+                                for name in ["agent", "being", "item", "resource"]]
+        self._actions = np.zeros((self._backend.agent_count, 3), dtype=np.float32)
+        # Two observation buffers swapped every step, like Eden's; _last_obs is the current one
+        self._mat_buffers = [np.full(self.observation_space.shape, -1, dtype=self.obs_dtype) for _ in range(2)]
+        self._mat_index = 0
+        self._last_obs = self._mat_buffers[0]
+        # map cell at the corner of every agent's maps, nonzero only when egocentric
+        self._origin = np.zeros((self._backend.agent_count, 2), dtype=np.int64)
+
+    def step(
+            self,
+            action: Tuple[np.ndarray],
+            repeat: int = 1,
+            fast_forward: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, bool, Dict[str, Any]]:
+        _, reward, done, info = super().step(self._decode_actions(action), repeat, fast_forward)
         obs = self._get_mat_observation()
-        _, reward, done, info = super().step(tri_code_actions)
         return obs, reward, done, info
 
     def _get_mat_observation(self):
-        # Get Agent Observe
-        all_obs_orig = self._backend.observe()
-        obs_mats = []
-        self._func_bar = []
-        for obs_orig in all_obs_orig:
-            obs_mat = np.zeros(shape=(self.obs_height, self.obs_width), dtype=np.int) - 1
-            if len(obs_orig) <= 0:
-                obs_mats.append(obs_mat)
-                continue
-            basic_block, position_block, attribute_block, backpack_block, equipment_block, vis_agent_block, \
-            vis_being_block, vis_item_block, vis_rsrc_block = self._obs_orig_parser(obs_orig)
-            use_night_vision = (basic_block[1] < 0.5)
-            vision = attribute_block[self.attribute_name.index("NightVision")] if use_night_vision \
-                else attribute_block[self.attribute_name.index("Vision")]
-            agent_x, agent_y = position_block
-            ui_info = self._backend.ui(0)
+        """
+        Encode the observation of all agents into the next buffer. The returned
+        array is reused two steps later, copy it to keep it longer.
+        """
+        self._mat_index = 1 - self._mat_index
+        obs_mats = self._mat_buffers[self._mat_index]
+        obs_mats.fill(-1)
+        self._last_obs = obs_mats
+        self._fill_func_bar()
+        func_bar = np.clip(self._func_bar, self._obs_low, self._obs_high)
+        if self.obs_mode == 'sparse':
+            obs_mats[:, ENTITY_STRIDE - 1:self._entity_length:ENTITY_STRIDE] = 0
+            self._fill_entities(obs_mats, self._entity_lookups, self.max_entities)
+            obs_mats[:, self._entity_length:] = func_bar
+            return obs_mats
+
+        layout = self.layout
+        agents = np.flatnonzero(self.alive)
+        rows, cols = self._map_shape
+        if self.egocentric and len(agents):
+            self._origin.fill(0)
+            self._origin[agents] = window_origin(layout.position[agents], self.window)
+            off_map = ~window_inside(self._origin[agents], rows, self.map_size_x, self.map_size_y)
+            obs_mats[agents, :rows, :cols] = np.where(off_map, -2, -1)
+            obs_mats[agents, rows:rows * 2, :cols] = np.where(off_map, -2, -1)
+        night_vision = self.attribute_name.index("NightVision")
+        day_vision = self.attribute_name.index("Vision")
+        for agent_id in agents:
+            obs_mat = obs_mats[agent_id]
+            attribute_block = layout.block('attribute', agent_id)
+            use_night_vision = (layout.env[agent_id, 1] < 0.5)
+            vision = attribute_block[night_vision] if use_night_vision else attribute_block[day_vision]
+            agent_x, agent_y = layout.position[agent_id]
             # Landform Map
-            for i in range(0, self.map_size_x):
-                for j in range(0, self.map_size_y):
-                    if abs(i - agent_x) + abs(j - agent_y) > vision:
-                        continue
-                    else:
-                        name_int = int(ui_info[(i * self.map_size_x + j) * 6 + 1])
-                        obs_mat[i, j] = self._landform_nameint_map[name_int]
-
-            # Object Map
-            # Agent itself
-            obs_mat[int(agent_x) + self.map_size_x, int(agent_y)] = 1
-            # agent
-            for idx_vis_agent in range(0, len(vis_agent_block), 3):
-                name_int = int(vis_agent_block[idx_vis_agent])
-                vis_agent_type = self._agent_nameint_map[name_int]
-                x, y = vis_agent_block[idx_vis_agent + 1:idx_vis_agent + 3]
-                obs_mat[int(x) + self.map_size_x, int(y)] = vis_agent_type
-            # being
-            for idx_vis_being in range(0, len(vis_being_block), 3):
-                name_int = int(vis_being_block[idx_vis_being])
-                vis_being_type = self._being_nameint_map[name_int]
-                x, y = vis_being_block[idx_vis_being + 1:idx_vis_being + 3]
-                obs_mat[int(x) + self.map_size_x, int(y)] = vis_being_type
-            # item
-            for idx_vis_item in range(0, len(vis_item_block), 3):
-                name_int = int(vis_item_block[idx_vis_item])
-                vis_item_type = self._item_nameint_map[name_int]
-                x, y = vis_item_block[idx_vis_item + 1:idx_vis_item + 3]
-                obs_mat[int(x) + self.map_size_x, int(y)] = vis_item_type
-            # resource(rsrc)
-            for idx_vis_rsrc in range(0, len(vis_rsrc_block), 3):
-                name_int = int(vis_rsrc_block[idx_vis_rsrc])
-                vis_rsrc_type = self._resource_nameint_map[name_int]
-                x, y = vis_rsrc_block[idx_vis_rsrc + 1:idx_vis_rsrc + 3]
-                obs_mat[int(x) + self.map_size_x, int(y)] = vis_rsrc_type
-
+            paste_diamond(obs_mat[:rows, :cols], self._landform_layer(self._landform_nameint_map),
+                          agent_x, agent_y, vision, self._origin[agent_id])
             # Function Bar
-            # backpack(item, type only)
-            # equipment(item)
-            # synthesize(item)
-            # attribute(number only)
-            _func_bar = [self._item_nameint_map[x] if x != -1 else -1 for x in backpack_block[::2]]
-            _func_bar.extend([self._item_nameint_map[x] if x != -1 else -1 for x in equipment_block])
-            _func_bar.extend([self._item_nameint_map[x] for x in self.synthesize_list])
-            _func_bar.extend(attribute_block)
-            self._func_bar.append(_func_bar)
-            cursor = 0
-            for i in range(self.map_size_x * 2, self.obs_height):
-                for j in range(self.map_size_y):
-                    obs_mat[i, j] = _func_bar[cursor]
-                    cursor += 1
-                    if cursor >= len(_func_bar):
-                        break
-            obs_mats.append(obs_mat)
-        self._last_obs = np.array(obs_mats)
-        return np.array(obs_mats)
-
-    def _select_action(self, index, input_x, input_y, act_bool_type):
-        act_type = 0
-        param1 = input_x
-        param2 = input_y
-        # Landform map: Move
-        if input_x < self.map_size_x:
-            act_type = 8
-        # Object map
-        elif input_x < self.map_size_x * 2:
-            x = input_x - self.map_size_x
-            y = input_y
-            curious_point = self._last_obs[index, input_x, input_y]
-            if curious_point == -1:
-                return [0., 0., 0.]
-            object_type = self.object_type_list[curious_point // self.multiplier]
-            param1 = x
-            param2 = y
-            if object_type == "agent":
-                act_type = 2 if act_bool_type == 0 else 1
-            elif object_type == "landform":  # Anyway this is impossible
-                pass
-            elif object_type == "being":
-                act_type = 2 if act_bool_type == 0 else 1
-            elif object_type == "item":
-                act_type = 3
-            elif object_type == "resource":
-                act_type = 2
-            elif object_type == "buff":
-                pass
-            elif object_type == "weather":
-                pass
-        # Function Bar
-        else:
-            func_bar_index = (input_x - self.map_size_x * 2) * self.map_size_y + input_y
-            if func_bar_index >= len(self._func_bar[index]): return [0., 0., 0.]
-            curious_point = self._func_bar[index][func_bar_index]
-            if curious_point == -1:
-                return [0., 0., 0.]
-            if func_bar_index < self.backpack_size:  # Backpack
-                item_nameint = self._item_invmap[curious_point]
-                param1 = item_nameint
-                param2 = 1
-                if act_bool_type == 1:
-                    act_type = 7
-                else:
-                    if item_nameint in [int(x.split(':')[-1]) for x in self.backend_cfg.equip_list]:  # Equipment
-                        act_type = 5
-                    else:  # Food
-                        act_type = 4
-            elif func_bar_index < self.backpack_size + self.equipment_size:  # Equipment
-                act_type = 5
-                item_nameint = self._item_invmap[curious_point]
-                param1 = item_nameint
-                param2 = 1
-            elif func_bar_index < self.backpack_size + self.equipment_size + len(self.synthesize_list):  # Synthesize
-                act_type = 6
-                item_nameint = self._item_invmap[curious_point]
-                param1 = item_nameint
-                param2 = 1
-            else:  # Attribute
-                act_type = 0
-                param1 = 0
-                param2 = 0
-        return [float(act_type), float(param1), float(param2)]
-
-    @staticmethod
-    def _obs_orig_parser(obs_orig):
+            obs_mat[self._func_row:self._minimap_row].reshape(-1)[:self._func_bar_length] = func_bar[agent_id]
+        if len(agents) == 0:
+            return obs_mats
+
+        # Object Map
+        # the agent itself, then sighted agents, beings, items and resources; on a
+        # shared cell the later entity wins, as when they were written one by one
+        objects = self._objects(self._entity_lookups, agents)
+        owner, cells, codes = objects
+        cells = cells - self._origin[owner]
+        if self.egocentric:
+            inside = np.all((cells >= 0) & (cells < rows), axis=1)
+            owner, cells, codes = owner[inside], cells[inside], codes[inside]
+        self._scatter_last(obs_mats, self._mat_index_of(owner, rows + cells[:, 0], cells[:, 1]), codes)
+
+        # Minimap: the object map at low resolution, each agent itself written last to stay on top
+        if self.minimap:
+            owner, cells, codes = (np.roll(x, -len(agents), axis=0) for x in objects)
+            cells = minimap_cell(cells, self.minimap, self.map_size_x, self.map_size_y)
+            self._scatter_last(obs_mats, self._mat_index_of(owner, self._minimap_row + cells[:, 0], cells[:, 1]),
+                               codes)
+        return obs_mats
+
+    def _mat_index_of(self, agent_id: np.ndarray, row: np.ndarray, col: np.ndarray) -> np.ndarray:
+        """Flat index of (agent_id, row, col) in the observation buffers."""
+        return (agent_id * self.obs_height + row) * self.obs_width + col
+
+    def _fill_func_bar(self) -> None:
+        """
+        Fill the function bar of all agents, -1 where empty or dead:
+        backpack(item, type only), equipment(item), synthesize(item), attribute(number only)
+        """
+        self._func_bar.fill(-1)
+        agents = np.flatnonzero(self.alive)
+        if len(agents) == 0:
+            return
+        layout = self.layout
+        backpack = layout.gather('backpack')[agents, :self.backpack_size, 0].astype(np.int64)
+        equipment = layout.gather('equipment')[agents, :self.equipment_size, 0].astype(np.int64)
+        sections = (
+            (np.where(backpack != -1, self._item_lookup[np.maximum(backpack, 0)], -1), self.backpack_size),
+            (np.where(equipment != -1, self._item_lookup[np.maximum(equipment, 0)], -1), self.equipment_size),
+            (self._synthesize_codes, len(self.synthesize_list)),
+            (layout.gather('attribute')[agents, :len(self.attribute_name), 0].astype(np.int64),
+             len(self.attribute_name)),
+        )
         cursor = 0
-        # part 1:basic information of env
-        basic_block = obs_orig[cursor:cursor + 4]
-        cursor += 4
-
-        # part 2: basic information of agent
-        position_block = obs_orig[cursor:cursor + 2]  # position
-        cursor += 2
-
-        attr_num = round(obs_orig[cursor])
-        cursor += 1
-        attribute_block = obs_orig[cursor:cursor + attr_num]  # attribute
-        cursor += attr_num
-
-        # part 3: backpack and equipment
-        backpack_num = round(obs_orig[cursor] * 2)
-        cursor += 1
-        backpack_block = obs_orig[cursor:cursor + backpack_num]  # backpack
-        cursor += backpack_num
-
-        equipment_num = round(obs_orig[cursor])
-        cursor += 1
-        equipment_block = obs_orig[cursor:cursor + equipment_num]  # equipment
-        cursor += equipment_num
-
-        # part 4: find the nearest agent,being,resource
-        agent_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_agent_block = obs_orig[cursor:cursor + agent_num]
-        cursor += agent_num
-
-        being_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_being_block = obs_orig[cursor:cursor + being_num]
-        cursor += being_num
-
-        resource_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_resource_block = obs_orig[cursor:cursor + resource_num]
-        cursor += resource_num
-
-        item_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_item_block = obs_orig[cursor:cursor + item_num]
-        cursor += item_num
-
-        return basic_block, position_block, attribute_block, backpack_block, equipment_block, vision_agent_block, \
-               vision_being_block, vision_item_block, vision_resource_block
+        for values, length in sections:
+            self._func_bar[agents, cursor:cursor + np.shape(values)[-1]] = values
+            cursor += length
 
-    def reset(self, seed: int = 0) -> np.ndarray:
-        super().reset(seed)
-        return self._get_mat_observation()
+    def _decode_actions(self, action: Tuple[np.ndarray]) -> np.ndarray:
+        """
+        Decode the (click type, x, y) actions of all agents into backend
+        [act_type, param1, param2] rows, in a reused float32 buffer.
+        """
+        action = np.asarray(action).astype(np.int64)
+        click, input_x, input_y = action[:, 0], action[:, 1], action[:, 2]
+        decoded = self._actions
+        decoded.fill(0)
+
+        # Landform map: Move
+        map_rows, map_cols = self._map_shape
+        rows = np.flatnonzero((input_x < map_rows) & (input_y < map_cols))
+        decoded[rows, 0] = 8
+        decoded[rows, 1:3] = self._map_cell(rows, input_x[rows], input_y[rows])
+
+        # Object map: act on the clicked object, nothing on an empty cell
+        rows = np.flatnonzero((input_x >= map_rows) & (input_x < map_rows * 2) & (input_y < map_cols))
+        point = self._object_at(rows, input_x[rows] - map_rows, input_y[rows])
+        rows, point = rows[point >= 0], point[point >= 0]
+        decoded[rows, 0] = self._object_act[point // self.multiplier, (click[rows] != 0).astype(np.int64)]
+        decoded[rows, 1:3] = self._map_cell(rows, input_x[rows] - map_rows, input_y[rows])
+
+        # Function Bar: use the clicked item, nothing on an empty slot or an attribute
+        rows = np.flatnonzero((input_x >= self._func_row) & (input_x < self._minimap_row))
+        slot = (input_x[rows] - self._func_row) * self.obs_width + input_y[rows]
+        rows, slot = rows[slot < self._func_bar_length], slot[slot < self._func_bar_length]
+        point = self._func_bar[rows, slot]
+        rows, slot, point = rows[point != -1], slot[point != -1], point[point != -1]
+        kind = self._slot_kind[slot]
+        is_item = kind < 3
+        code = np.where(is_item, point, 0).clip(0, len(self._item_invlookup) - 1)
+        decoded[rows, 0] = self._slot_act[kind, (click[rows] == 1).astype(np.int64),
+                                          self._item_is_equipment[code].astype(np.int64)]
+        decoded[rows, 1] = np.where(is_item, self._item_invlookup[code], 0)
+        decoded[rows, 2] = is_item
+
+        # Minimap: Move towards the center of the clicked cell
+        rows = np.flatnonzero((input_x >= self._minimap_row) & (input_y < self.minimap))
+        decoded[rows, 0] = 8
+        decoded[rows, 1:3] = minimap_center(np.stack([input_x[rows] - self._minimap_row, input_y[rows]], axis=1),
+                                            self.minimap, self.map_size_x, self.map_size_y)
+        return decoded
+
+    def _map_cell(self, rows: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """(m, 2) map cell of the given agents' map cells (x, y), on the map when egocentric."""
+        cell = np.stack([x, y], axis=1) + self._origin[rows]
+        if self.egocentric:
+            cell = cell.clip(0, [self.map_size_x - 1, self.map_size_y - 1])
+        return cell
+
+    def _object_at(self, rows: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Class id of the object the given agents see at cell (x, y) of their object map, -1 for none, -2 off the map."""
+        if self.obs_mode == 'dense':
+            return self._last_obs[rows, x + self._map_shape[0], y].astype(np.int64)
+        # the last entity on the cell, as the object map keeps the last one written
+        table = self._last_obs[rows, :self._entity_length].astype(np.int64)
+        table = table.reshape(len(rows), self.max_entities, ENTITY_STRIDE)
+        match = (table[:, :, 3] == 1) & (table[:, :, 1] == x[:, None]) & (table[:, :, 2] == y[:, None])
+        last = match.shape[1] - 1 - np.argmax(match[:, ::-1], axis=1)
+        return np.where(match.any(axis=1), table[np.arange(len(rows)), last, 0], -1)
+
+    def _observe_reset(self) -> None:
+        self._get_mat_observation()
+
+    def _observation(self) -> np.ndarray:
+        return self._last_obs
+
+    def _save_fields(self) -> Dict[str, Any]:
+        fields = super()._save_fields()
+        fields.update(mat_obs=self._last_obs.copy(), func_bar=self._func_bar.copy(), origin=self._origin.copy())
+        return fields
+
+    def _load_fields(self, fields: Dict[str, Any]) -> None:
+        super()._load_fields(fields)
+        self._mat_index = 1 - self._mat_index
+        self._last_obs = self._mat_buffers[self._mat_index]
+        self._last_obs[:] = fields['mat_obs']
+        self._func_bar[:] = fields['func_bar']
+        self._origin[:] = fields['origin']
@@ -0,0 +1,115 @@
+import numpy as np
+from typing import Any, Dict, Tuple
+
+from eden.backend.config import BackendConfig
+
+# Which condition ended an agent, in the order they are checked
+DONE_NONE = 0
+DONE_DEAD = 1
+DONE_POSITION = 2
+DONE_ATTRIBUTE = 3
+DONE_BACKPACK = 4
+DONE_EQUIPMENT = 5
+
+
+class DoneCondition:
+    """
+    game_done.json compiled into lookup arrays:
+
+        position[x, y]                   cell that ends the game
+        attribute[agent_nameint, i]      done when the i-th attribute <= value
+        backpack[item_nameint]           done when a slot holds >= value
+        equipment[item_nameint]          done when the item is equipped
+
+    so that the done flags of all agents come from one pass over the padded
+    observation array.
+    """
+    def __init__(self, condition: Dict[str, Any], backend_cfg: BackendConfig, map_size_x: int, map_size_y: int) -> None:
+        self.position = np.zeros((map_size_x, map_size_y), dtype=bool)
+        for x, y in condition.get('position', []):
+            if 0 <= x < map_size_x and 0 <= y < map_size_y:
+                self.position[x, y] = True
+
+        thresholds = condition.get('attribute', {})
+        self.attribute = np.full((max(backend_cfg.attribute_dict.keys()) + 1,
+                                  max(len(names) for names in backend_cfg.attribute_dict.values())), -np.inf)
+        for name_int, names in backend_cfg.attribute_dict.items():
+            for attr_id, attr_name in enumerate(names):
+                if attr_name in thresholds:
+                    self.attribute[name_int, attr_id] = thresholds[attr_name]
+
+        n_items = max(backend_cfg.item_list) + 1 if backend_cfg.item_list else 0
+        self.backpack = np.full(n_items, np.inf)
+        self.equipment = np.zeros(n_items, dtype=bool)
+        for item_name, count in condition.get('backpack', {}).items():
+            self.backpack[self._item_nameint(backend_cfg, item_name)] = count
+        for item_name in condition.get('equipment', []):
+            self.equipment[self._item_nameint(backend_cfg, item_name)] = True
+
+    @staticmethod
+    def _item_nameint(backend_cfg: BackendConfig, item_name: str) -> int:
+        typeid = backend_cfg.name2typeid.get(item_name, '')
+        assert typeid.startswith('item:'), f"DoneCondition: {item_name} is not an item"
+        return int(typeid.split(':')[1])
+
+    def __call__(self, obs: np.ndarray, results: np.ndarray, alive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        [Args]
+            obs:     (n_agents, max_len) padded observation
+            results: (n_agents, >=5) backend results, column 4 is the agent NameInt
+            alive:   (n_agents,) bool
+
+        [Return]
+            done: (n_agents,) bool
+            code: (n_agents,) int8, the DONE_* condition that fired first
+        """
+        code = np.where(alive, DONE_NONE, DONE_DEAD).astype(np.int8)
+        agents = np.flatnonzero(alive)
+        if len(agents) == 0:
+            return code != DONE_NONE, code
+        obs = obs[agents]
+        width = obs.shape[1]
+        rows = np.arange(len(agents))[:, None]
+
+        def gather(offsets, counts, stride):
+            # values at offsets + stride * k for k < counts, -1 past the count
+            k = np.arange(max(int(counts.max()), 0))
+            index = np.minimum(offsets[:, None] + stride * k, width - 1)
+            return np.where(k < counts[:, None], obs[rows, index], -1)
+
+        # position
+        x = obs[:, 4].astype(np.int64)
+        y = obs[:, 5].astype(np.int64)
+        on_map = (x >= 0) & (x < self.position.shape[0]) & (y >= 0) & (y < self.position.shape[1])
+        position = np.zeros(len(agents), dtype=bool)
+        position[on_map] = self.position[x[on_map], y[on_map]]
+
+        # attribute
+        attr_count = obs[:, 6].astype(np.int64)
+        name_int = results[agents, 4].astype(np.int64)
+        n_attr = min(self.attribute.shape[1], width - 7)
+        attr = obs[:, 7:7 + n_attr]
+        attr_valid = np.arange(n_attr) < attr_count[:, None]
+        attribute = (attr_valid & (attr <= self.attribute[name_int, :n_attr])).any(axis=1)
+
+        # backpack: (item, count) pairs after the slot count
+        bp_offset = 7 + attr_count
+        bp_count = obs[rows[:, 0], np.minimum(bp_offset, width - 1)].astype(np.int64)
+        items = gather(bp_offset + 1, bp_count, 2).astype(np.int64)
+        counts = gather(bp_offset + 2, bp_count, 2)
+        held = items >= 0
+        backpack = (held & (counts >= self.backpack[np.where(held, items, 0)])).any(axis=1)
+
+        # equipment: item per slot after the slot count
+        eq_offset = bp_offset + 1 + 2 * bp_count
+        eq_count = obs[rows[:, 0], np.minimum(eq_offset, width - 1)].astype(np.int64)
+        equipped = gather(eq_offset + 1, eq_count, 1).astype(np.int64)
+        worn = equipped >= 0
+        equipment = (worn & self.equipment[np.where(worn, equipped, 0)]).any(axis=1)
+
+        fired = np.select(
+            [position, attribute, backpack, equipment],
+            [DONE_POSITION, DONE_ATTRIBUTE, DONE_BACKPACK, DONE_EQUIPMENT],
+            DONE_NONE)
+        code[agents] = fired
+        return code != DONE_NONE, code
@@ -0,0 +1,30 @@
+import numpy as np
+from typing import Any, Dict
+
+
+class EnvState:
+    """
+    An Eden frozen at one tick, made by Eden.clone_state() and put back by
+    Eden.restore_state(). It holds the native world snapshot together with
+    the Python side of the env (observations, step count, caches), so a
+    restored env carries on exactly as the original did from that tick.
+    A state may be restored any number of times, into any env of the same
+    class and config.
+
+        world        Backend.snapshot() of the native Game
+        fields       the env's Python state, see Eden._save_fields
+        config_hash  eden.backend.config.config_hash of the config
+    """
+    def __init__(self, world: Any, fields: Dict[str, Any], config_hash: bytes) -> None:
+        self.world = world
+        self.fields = fields
+        self.config_hash = config_hash
+
+    @property
+    def total_step(self) -> int:
+        return self.fields['total_step']
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the arrays in fields. The native snapshot does not expose its size."""
+        return sum(value.nbytes for value in self.fields.values() if isinstance(value, np.ndarray))
@@ -3,21 +3,47 @@ import numpy as np
 from gym import spaces
 from typing import Tuple, Dict, List, Any
 
-from eden.core import Eden, MatEden
+from eden.core import Eden, MatEden, OBS_MODES, ENTITY_STRIDE
+from eden.vision import paste_diamond, window_origin, window_inside, minimap_cell, minimap_center
 
 
 class FiveEden(Eden):
     def __init__(
             self,
             use_landform_map=False,
+            obs_mode='dense',
+            max_entities=64,
+            egocentric=False,
+            window=8,
+            minimap=0,
             **kwargs) -> None:
         """
         The type (or NameInt in the backend) of an object as well as landform will be mapped into a unique number.
         The map is: NameInt -> $CLASS_NAME_nameint_map[NameInt]
         
         Compact version
+
+        obs_mode: 'dense' starts the observation with the object map, 'sparse' with rows of
+        max_entities entities (class id, x, y, mask), see Eden._fill_entities. The other
+        sections and the actions are the same in both modes. Sparse has no landform map.
+        egocentric: the object and landform maps cover the (2 * window + 1) square centered on
+        the agent instead of the whole map, -1 off the map, and map actions target the cells
+        of that window. minimap > 0 appends a (minimap, minimap) coarse object map of the
+        whole map with the agent itself on top; action unit indices past the unit section
+        move towards its cells. Egocentric only, dense obs_mode only.
         """
+        assert obs_mode in OBS_MODES, f"FiveEden: obs_mode should be one of {OBS_MODES}, got {obs_mode}"
+        assert max_entities > 0, f"FiveEden: max_entities should be positive, got {max_entities}"
+        assert not (use_landform_map and obs_mode == 'sparse'), "FiveEden: sparse obs_mode has no landform map"
+        assert not (egocentric and obs_mode == 'sparse'), "FiveEden: egocentric needs the dense obs_mode"
+        assert window >= 0, f"FiveEden: window should not be negative, got {window}"
+        assert minimap >= 0 and (egocentric or minimap == 0), "FiveEden: minimap needs egocentric"
         super().__init__(**kwargs)
+        self.obs_mode = obs_mode
+        self.max_entities = max_entities
+        self.egocentric = egocentric
+        self.window = window
+        self.minimap = minimap
 
         self.use_landform_map = use_landform_map
         if use_landform_map:
@@ -82,7 +108,9 @@ class FiveEden(Eden):
         #   a synthesis map(synthesize dict length size),
         # 2. Attribute section
         #   an attribute list, a backpack item number list
-        self._object_map_length = self.map_size_y*self.map_size_x
+        # the object map covers the whole map, or the window around the agent when egocentric
+        self._map_shape = (2 * window + 1, 2 * window + 1) if egocentric else (self.map_size_x, self.map_size_y)
+        self._object_map_length = self._map_shape[0] * self._map_shape[1]
         self._backpack_length = self.backpack_size
         self._equipment_length = self.equipment_size
         self._synthesize_length = len(self.synthesize_list)
@@ -95,179 +123,200 @@ class FiveEden(Eden):
         self.landform_section_length = self.unit_section_length if self.use_landform_map else 0
 
         self.obs_length = self.unit_section_length + self.attribute_section_length + self.landform_section_length
-
+        # In sparse mode the entity table takes the place of the object map in the observation
+        self._map_section_length = ENTITY_STRIDE * max_entities if obs_mode == 'sparse' else self._object_map_length
+        self.obs_length += self._map_section_length - self._object_map_length
+        # The minimap section closes the observation
+        self._minimap_start = self.obs_length
+        self.obs_length += minimap * minimap
+
+        low = np.zeros((self._backend.agent_count, self.obs_length))
+        if egocentric:
+            # off-map cells of the object and landform windows are -1
+            low[:, :self._object_map_length] = -1
+            if self.use_landform_map:
+                landform_start = self.unit_section_length + self.attribute_section_length
+                low[:, landform_start:landform_start + self._object_map_length] = -1
         self.observation_space = spaces.Box(
-            low=np.zeros((self._backend.agent_count, self.obs_length)),
+            low=low,
             high=np.zeros((self._backend.agent_count, self.obs_length)) + np.inf,
             shape=(self._backend.agent_count, self.obs_length),
             dtype=np.float32
         )
         self.action_space = spaces.Tuple(
-            [spaces.MultiDiscrete((len(self.backend_cfg.action_list), self.unit_section_length), dtype=np.int)
+            [spaces.MultiDiscrete((len(self.backend_cfg.action_list), self.unit_section_length + minimap * minimap),
+                                  dtype=np.int64)
              for _ in range(self.backend.agent_count)])
 
-    def step(self, action: Tuple[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, bool, Dict[str, Any]]:
-        tri_code_actions = []
-        for idx, act in enumerate(action):
-            tri_code_actions.append(self._select_action(idx, act[0], act[1]))
-        # self._backend.update(tri_code_actions)
+        # NameInt -> observation value as arrays, for encoding all agents at once
+        self._agent_lookup = self._lookup(self._agent_nameint_map)
+        self._being_lookup = self._lookup(self._being_nameint_map)
+        self._item_lookup = self._lookup(self._item_nameint_map)
+        self._resource_lookup = self._lookup(self._resource_nameint_map)
+        self._synthesize_codes = self._item_lookup[list(self.synthesize_list)]
+        self._entity_lookups = [('agent', self._agent_lookup), ('being', self._being_lookup),
+                                ('item', self._item_lookup), ('resource', self._resource_lookup)]
+        # Two observation buffers swapped every step, like Eden's; _last_obs is the current one
+        self._five_buffers = [np.zeros((self._backend.agent_count, self.obs_length), dtype=np.int64) for _ in range(2)]
+        self._five_index = 0
+        self._last_obs = self._five_buffers[0]
+        # item code -> NameInt, and the decoded backend actions, see _decode_actions
+        self._item_invlookup = self._lookup(self._item_invmap, default=-1)
+        self._actions = np.zeros((self._backend.agent_count, 3), dtype=np.float32)
+        # map cell at the corner of every agent's object map, nonzero only when egocentric
+        self._origin = np.zeros((self._backend.agent_count, 2), dtype=np.int64)
+
+    def step(
+            self,
+            action: Tuple[np.ndarray],
+            repeat: int = 1,
+            fast_forward: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, bool, Dict[str, Any]]:
+        _, reward, done, info = super().step(self._decode_actions(action), repeat, fast_forward)
         obs = self._get_five_observation()
-        _, reward, done, info = super().step(tri_code_actions)
         return obs, reward, done, info
 
     def _get_five_observation(self):
-        # Get Agent Observe
-        all_obs_orig = self._backend.observe()
-        five_obs_list = []
-        self._func_bar = []
-        for obs_orig in all_obs_orig:
-            five_obs = np.zeros(shape=(self.obs_length), dtype=np.int)
-            if len(obs_orig) <= 0:
-                five_obs_list.append(five_obs)
-                continue
-            basic_block, position_block, attribute_block, backpack_block, equipment_block, vis_agent_block, \
-            vis_being_block, vis_item_block, vis_rsrc_block = self._obs_orig_parser(obs_orig)
-            
-            agent_x, agent_y = position_block
-
-            # Object Map
-            # Agent itself
-            five_obs[int(agent_x)*self.map_size_x+int(agent_y)] = 1
-            # agent
-            for idx_vis_agent in range(0, len(vis_agent_block), 3):
-                name_int = int(vis_agent_block[idx_vis_agent])
-                vis_agent_type = self._agent_nameint_map[name_int]
-                x, y = vis_agent_block[idx_vis_agent + 1:idx_vis_agent + 3]
-                five_obs[int(x)*self.map_size_x + int(y)] = vis_agent_type
-            # being
-            for idx_vis_being in range(0, len(vis_being_block), 3):
-                name_int = int(vis_being_block[idx_vis_being])
-                vis_being_type = self._being_nameint_map[name_int]
-                x, y = vis_being_block[idx_vis_being + 1:idx_vis_being + 3]
-                five_obs[int(x)*self.map_size_x + int(y)] = vis_being_type
-            # item
-            for idx_vis_item in range(0, len(vis_item_block), 3):
-                name_int = int(vis_item_block[idx_vis_item])
-                vis_item_type = self._item_nameint_map[name_int]
-                x, y = vis_item_block[idx_vis_item + 1:idx_vis_item + 3]
-                five_obs[int(x)*self.map_size_x + int(y)] = vis_item_type
-            # resource(rsrc)
-            for idx_vis_rsrc in range(0, len(vis_rsrc_block), 3):
-                name_int = int(vis_rsrc_block[idx_vis_rsrc])
-                vis_rsrc_type = self._resource_nameint_map[name_int]
-                x, y = vis_rsrc_block[idx_vis_rsrc + 1:idx_vis_rsrc + 3]
-                five_obs[int(x)*self.map_size_x + int(y)] = vis_rsrc_type
-
-            # Function Bar
-            # backpack(item, type only)
-            # equipment(item)
-            # synthesize(item)
-            _func_bar = [self._item_nameint_map[x] if x != -1 else 0 for x in backpack_block[::2]]
-            _func_bar.extend([self._item_nameint_map[x] if x != -1 else 0 for x in equipment_block])
-            _func_bar.extend([self._item_nameint_map[x] for x in self.synthesize_list])
-            
-            # Attribute Section
-            _attribute_section = attribute_block + [x if x != -1 else 0 for x in backpack_block[1::2]]
-            five_obs[self._object_map_length:self.obs_length-self.landform_section_length] = _func_bar + _attribute_section
-
-            # Landform Section
-            if self.use_landform_map:
-                use_night_vision = (basic_block[1] < 0.5)
-                vision = attribute_block[self.attribute_name.index("NightVision")] if use_night_vision \
-                    else attribute_block[self.attribute_name.index("Vision")]
-                agent_x, agent_y = position_block
-                ui_info = self._backend.ui(0)
-                # Landform Map
-                for i in range(0, self.map_size_x):
-                    for j in range(0, self.map_size_y):
-                        if abs(i - agent_x) + abs(j - agent_y) > vision:
-                            continue
-                        else:
-                            name_int = int(ui_info[(i * self.map_size_x + j) * 6 + 1])
-                            five_obs[self.unit_section_length + self.attribute_section_length + i*self.map_size_x + j] = self._landform_nameint_map[name_int]
-
-
-
-            five_obs_list.append(five_obs)
-        self._last_obs = np.array(five_obs_list)
-        return np.array(five_obs_list)
-
-    def _select_action(self, agent_idx, input_act_type, unit_idx):
-        act_type = int(input_act_type)
-        # object map: (x-y)
-        if unit_idx < self._object_map_length:
-            param1 = int(unit_idx) // self.map_size_y
-            param2 = int(unit_idx) % self.map_size_y
-        # backpack, equipment and synthesize
+        """
+        Encode the observation of all agents into the next buffer. The returned
+        array is reused two steps later, copy it to keep it longer.
+        """
+        self._five_index = 1 - self._five_index
+        five_obs = self._five_buffers[self._five_index]
+        five_obs.fill(0)
+        self._last_obs = five_obs
+        agents = np.flatnonzero(self.alive)
+        if len(agents) == 0:
+            return five_obs
+        layout = self.layout
+        obs = layout.obs
+
+        if self.obs_mode == 'sparse':
+            self._fill_entities(five_obs, self._entity_lookups, self.max_entities)
         else:
-            vis_unit_nameint = self._last_obs[agent_idx, unit_idx]
-            if vis_unit_nameint == 0:
-                act_type = 0
-                param1 = 0
-                param2 = 0
-            elif vis_unit_nameint ==1:
-                act_type = 0
-                param1 = 0
-                param2 = 0
-            else:
-                if act_type not in [4, 5, 6, 7]:
-                    act_type = 0
-                param1 = self._item_invmap[self._last_obs[agent_idx, unit_idx]]
-                param2 = 1
-
-        return [float(act_type), float(param1), float(param2)]
-
-    @staticmethod
-    def _obs_orig_parser(obs_orig):
-        cursor = 0
-        # part 1:basic information of env
-        basic_block = obs_orig[cursor:cursor + 4]
-        cursor += 4
-
-        # part 2: basic information of agent
-        position_block = obs_orig[cursor:cursor + 2]  # position
-        cursor += 2
-
-        attr_num = round(obs_orig[cursor])
-        cursor += 1
-        attribute_block = obs_orig[cursor:cursor + attr_num]  # attribute
-        cursor += attr_num
-
-        # part 3: backpack and equipment
-        backpack_num = round(obs_orig[cursor] * 2)
-        cursor += 1
-        backpack_block = obs_orig[cursor:cursor + backpack_num]  # backpack
-        cursor += backpack_num
-
-        equipment_num = round(obs_orig[cursor])
-        cursor += 1
-        equipment_block = obs_orig[cursor:cursor + equipment_num]  # equipment
-        cursor += equipment_num
-
-        # part 4: find the nearest agent,being,resource
-        agent_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_agent_block = obs_orig[cursor:cursor + agent_num]
-        cursor += agent_num
-
-        being_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_being_block = obs_orig[cursor:cursor + being_num]
-        cursor += being_num
-
-        resource_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_resource_block = obs_orig[cursor:cursor + resource_num]
-        cursor += resource_num
-
-        item_num = round(obs_orig[cursor] * 3)
-        cursor += 1
-        vision_item_block = obs_orig[cursor:cursor + item_num]
-        cursor += item_num
-
-        return basic_block, position_block, attribute_block, backpack_block, equipment_block, vision_agent_block, \
-               vision_being_block, vision_item_block, vision_resource_block
-
-    def reset(self, seed: int = 0) -> np.ndarray:
-        super().reset(seed)
-        return self._get_five_observation()
+            objects = self._objects(self._entity_lookups, agents)
+            if self.egocentric:
+                self._origin.fill(0)
+                self._origin[agents] = window_origin(layout.position[agents], self.window)
+                inside = window_inside(self._origin[agents], self._map_shape[0], self.map_size_x, self.map_size_y)
+                five_obs[agents, :self._object_map_length] = np.where(inside.reshape(len(agents), -1), 0, -1)
+            self._fill_object_map(five_obs, objects)
+            if self.minimap:
+                self._fill_minimap(five_obs, objects, len(agents))
+
+        # Function Bar
+        # backpack(item, type only)
+        # equipment(item)
+        # synthesize(item)
+        # then the Attribute Section: attribute, backpack item count
+        backpack = layout.gather('backpack')[agents]
+        items = backpack[:, :self._backpack_length, 0].astype(np.int64)
+        equipment = layout.gather('equipment')[agents, :self._equipment_length, 0].astype(np.int64)
+        sections = (
+            (np.where(items != -1, self._item_lookup[np.maximum(items, 0)], 0), self._backpack_length),
+            (np.where(equipment != -1, self._item_lookup[np.maximum(equipment, 0)], 0), self._equipment_length),
+            (self._synthesize_codes, self._synthesize_length),
+            (layout.gather('attribute')[agents, :self._attribute_length, 0], self._attribute_length),
+            (np.maximum(backpack[:, :self._backpack_count_length, 1], 0), self._backpack_count_length),
+        )
+        cursor = self._map_section_length
+        for values, length in sections:
+            five_obs[agents, cursor:cursor + np.shape(values)[-1]] = values
+            cursor += length
+
+        # Landform Section
+        if self.use_landform_map:
+            landform = self._landform_layer(self._landform_nameint_map)
+            landform_start = self._map_section_length + self.unit_section_length - self._object_map_length + \
+                             self.attribute_section_length
+            if self.egocentric:
+                # -1 off the map, as in the object window
+                five_obs[agents, landform_start:landform_start + self._object_map_length] = \
+                    five_obs[agents, :self._object_map_length].clip(-1, 0)
+            night_vision = self.attribute_name.index("NightVision")
+            day_vision = self.attribute_name.index("Vision")
+            for agent_id in agents:
+                attribute_block = layout.block('attribute', agent_id)
+                use_night_vision = (obs[agent_id, 1] < 0.5)
+                vision = attribute_block[night_vision] if use_night_vision else attribute_block[day_vision]
+                landform_map = five_obs[agent_id, landform_start:landform_start + self._object_map_length]
+                paste_diamond(landform_map.reshape(self._map_shape), landform,
+                              obs[agent_id, 4], obs[agent_id, 5], vision, self._origin[agent_id])
+        return five_obs
+
+    def _fill_object_map(self, five_obs: np.ndarray, objects: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+        """
+        Object Map: the agent itself, then sighted agents, beings, items and resources; on a
+        shared cell the later entity wins, as when they were written one by one
+        """
+        owner, cells, codes = objects
+        cells = cells - self._origin[owner]
+        if self.egocentric:
+            inside = np.all((cells >= 0) & (cells < self._map_shape[0]), axis=1)
+            owner, cells, codes = owner[inside], cells[inside], codes[inside]
+        self._scatter_last(five_obs, owner * self.obs_length + self._cell_index(cells[:, 0], cells[:, 1]), codes)
+
+    def _fill_minimap(self, five_obs: np.ndarray, objects: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                      n_live: int) -> None:
+        """Minimap: the object map at low resolution, each agent itself written last to stay on top."""
+        owner, cells, codes = (np.roll(x, -n_live, axis=0) for x in objects)
+        cells = minimap_cell(cells, self.minimap, self.map_size_x, self.map_size_y)
+        self._scatter_last(five_obs, owner * self.obs_length + self._minimap_start +
+                           cells[:, 0] * self.minimap + cells[:, 1], codes)
+
+    def _cell_index(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Object map index of cells (x, y), row-major as _decode_actions reads it back."""
+        return x.astype(np.int64) * self._map_shape[1] + y.astype(np.int64)
+
+    def _decode_actions(self, action: Tuple[np.ndarray]) -> np.ndarray:
+        """
+        Decode the (act type, unit index) actions of all agents into backend
+        [act_type, param1, param2] rows, in a reused float32 buffer.
+        """
+        action = np.asarray(action).astype(np.int64)
+        act_type, unit_idx = action[:, 0], action[:, 1]
+        decoded = self._actions
+        decoded[:, 0] = act_type
+
+        # object map: (x-y), from the window to the map when egocentric
+        on_map = unit_idx < self._object_map_length
+        cell = np.stack([unit_idx // self._map_shape[1], unit_idx % self._map_shape[1]], axis=1) + self._origin
+        if self.egocentric:
+            cell = cell.clip(0, [self.map_size_x - 1, self.map_size_y - 1])
+        decoded[:, 1] = np.where(on_map, cell[:, 0], 0)
+        decoded[:, 2] = np.where(on_map, cell[:, 1], 0)
+
+        # minimap: Move towards the center of the cell
+        if self.minimap:
+            rows = np.flatnonzero(unit_idx >= self.unit_section_length)
+            decoded[rows, 0] = 8
+            cell = np.stack(divmod(unit_idx[rows] - self.unit_section_length, self.minimap), axis=1)
+            decoded[rows, 1:3] = minimap_center(cell, self.minimap, self.map_size_x, self.map_size_y)
+
+        # backpack, equipment and synthesize: the item in the slot, nothing when empty
+        rows = np.flatnonzero(~on_map & (unit_idx < self.unit_section_length))
+        point = self._last_obs[rows, unit_idx[rows] - self._object_map_length + self._map_section_length]
+        is_item = point > 1
+        code = np.where(is_item, point, 0).clip(0, len(self._item_invlookup) - 1)
+        decoded[rows, 0] = np.where(is_item & np.isin(act_type[rows], [4, 5, 6, 7]), act_type[rows], 0)
+        decoded[rows, 1] = np.where(is_item, self._item_invlookup[code], 0)
+        decoded[rows, 2] = is_item
+        return decoded
+
+    def _observe_reset(self) -> None:
+        self._get_five_observation()
+
+    def _observation(self) -> np.ndarray:
+        return self._last_obs
+
+    def _save_fields(self) -> Dict[str, Any]:
+        fields = super()._save_fields()
+        fields.update(five_obs=self._last_obs.copy(), origin=self._origin.copy())
+        return fields
+
+    def _load_fields(self, fields: Dict[str, Any]) -> None:
+        super()._load_fields(fields)
+        self._five_index = 1 - self._five_index
+        self._last_obs = self._five_buffers[self._five_index]
+        self._last_obs[:] = fields['five_obs']
+        self._origin[:] = fields['origin']
@@ -4,6 +4,7 @@ from posixpath import split
 import pygame
 import numpy as np
 from eden.core import Eden
+from eden.action_log import load_action_log
 import platform
 if platform.system() == 'Windows':
     import ctypes
@@ -530,22 +531,25 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('--load_history', '-l', action='store_true', help='whether to load actions from history.log')
+    parser.add_argument('--load_history', '-l', action='store_true', help='whether to replay actions from the history file')
+    parser.add_argument('--history', type=str, default='history.actlog', help='action log replayed by --load_history')
+    parser.add_argument('--record', type=str, default=None, help='record the actions of this session into an action log')
     parser.add_argument('--display_size', '-d', type=int, default=20, help='the map display size, should be no less than 16')
     args = parser.parse_args()
 
-    env = gym.make('eden-v0')
-    env.reset()
-    if args.load_history:
-        action_history = []
-        with open('history.log', 'r') as file:
-            lines = file.readlines()
-            for line in lines:
-                if '[[' not in line:
-                    continue
-                multi_action = line[:-1].strip('[]').split('], [')
-                action_history.append([[int(x) for x in single_action.split(', ')] for single_action in multi_action])
-        for action in action_history:
-            env.step(action)
-    render = Render(env, display_size=args.display_size)
-    render.ui_run()
+    env = gym.make('eden-v0', action_log=args.record)
+    try:
+        if args.load_history:
+            header, action_history = load_action_log(args.history)
+            if header['config_hash'] != env.unwrapped.config_hash:
+                print(f"[Warning in interactive] {args.history} was recorded with a different config")
+            env.reset(seed=header['seed'])
+            # one native replay instead of a Python step per logged action
+            env.unwrapped.replay(action_history)
+        else:
+            env.reset()
+        render = Render(env, display_size=args.display_size)
+        render.ui_run()
+    finally:
+        # the recorded actions are flushed to --record here
+        env.close()
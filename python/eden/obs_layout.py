@@ -0,0 +1,130 @@
+"""
+Block layout of the raw observation rows.
+
+An agent's row is
+
+    season, daytime, weather, landform,   (env)
+    x, y,                                 (position)
+    n, attribute * n,
+    n, (item, count) * n,                 (backpack)
+    n, item * n,                          (equipment)
+    n, (name_int, x, y) * n,              (agent sighting)
+    n, (name_int, x, y) * n,              (being sighting)
+    n, (name_int, x, y) * n,              (resource sighting)
+    n, (name_int, x, y) * n               (item sighting)
+
+and is empty for a dead agent. ObsLayout locates every block of every agent
+in one vectorized pass over a padded (n_agents, width) observation, so
+consumers slice views out of the observation instead of walking a cursor.
+"""
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+BLOCKS = ('env', 'position', 'attribute', 'backpack', 'equipment', 'agent', 'being', 'resource', 'item')
+# values per entry of every block
+STRIDE = (1, 1, 1, 2, 1, 3, 3, 3, 3)
+BLOCK_INDEX = {name: index for index, name in enumerate(BLOCKS)}
+# the first counted block, after env and position
+_FIRST_COUNTED = BLOCK_INDEX['attribute']
+
+
+class ObsLayout:
+    """
+    Offsets of the observation blocks of all agents:
+
+        start[agent_id, block]  index of the first value of the block
+        count[agent_id, block]  number of entries, each STRIDE[block] values long
+        end[agent_id]           length the blocks add up to, 0 when dead
+
+    Blocks are indexed in BLOCKS order. block() and table() return views
+    into obs, so they change with it and cost no copy.
+    """
+    def __init__(self, obs: np.ndarray, lengths: Optional[Sequence[int]] = None) -> None:
+        '''
+        [Args]
+            obs:     (n_agents, width) padded observation, or a single 1-D row
+            lengths: valid length of every row, the full width if omitted
+        '''
+        obs = np.asarray(obs)
+        if obs.ndim == 1:
+            obs = obs[None, :]
+        assert obs.ndim == 2, f"ObsLayout: expected 1-D or 2-D observation, got {obs.ndim}-D"
+        n_agents, width = obs.shape
+        self.obs = obs
+        self.lengths = np.full(n_agents, width) if lengths is None else np.asarray(lengths, dtype=np.int64)
+        self.alive = self.lengths > 0
+
+        self.start = np.zeros((n_agents, len(BLOCKS)), dtype=np.int64)
+        self.count = np.zeros((n_agents, len(BLOCKS)), dtype=np.int64)
+        self.start[:, BLOCK_INDEX['position']] = 4
+        self.count[:, BLOCK_INDEX['env']] = 4
+        self.count[:, BLOCK_INDEX['position']] = 2
+
+        rows = np.arange(n_agents)
+        cursor = np.full(n_agents, 6, dtype=np.int64)
+        for block in range(_FIRST_COUNTED, len(BLOCKS)):
+            count = np.zeros(n_agents, dtype=np.int64)
+            if width > 0:
+                count[self.alive] = np.rint(obs[rows, np.minimum(cursor, width - 1)])[self.alive]
+            self.count[:, block] = count
+            self.start[:, block] = cursor + 1
+            cursor = cursor + 1 + STRIDE[block] * count
+        self.end = np.where(self.alive, cursor, 0)
+
+    def __len__(self) -> int:
+        return len(self.obs)
+
+    def block(self, name: str, agent_id: int) -> np.ndarray:
+        '''Flat view of one block of an agent's row.'''
+        index = BLOCK_INDEX[name]
+        start = self.start[agent_id, index]
+        return self.obs[agent_id, start:start + STRIDE[index] * self.count[agent_id, index]]
+
+    def table(self, name: str, agent_id: int) -> np.ndarray:
+        '''View of one block as (count, stride), e.g. (n, 3) for sightings.'''
+        return self.block(name, agent_id).reshape(-1, STRIDE[BLOCK_INDEX[name]])
+
+    def blocks(self, agent_id: int) -> Tuple[np.ndarray, ...]:
+        '''Flat views of all blocks of an agent's row, in BLOCKS order.'''
+        return tuple(self.block(name, agent_id) for name in BLOCKS)
+
+    def counts(self, name: str) -> np.ndarray:
+        '''Entry count of one block for all agents.'''
+        return self.count[:, BLOCK_INDEX[name]]
+
+    @property
+    def env(self) -> np.ndarray:
+        return self.obs[:, 0:4]
+
+    @property
+    def position(self) -> np.ndarray:
+        return self.obs[:, 4:6]
+
+    def entries(self, name: str, agent_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        The entries of one block of the given agents (all by default), concatenated:
+        the agent id of every entry and the (n_entries, stride) values, in row order.
+        '''
+        index = BLOCK_INDEX[name]
+        stride = STRIDE[index]
+        agent_ids = np.arange(len(self.obs)) if agent_ids is None else np.asarray(agent_ids)
+        count = self.count[agent_ids, index]
+        owner = np.repeat(agent_ids, count)
+        # start of the owner's block, shifted back by the entries of the agents before it
+        first = np.repeat(self.start[agent_ids, index] - stride * (np.cumsum(count) - count), count)
+        offsets = first + stride * np.arange(len(owner))
+        return owner, self.obs[owner[:, None], offsets[:, None] + np.arange(stride)]
+
+    def gather(self, name: str, fill: float = -1) -> np.ndarray:
+        '''
+        One block of all agents as a (n_agents, max_count, stride) array,
+        entries past an agent's count set to fill. Unlike block() this copies.
+        '''
+        index = BLOCK_INDEX[name]
+        stride = STRIDE[index]
+        count = self.count[:, index]
+        k = np.arange(int(count.max()) if len(count) else 0)
+        width = self.obs.shape[1]
+        offsets = self.start[:, index, None, None] + stride * k[None, :, None] + np.arange(stride)
+        values = self.obs[np.arange(len(self.obs))[:, None, None], np.minimum(offsets, max(width - 1, 0))]
+        return np.where((k < count[:, None])[:, :, None], values, fill)
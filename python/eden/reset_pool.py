@@ -0,0 +1,155 @@
+'''
+Worlds generated ahead of the resets that will need them.
+
+Eden.reset(seed) generates the whole world in the backend and MatEden and
+FiveEden then encode its observation from scratch. A ResetPool does that
+work for upcoming seeds in a background thread, on an env of its own, and
+keeps the results as EnvStates. An env with the pool as its reset_pool
+restores the state of a pooled seed instead:
+
+    pool = ResetPool(lambda: MatEden(config_dir=config_dir), seeds=itertools.count())
+    env = MatEden(config_dir=config_dir)
+    env.reset_pool = pool
+    obs = env.reset(0)
+
+The pool holds worlds up to max_bytes of EnvState.nbytes. Once it is full,
+the least recently used world that will not be needed soon makes room for
+the next seed: one already handed out, or a stale one, not handed out but
+generated before a seed that was or before a reset the pool missed. The
+latter were skipped, e.g. by an env resetting to seed += num_envs. If every
+pooled world is still to come, generation waits for a reset. A world stays pooled after it is handed out,
+so a seed that comes back is restored again.
+'''
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from eden.core import Eden
+from eden.env_state import EnvState
+
+
+class ResetPool:
+    def __init__(self, make_env: Callable[[], Eden], seeds: Iterable[int], max_bytes: int = 64 * 2 ** 20) -> None:
+        '''
+        [Args]
+            make_env:  builds the env the worlds are generated on. It has to be of the
+                       class and config of the envs the pool serves, and is called in
+                       the background thread.
+            seeds:     the seeds to generate, in the order they will be reset to. It
+                       may be endless, e.g. itertools.count().
+            max_bytes: EnvState.nbytes of the worlds kept at once. One world is kept
+                       even if it is larger.
+        '''
+        assert max_bytes > 0, f"ResetPool: max_bytes should be positive, got {max_bytes}"
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        # seed -> EnvState, least recently used first
+        self._states = OrderedDict()
+        # pooled seeds not handed out yet -> their place in the generation order;
+        # those before _taken, the latest one handed out or missed, are stale
+        self._pending = {}
+        self._generated = 0
+        self._taken = -1
+        # size of the last world generated, taken as that of the next
+        self._world_bytes = 0
+        self._generating = None
+        self._error = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, args=(make_env, iter(seeds)), daemon=True)
+        self._thread.start()
+
+    def take(self, seed: int) -> Optional[EnvState]:
+        '''
+        The world of seed as an EnvState to restore, or None when seed has not
+        been generated. Waits if seed is being generated right now. Generation
+        goes on at the next refill(), so it does not compete with the restore
+        for the GIL.
+        '''
+        with self._cond:
+            while self._generating == seed and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise RuntimeError("ResetPool: world generation failed") from self._error
+            state = self._states.get(seed)
+            if state is None:
+                # the resets went past the pooled worlds
+                self.misses += 1
+                self._taken = self._generated
+                return None
+            self.hits += 1
+            self._states.move_to_end(seed)
+            if seed in self._pending:
+                self._taken = max(self._taken, self._pending.pop(seed))
+            return state
+
+    def refill(self) -> None:
+        '''Let the background thread generate into the room made by take().'''
+        with self._cond:
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._states)
+
+    def __contains__(self, seed: int) -> bool:
+        with self._cond:
+            return seed in self._states
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _evictable(self):
+        '''Pooled seeds that may be evicted, least recently used first.'''
+        return (seed for seed in self._states if self._pending.get(seed, -1) < self._taken)
+
+    def _room(self) -> bool:
+        evictable = sum(self._states[seed].nbytes for seed in self._evictable())
+        return not self._states or self.nbytes - evictable + self._world_bytes <= self.max_bytes
+
+    def _evict(self, nbytes: int) -> None:
+        '''Evict until a world of nbytes fits, or nothing is left to evict.'''
+        while self._states and self.nbytes + nbytes > self.max_bytes:
+            seed = next(self._evictable(), None)
+            if seed is None:
+                return
+            self.nbytes -= self._states.pop(seed).nbytes
+            self._pending.pop(seed, None)
+
+    def _run(self, make_env: Callable[[], Eden], seeds) -> None:
+        env = None
+        try:
+            env = make_env()
+            for seed in seeds:
+                with self._cond:
+                    while not self._closed and seed not in self._states and not self._room():
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    if seed in self._states:
+                        continue
+                    self._generating = seed
+                env.reset(seed)
+                state = env.clone_state()
+                with self._cond:
+                    self._world_bytes = state.nbytes
+                    self._evict(state.nbytes)
+                    self._states[seed] = state
+                    self.nbytes += state.nbytes
+                    self._pending[seed] = self._generated
+                    self._generated += 1
+                    self._generating = None
+                    self._cond.notify_all()
+        except Exception as error:
+            with self._cond:
+                self._error = error
+                self._generating = None
+                self._cond.notify_all()
+        finally:
+            if env is not None:
+                env.close()
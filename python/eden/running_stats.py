@@ -0,0 +1,110 @@
+import numpy as np
+from typing import Dict, Union
+
+
+class RunningStats:
+    """
+    Per-feature mean and variance of a stream of batches, kept in float32.
+    Batches are folded in with the parallel form of Welford's algorithm, so
+    statistics gathered separately, e.g. by every EdenVecEnv worker, merge
+    into those of all their samples together.
+
+        count  number of samples seen
+        mean   (size,) running mean
+        m2     (size,) sum of squared deviations from the mean
+
+    While frozen, update() leaves the statistics as they are.
+    """
+    def __init__(self, size: int, epsilon: float = 1e-8) -> None:
+        self.size = size
+        self.epsilon = epsilon
+        self.frozen = False
+        self.count = 0.0
+        self.mean = np.zeros(size, dtype=np.float32)
+        self.m2 = np.zeros(size, dtype=np.float32)
+
+    @property
+    def var(self) -> np.ndarray:
+        if self.count == 0:
+            return np.ones(self.size, dtype=np.float32)
+        return self.m2 / np.float32(self.count)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.var + np.float32(self.epsilon))
+
+    def update(self, batch: np.ndarray) -> None:
+        '''Fold the (n, size) samples of batch into the statistics.'''
+        if self.frozen or len(batch) == 0:
+            return
+        mean = batch.mean(axis=0, dtype=np.float32)
+        m2 = batch.var(axis=0, dtype=np.float32) * np.float32(len(batch))
+        self._combine(float(len(batch)), mean, m2)
+
+    def normalize(self, x: np.ndarray, clip: Union[float, np.ndarray]) -> np.ndarray:
+        '''Standardize the float32 rows of x in place and clip them to [-clip, clip].'''
+        x -= self.mean
+        x /= self.std
+        return np.clip(x, -clip, clip, out=x)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        '''The statistics as plain arrays, to save, send to another process or merge().'''
+        return {'count': np.array(self.count), 'mean': self.mean.copy(), 'm2': self.m2.copy()}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> None:
+        assert state['mean'].shape == (self.size,), \
+            f"RunningStats: state has {state['mean'].shape[0]} features, expected {self.size}"
+        self.count = float(state['count'])
+        self.mean[:] = state['mean']
+        self.m2[:] = state['m2']
+
+    def merge(self, *states: Dict[str, np.ndarray]) -> None:
+        '''
+        Add the samples behind each state, which must not have been counted
+        here already, e.g. the states of other workers started from scratch.
+        '''
+        for state in states:
+            assert state['mean'].shape == (self.size,), \
+                f"RunningStats: state has {state['mean'].shape[0]} features, expected {self.size}"
+            self._combine(float(state['count']), state['mean'], state['m2'])
+
+    def remove(self, state: Dict[str, np.ndarray]) -> None:
+        '''
+        Take out the samples behind state, which were merged in or folded in
+        before the rest, e.g. to get what a worker gathered since it was last
+        given a merged state.
+        '''
+        count = float(state['count'])
+        assert count <= self.count, "RunningStats: state holds more samples than these statistics"
+        if count == 0:
+            return
+        rest = self.count - count
+        if rest == 0:
+            self.count = 0.0
+            self.mean[:] = 0
+            self.m2[:] = 0
+            return
+        mean = np.float64(count) * state['mean']
+        kept = (self.count * self.mean.astype(np.float64) - mean) / rest
+        delta = kept - state['mean']
+        m2 = self.m2.astype(np.float64) - state['m2'] - delta * delta * (count * rest / self.count)
+        self.count = rest
+        self.mean[:] = kept
+        self.m2[:] = np.maximum(m2, 0)
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            np.savez(f, **self.state())
+
+    def load(self, path: str) -> None:
+        with np.load(path, allow_pickle=False) as data:
+            self.load_state({name: data[name] for name in data.files})
+
+    def _combine(self, count: float, mean: np.ndarray, m2: np.ndarray) -> None:
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * np.float32(count / total)
+        self.m2 += m2 + delta * delta * np.float32(self.count * count / total)
+        self.count = total
@@ -0,0 +1,155 @@
+import re
+import numpy as np
+from typing import Any, Dict, Optional
+
+from eden.backend.config import BackendConfig
+
+# Columns of the compiled action table, chosen from the backend result code
+CODE_FAIL = 0
+CODE_ONE = 1
+CODE_TWO = 2
+CODE_MORE = 3
+
+# Result names of the actions whose codes 1 and 2 mean different outcomes
+_NAMED_RESULTS = {
+    'Attack': ('hit', 'kill'),
+    'Equip': ('equip', 'undress'),
+}
+# Actions whose result code is an item count scaling the reward
+_COUNTED = ('Pickup', 'Discard', 'Synthesize')
+
+
+class ScoreTable:
+    """
+    score.json compiled into dense arrays, so that the rewards of all agents
+    come from the raw result and observation arrays in a few NumPy operations:
+
+        action[action_id, target, code]  reward of an action outcome
+        count[action_id]                 whether the code scales the reward
+        attribute[agent_nameint, i]      weight of the i-th attribute delta
+        position[x, y]                   ScorePoint reward of a map cell
+        dead                             reward of a dead agent
+
+    `target` indexes target_names, built from the (type, id) pairs of the
+    backend result with 0 for an unknown target.
+    """
+    def __init__(self, score: Dict[str, Any], backend_cfg: BackendConfig, map_size_x: int, map_size_y: int) -> None:
+        action_list = backend_cfg.action_list
+        type_list = backend_cfg.type_list
+
+        # target lookup: [type, id] -> index into target_names
+        self.target_names = ['None']
+        typeids = []
+        for typeid, name in backend_cfg.typeid2name.items():
+            type_name, type_id = typeid.split(':')
+            typeids.append((type_list.index(type_name), int(type_id)))
+            self.target_names.append(name)
+        max_id = max([type_id for _, type_id in typeids] + [0])
+        self.target_index = np.zeros((len(type_list), max_id + 1), dtype=np.int64)
+        for index, (type_idx, type_id) in enumerate(typeids):
+            self.target_index[type_idx, type_id] = index + 1
+
+        self.action = np.zeros((len(action_list), len(self.target_names), 4), dtype=np.float64)
+        self.count = np.zeros(len(action_list), dtype=bool)
+        for action_id, action_name in enumerate(action_list):
+            entries = score.get(action_name, {})
+            self.count[action_id] = action_name in _COUNTED
+            for target, target_name in enumerate(self.target_names):
+                self.action[action_id, target] = self._compile_action(action_name, entries, target_name)
+
+        self.attribute = np.zeros((max(backend_cfg.attribute_dict.keys()) + 1,
+                                   max(len(names) for names in backend_cfg.attribute_dict.values())))
+        weights = score.get('Attribute', {})
+        for name_int, names in backend_cfg.attribute_dict.items():
+            for attr_id, attr_name in enumerate(names):
+                self.attribute[name_int, attr_id] = weights.get(attr_name, weights.get('default', 0.0))
+
+        self.position = np.zeros((map_size_x, map_size_y), dtype=np.float64)
+        for key, value in score.get('ScorePoint', {}).items():
+            match = re.fullmatch(r'(-?\d+)-(-?\d+)', key)
+            if match is None:
+                continue
+            x, y = int(match.group(1)), int(match.group(2))
+            if 0 <= x < map_size_x and 0 <= y < map_size_y:
+                self.position[x, y] = value
+
+        self.dead = float(score.get('Dead', 0.0))
+
+    @staticmethod
+    def _compile_action(action_name: str, entries: Dict[str, float], target_name: str) -> np.ndarray:
+        """Rewards of the four code columns, as Eden._action_reward used to pick them."""
+        fail = entries.get('fail', 0.0)
+        if action_name == 'Idle':
+            return np.full(4, entries.get('default', 0.0))
+        if action_name == 'Move':
+            return np.array([fail] + [entries.get('default', 0.0)] * 3)
+        if action_name in _NAMED_RESULTS:
+            values = [fail]
+            for result in _NAMED_RESULTS[action_name]:
+                default = entries.get('default_' + result, 0.0)
+                # a "<target>_<result>" entry only counts when "<target>" is a key itself
+                if target_name in entries:
+                    values.append(entries.get(f'{target_name}_{result}', default))
+                else:
+                    values.append(default)
+            return np.array(values + [fail])
+        success = entries.get(target_name, entries.get('default', 0.0))
+        return np.array([fail] + [success] * 3)
+
+    def targets(self, results: np.ndarray) -> np.ndarray:
+        """Index into target_names of the (type, id) target of every result row."""
+        type_idx = results[:, 1].astype(np.int64)
+        type_id = results[:, 2].astype(np.int64)
+        known = (type_idx >= 0) & (type_idx < self.target_index.shape[0]) & \
+                (type_id >= 0) & (type_id < self.target_index.shape[1])
+        target = np.zeros(len(results), dtype=np.int64)
+        target[known] = self.target_index[type_idx[known], type_id[known]]
+        return target
+
+    def rewards(
+            self,
+            results: np.ndarray,
+            curr_obs: np.ndarray,
+            prev_obs: Optional[np.ndarray],
+            alive: np.ndarray) -> np.ndarray:
+        """
+        Rewards of all agents for one step.
+
+        [Args]
+            results:  (n_agents, >=5) backend results
+            curr_obs: (n_agents, max_len) padded observation after the step
+            prev_obs: the padded observation before the step, or None
+            alive:    (n_agents,) bool
+        """
+        rewards = np.where(alive, 0.0, self.dead)
+        agents = np.flatnonzero(alive)
+        if len(agents) == 0:
+            return rewards
+        res = results[agents]
+        action_id = res[:, 0].astype(np.int64)
+        code = res[:, 3].astype(np.int64)
+        name_int = res[:, 4].astype(np.int64)
+
+        # action
+        target = self.targets(res)
+        column = np.where(code <= 0, CODE_FAIL, np.minimum(code, CODE_MORE))
+        reward = self.action[action_id, target, column]
+        reward *= np.where(self.count[action_id] & (code > 0), code, 1)
+
+        # attribute
+        obs = curr_obs[agents]
+        if prev_obs is not None:
+            n_attr = self.attribute.shape[1]
+            attr_count = obs[:, 6].astype(np.int64)
+            delta = obs[:, 7:7 + n_attr] - prev_obs[agents, 7:7 + n_attr]
+            valid = (np.arange(delta.shape[1]) < attr_count[:, None]) & (np.abs(delta) > 1e-4)
+            reward += (np.where(valid, delta, 0.0) * self.attribute[name_int, :delta.shape[1]]).sum(axis=1)
+
+        # position
+        x = obs[:, 4].astype(np.int64)
+        y = obs[:, 5].astype(np.int64)
+        on_map = (x >= 0) & (x < self.position.shape[0]) & (y >= 0) & (y < self.position.shape[1])
+        reward[on_map] += self.position[x[on_map], y[on_map]]
+
+        rewards[agents] = reward
+        return rewards
@@ -0,0 +1,159 @@
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional
+
+from eden.backend.config import BackendConfig
+from eden.score_table import ScoreTable
+
+# Public per-agent columns of StepInfo
+COLUMNS = ('action', 'target', 'move', 'result', 'position', 'attr_delta', 'dead')
+
+
+class StepInfo:
+    """
+    Step info of all agents as integer-coded columns, filled in place every
+    step so no per-agent dict is built unless asked for:
+
+        action[n]            action id, index into backend_cfg.action_list (-1 when dead)
+        target[n]            index into target_names, 0 for 'None'
+        move[n, 2]           (x, y) requested by a Move action
+        result[n]            backend result code
+        position[n, 2]       agent (x, y) after the step
+        attr_delta[n, A]     attribute increment since the previous step, 0 when below 1e-4
+        dead[n]              bool
+
+    Indexing or iterating yields the dicts Eden used to return, built lazily.
+    The buffers are reused: copy() the columns to keep them past the next step.
+    """
+    def __init__(self, backend_cfg: BackendConfig, score_table: ScoreTable, n_agents: int) -> None:
+        self._backend_cfg = backend_cfg
+        self._score_table = score_table
+        self.target_names = score_table.target_names
+        n_attr = score_table.attribute.shape[1]
+
+        self.action = np.full(n_agents, -1, dtype=np.int32)
+        self.target = np.zeros(n_agents, dtype=np.int32)
+        self.move = np.zeros((n_agents, 2), dtype=np.int32)
+        self.result = np.zeros(n_agents, dtype=np.int32)
+        self.position = np.zeros((n_agents, 2), dtype=np.int32)
+        self.attr_delta = np.zeros((n_agents, n_attr), dtype=np.float32)
+        self.dead = np.zeros(n_agents, dtype=bool)
+        self._name_int = np.zeros(n_agents, dtype=np.int64)
+        self._attr_count = np.zeros(n_agents, dtype=np.int64)
+        action_list = backend_cfg.action_list
+        self._move_id = action_list.index('Move') if 'Move' in action_list else -1
+        self._has_delta = False
+        self._dicts = None
+
+    def update(
+            self,
+            action: Any,
+            results: np.ndarray,
+            curr_obs: np.ndarray,
+            prev_obs: Optional[np.ndarray],
+            alive: np.ndarray) -> 'StepInfo':
+        """
+        Refill the columns from one step.
+
+        [Args]
+            action:   the actions passed to step, (n_agents, >=3)
+            results:  (n_agents, >=5) backend results
+            curr_obs: (n_agents, max_len) padded observation after the step
+            prev_obs: the padded observation before the step, or None
+            alive:    (n_agents,) bool
+        """
+        self._dicts = None
+        np.logical_not(alive, out=self.dead)
+        # dead rows keep the defaults; the padded arrays are as wide as the
+        # longest live row, so they are empty once every agent is dead
+        self.action[:] = -1
+        self.target[:] = 0
+        self.result[:] = 0
+        self._name_int[:] = 0
+        self.move[:] = 0
+        self.position[:] = 0
+        self.attr_delta[:] = 0
+        self._attr_count[:] = 0
+        self._has_delta = prev_obs is not None
+        agents = np.flatnonzero(alive)
+        if len(agents) == 0:
+            return self
+        res = results[agents]
+        self.action[agents] = res[:, 0]
+        self.target[agents] = self._score_table.targets(res)
+        self.result[agents] = res[:, 3]
+        self._name_int[agents] = res[:, 4]
+        movers = agents[self.action[agents] == self._move_id]
+        if len(movers):
+            self.move[movers] = np.asarray(action, dtype=np.float64)[movers, 1:3]
+
+        self.position[agents] = curr_obs[agents, 4:6]
+        self._attr_count[agents] = curr_obs[agents, 6]
+        if self._has_delta:
+            n_attr = max(min(self.attr_delta.shape[1], curr_obs.shape[1] - 7, prev_obs.shape[1] - 7), 0)
+            delta = curr_obs[agents, 7:7 + n_attr] - prev_obs[agents, 7:7 + n_attr]
+            valid = (np.arange(n_attr) < self._attr_count[agents, None]) & (np.abs(delta) > 1e-4)
+            self.attr_delta[agents, :n_attr] = np.where(valid, delta, 0)
+        return self
+
+    def result_name(self, agent_id: int) -> str:
+        action_name = self._backend_cfg.action_list[self.action[agent_id]]
+        result_int = int(self.result[agent_id])
+        if action_name == 'Attack':
+            return {1: 'hit', 2: 'kill'}.get(result_int, 'fail')
+        if action_name == 'Equip':
+            return {1: 'equip', 2: 'undress'}.get(result_int, 'fail')
+        if result_int <= 0:
+            return 'fail'
+        if action_name in ['Pickup', 'Discard', 'Synthesize']:
+            return str(result_int)
+        return 'success'
+
+    def _dict(self, agent_id: int) -> Dict[str, Any]:
+        if self.dead[agent_id]:
+            return {
+                'position': 'None',
+                'action': 'None',
+                'attr_increment': {},
+                'dead': True
+            }
+        action_name = self._backend_cfg.action_list[self.action[agent_id]]
+        target = 'None'
+        if action_name == 'Move':
+            target = f"({self.move[agent_id][0]},{self.move[agent_id][1]})"
+        elif action_name != 'Idle':
+            target = self.target_names[self.target[agent_id]]
+        increment = {}
+        if self._has_delta:
+            names = self._backend_cfg.attribute_dict[int(self._name_int[agent_id])]
+            for attribute_id in np.flatnonzero(self.attr_delta[agent_id, :self._attr_count[agent_id]]):
+                increment[names[attribute_id]] = self.attr_delta[agent_id, attribute_id]
+        return {
+            'position': f"{self.position[agent_id][0]}-{self.position[agent_id][1]}",
+            'action': action_name,
+            'target': target,
+            'result': self.result_name(agent_id),
+            'attr_increment': increment,
+            'dead': False
+        }
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Copies of the columns, all another process needs of the step info."""
+        return {name: getattr(self, name).copy() for name in COLUMNS}
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        if self._dicts is None:
+            self._dicts = [self._dict(agent_id) for agent_id in range(len(self))]
+        return self._dicts
+
+    def __len__(self) -> int:
+        return len(self.dead)
+
+    def __getitem__(self, agent_id):
+        if isinstance(agent_id, slice):
+            return self.to_dicts()[agent_id]
+        if self._dicts is not None:
+            return self._dicts[agent_id]
+        return self._dict(range(len(self))[agent_id])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.to_dicts())
@@ -0,0 +1,379 @@
+import os
+import traceback
+import multiprocessing as mp
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from eden.core import Eden, MatEden
+from eden.five_env import FiveEden
+from eden.running_stats import RunningStats
+from eden.step_info import StepInfo
+
+ENV_CLASSES = {
+    'eden-v0': Eden,
+    'eden-v1': MatEden,
+    'eden-v2': FiveEden,
+}
+
+
+def _obs_spec(env: Eden) -> Tuple[Tuple[int, ...], np.dtype, bool]:
+    '''Shape, dtype and whether the observation is padded raw rows (eden-v0).'''
+    if env.observation_space is None:
+        return (env.backend.agent_count, env.max_obs_len), np.dtype(np.float32), True
+    return tuple(env.observation_space.shape), np.dtype(env.observation_space.dtype), False
+
+
+def _write_obs(env: Eden, obs, obs_buf: np.ndarray, len_buf: np.ndarray, padded: bool) -> None:
+    if not padded:
+        obs_buf[:] = obs
+        return
+    # only the prefix up to the longest row changes, zero padding after it
+    width = int(env.lengths.max(initial=0))
+    if width > obs_buf.shape[1]:
+        raise ValueError(f"vec env: an observation of length {width} exceeds the padded width "
+                         f"{obs_buf.shape[1]}, pass a larger max_obs_len to the envs")
+    stale = int(len_buf.max(initial=0))
+    obs_buf[:, :width] = obs[:, :width]
+    if stale > width:
+        obs_buf[:, width:stale] = 0
+    len_buf[:] = env.lengths
+
+
+def _obs_stats(env) -> RunningStats:
+    stats = getattr(env, 'obs_stats', None)
+    assert stats is not None, "vec env: observation statistics need a wrapper=ObsScale with normalize=True"
+    return stats
+
+
+def _sync_obs_stats(states: List[Dict[str, np.ndarray]],
+                    base: Optional[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    '''
+    Merge what every environment gathered since it was handed base, the merged
+    state of the previous sync, into base.
+    '''
+    merged = RunningStats(len(states[0]['mean']))
+    if base is not None:
+        merged.load_state(base)
+    for state in states:
+        gathered = RunningStats(merged.size)
+        gathered.load_state(state)
+        if base is not None:
+            gathered.remove(base)
+        merged.merge(gathered.state())
+    return merged.state()
+
+
+def _step_into(env: Eden, action, seed: int, num_envs: int, obs_buf: np.ndarray, len_buf: np.ndarray,
+               reward_buf: np.ndarray, done_buf: np.ndarray, padded: bool) -> Tuple[Dict[str, Any], int]:
+    '''Step env and write the outcome into its buffer rows, resetting it once all agents are done.'''
+    obs, reward, done, info = env.step(action)
+    reward_buf[:] = reward
+    done_buf[:] = done
+    episode_info = {}
+    if np.all(done):
+        # eden-v0 returns its observation buffer, which the reset below overwrites;
+        # only the prefix up to the longest row is kept
+        if padded:
+            obs = obs[:, :int(env.lengths.max(initial=0))]
+        episode_info['terminal_observation'] = np.copy(obs)
+        seed += num_envs
+        obs = env.reset(seed)
+    # a StepInfo is sent as its columns, without the config and score table it refers to
+    episode_info['info'] = info.columns() if isinstance(info, StepInfo) else info
+    _write_obs(env, obs, obs_buf, len_buf, padded)
+    return episode_info, seed
+
+
+def _worker(remote, parent_remote, env_id: str, config_dir: str, wrapper: Optional[Callable],
+            env_kwargs: Dict[str, Any]) -> None:
+    '''
+    Every request is answered with ('ok', payload), or with ('error', traceback)
+    after which the worker exits; EdenVecEnv re-raises the error.
+    '''
+    parent_remote.close()
+    env = None
+    shms = []
+    try:
+        env = ENV_CLASSES[env_id](config_dir=config_dir, **env_kwargs)
+        if wrapper is not None:
+            env = wrapper(env)
+        obs_shape, obs_dtype, padded = _obs_spec(env)
+        remote.send(('ok', (obs_shape, obs_dtype.str, padded)))
+
+        # The parent answers with the shared blocks and this worker's row in them
+        blocks, index, num_envs = remote.recv()
+        views = []
+        for name, shape, dtype in blocks:
+            shm = shared_memory.SharedMemory(name=name)
+            shms.append(shm)
+            views.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf)[index])
+        obs_buf, len_buf, reward_buf, done_buf = views
+        del views
+
+        seed = 0
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                episode_info, seed = _step_into(
+                    env, data, seed, num_envs, obs_buf, len_buf, reward_buf, done_buf, padded)
+                remote.send(('ok', episode_info))
+            elif cmd == 'reset':
+                seed = data
+                _write_obs(env, env.reset(seed), obs_buf, len_buf, padded)
+                remote.send(('ok', None))
+            elif cmd == 'get_obs_stats':
+                remote.send(('ok', _obs_stats(env).state()))
+            elif cmd == 'set_obs_stats':
+                _obs_stats(env).load_state(data)
+                remote.send(('ok', None))
+            elif cmd == 'close':
+                break
+            else:
+                raise ValueError(f"EdenVecEnv: unknown command {cmd}")
+        del obs_buf, len_buf, reward_buf, done_buf
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        try:
+            remote.send(('error', traceback.format_exc()))
+        except (BrokenPipeError, OSError):
+            pass
+    finally:
+        if env is not None:
+            env.close()
+        for shm in shms:
+            shm.close()
+        remote.close()
+
+
+def _recv(remote) -> Any:
+    '''The payload of a worker's answer, raising the error a worker failed with.'''
+    try:
+        status, payload = remote.recv()
+    except EOFError:
+        raise RuntimeError("EdenVecEnv: a worker exited without answering") from None
+    if status == 'error':
+        raise RuntimeError(f"EdenVecEnv: a worker failed with\n{payload}")
+    return payload
+
+
+class EdenVecEnv:
+    '''
+    Runs num_envs environments of env_id in worker processes. Workers write
+    observations, rewards and done flags into shared memory, so step() returns
+    views of those blocks without pickling observations:
+
+        obs:     (num_envs, *observation shape); for eden-v0 the raw rows padded
+                 to env.max_obs_len, with valid lengths in obs_lengths. A longer
+                 row raises; max_obs_len can be passed in env_kwargs.
+        rewards: (num_envs, n_agents) float32
+        dones:   (num_envs, n_agents) bool
+
+    The views are overwritten by the next reset()/step(), copy them to keep
+    them. An environment whose agents are all done is reset right away with
+    its seed advanced by num_envs; its last observation is then found in
+    infos[i]['terminal_observation'], cut to the longest row for eden-v0.
+    infos[i]['info'] is the env's step info; with info_format='array' it is
+    the dict of StepInfo.columns().
+
+    wrapper, if given, is applied to every environment in its worker, e.g.
+    functools.partial(ObsScale, normalize=True). The observation statistics
+    of such ObsScale wrappers are fetched with get_obs_stats() and kept alike
+    across workers with sync_obs_stats().
+    '''
+    def __init__(
+            self,
+            config_dir: str = './config',
+            num_envs: int = 1,
+            env_id: str = 'eden-v0',
+            start_method: Optional[str] = None,
+            wrapper: Optional[Callable] = None,
+            **env_kwargs) -> None:
+        if env_id not in ENV_CLASSES:
+            raise ValueError(f"EdenVecEnv: unknown env_id {env_id}, expected one of {list(ENV_CLASSES)}")
+        self.num_envs = num_envs
+        self.env_id = env_id
+        self.closed = False
+        self._shms = []
+        self._obs_stats_base = None
+
+        if os.name == 'posix':
+            # Workers have to share the parent's tracker, otherwise each one
+            # starts its own and reports the blocks it attached to as leaked
+            resource_tracker.ensure_running()
+        ctx = mp.get_context(start_method)
+        self._remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(num_envs)])
+        self._processes = []
+        for remote, work_remote in zip(self._remotes, work_remotes):
+            process = ctx.Process(
+                target=_worker,
+                args=(work_remote, remote, env_id, config_dir, wrapper, env_kwargs),
+                daemon=True)
+            process.start()
+            work_remote.close()
+            self._processes.append(process)
+
+        specs = [_recv(remote) for remote in self._remotes]
+        obs_shape, obs_dtype, self.padded = specs[0]
+        self.n_agents = obs_shape[0]
+        shapes = [
+            ((num_envs,) + obs_shape, np.dtype(obs_dtype)),
+            ((num_envs, self.n_agents), np.dtype(np.int32)),
+            ((num_envs, self.n_agents), np.dtype(np.float32)),
+            ((num_envs, self.n_agents), np.dtype(bool)),
+        ]
+        arrays = []
+        for shape, dtype in shapes:
+            shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+            self._shms.append(shm)
+            arrays.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+        self.obs, self.obs_lengths, self.rewards, self.dones = arrays
+        blocks = [(shm.name, shape, dtype.str) for shm, (shape, dtype) in zip(self._shms, shapes)]
+        for index, remote in enumerate(self._remotes):
+            remote.send((blocks, index, num_envs))
+
+    def reset(self, seeds: Optional[Sequence[int]] = None) -> np.ndarray:
+        if seeds is None:
+            seeds = range(self.num_envs)
+        assert len(seeds) == self.num_envs, "EdenVecEnv: one seed per environment is required"
+        for remote, seed in zip(self._remotes, seeds):
+            remote.send(('reset', int(seed)))
+        for remote in self._remotes:
+            _recv(remote)
+        return self.obs
+
+    def step(self, actions: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+        assert len(actions) == self.num_envs, "EdenVecEnv: one action per environment is required"
+        for remote, action in zip(self._remotes, actions):
+            remote.send(('step', action))
+        infos = [_recv(remote) for remote in self._remotes]
+        return self.obs, self.rewards, self.dones, infos
+
+    def get_obs_stats(self) -> List[Dict[str, np.ndarray]]:
+        '''The RunningStats state of every worker's ObsScale, e.g. to merge() or save.'''
+        for remote in self._remotes:
+            remote.send(('get_obs_stats', None))
+        return [_recv(remote) for remote in self._remotes]
+
+    def set_obs_stats(self, state: Dict[str, np.ndarray]) -> None:
+        '''Load state into the ObsScale of every worker.'''
+        for remote in self._remotes:
+            remote.send(('set_obs_stats', state))
+        for remote in self._remotes:
+            _recv(remote)
+        self._obs_stats_base = state
+
+    def sync_obs_stats(self) -> Dict[str, np.ndarray]:
+        '''
+        Merge the samples every worker's ObsScale has seen since the last sync
+        and hand the result to all of them, so they normalize alike. Returns
+        the merged state.
+        '''
+        state = _sync_obs_stats(self.get_obs_stats(), self._obs_stats_base)
+        self.set_obs_stats(state)
+        return state
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        for remote in self._remotes:
+            try:
+                remote.send(('close', None))
+            except (BrokenPipeError, OSError):
+                # the worker has already exited after an error
+                pass
+        for process in self._processes:
+            process.join()
+        self.obs = self.obs_lengths = self.rewards = self.dones = None
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self.closed = True
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
+
+
+class EdenThreadVecEnv:
+    '''
+    Same interface as EdenVecEnv, but the environments live in this process
+    and are stepped from a thread pool, with no IPC and no per process copy
+    of the environment.
+
+    By default the environments do NOT tick in parallel: native Game calls
+    are serialized by one process-wide lock, as the Game has not been
+    verified to keep no global state. Call
+    eden.backend.interface.set_concurrent_games(True) before the first step
+    to let the native ticks, which run without the GIL, overlap. The Python
+    side of a step (done, info and reward computation) takes turns on the
+    GIL either way.
+    '''
+    def __init__(
+            self,
+            config_dir: str = './config',
+            num_envs: int = 1,
+            env_id: str = 'eden-v0',
+            num_threads: Optional[int] = None,
+            wrapper: Optional[Callable] = None,
+            **env_kwargs) -> None:
+        if env_id not in ENV_CLASSES:
+            raise ValueError(f"EdenThreadVecEnv: unknown env_id {env_id}, expected one of {list(ENV_CLASSES)}")
+        self.num_envs = num_envs
+        self.env_id = env_id
+        self.envs = [ENV_CLASSES[env_id](config_dir=config_dir, **env_kwargs) for _ in range(num_envs)]
+        if wrapper is not None:
+            self.envs = [wrapper(env) for env in self.envs]
+        self._obs_stats_base = None
+
+        obs_shape, obs_dtype, self.padded = _obs_spec(self.envs[0])
+        self.n_agents = obs_shape[0]
+        self.obs = np.zeros((num_envs,) + obs_shape, dtype=obs_dtype)
+        self.obs_lengths = np.zeros((num_envs, self.n_agents), dtype=np.int32)
+        self.rewards = np.zeros((num_envs, self.n_agents), dtype=np.float32)
+        self.dones = np.zeros((num_envs, self.n_agents), dtype=bool)
+        self._seeds = list(range(num_envs))
+        self._pool = ThreadPoolExecutor(max_workers=num_threads or num_envs)
+
+    def reset(self, seeds: Optional[Sequence[int]] = None) -> np.ndarray:
+        if seeds is None:
+            seeds = range(self.num_envs)
+        assert len(seeds) == self.num_envs, "EdenThreadVecEnv: one seed per environment is required"
+        self._seeds = [int(seed) for seed in seeds]
+        list(self._pool.map(self._reset_one, range(self.num_envs)))
+        return self.obs
+
+    def step(self, actions: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+        assert len(actions) == self.num_envs, "EdenThreadVecEnv: one action per environment is required"
+        infos = list(self._pool.map(self._step_one, range(self.num_envs), actions))
+        return self.obs, self.rewards, self.dones, infos
+
+    def get_obs_stats(self) -> List[Dict[str, np.ndarray]]:
+        return [_obs_stats(env).state() for env in self.envs]
+
+    def set_obs_stats(self, state: Dict[str, np.ndarray]) -> None:
+        for env in self.envs:
+            _obs_stats(env).load_state(state)
+        self._obs_stats_base = state
+
+    def sync_obs_stats(self) -> Dict[str, np.ndarray]:
+        state = _sync_obs_stats(self.get_obs_stats(), self._obs_stats_base)
+        self.set_obs_stats(state)
+        return state
+
+    def close(self) -> None:
+        self._pool.shutdown()
+        for env in self.envs:
+            env.close()
+
+    def _reset_one(self, index: int) -> None:
+        obs = self.envs[index].reset(self._seeds[index])
+        _write_obs(self.envs[index], obs, self.obs[index], self.obs_lengths[index], self.padded)
+
+    def _step_one(self, index: int, action) -> Dict[str, Any]:
+        episode_info, self._seeds[index] = _step_into(
+            self.envs[index], action, self._seeds[index], self.num_envs, self.obs[index],
+            self.obs_lengths[index], self.rewards[index], self.dones[index], self.padded)
+        return episode_info
@@ -0,0 +1,80 @@
+"""
+Map layers around the agents' vision.
+
+An agent sees the cells within Manhattan distance `vision` of its position.
+Instead of testing every cell of the map, the diamond of a radius is built
+once and pasted around the agent with slicing.
+
+Egocentric observations cover a (2r+1, 2r+1) window of the map centered on
+the agent, and may add a coarse minimap of the whole map.
+"""
+import numpy as np
+from functools import lru_cache
+from typing import List, Tuple
+
+
+def decode_landform(ui: List[float], map_size_x: int, map_size_y: int) -> np.ndarray:
+    '''
+    Landform NameInt of every cell from Backend.ui(), as a (map_size_x, map_size_y) int grid.
+    The ui holds 6 floats per cell with the landform NameInt second.
+    '''
+    ui = np.asarray(ui, dtype=np.float64)
+    i = np.arange(map_size_x)[:, None]
+    j = np.arange(map_size_y)[None, :]
+    return ui[(i * map_size_x + j) * 6 + 1].astype(np.int64)
+
+
+@lru_cache(maxsize=None)
+def diamond(radius: int) -> np.ndarray:
+    '''(2r+1, 2r+1) bool mask of the offsets within Manhattan distance r, read-only.'''
+    offset = np.abs(np.arange(-radius, radius + 1))
+    mask = offset[:, None] + offset[None, :] <= radius
+    mask.setflags(write=False)
+    return mask
+
+
+def paste_diamond(out: np.ndarray, source: np.ndarray, x: int, y: int, vision: float,
+                  origin: Tuple[int, int] = (0, 0)) -> None:
+    '''
+    Copy the cells of source within Manhattan distance vision of (x, y) into out.
+    source is (map_size_x, map_size_y) and out covers its cells from origin on, the
+    whole map by default. Cells outside the diamond are left untouched.
+    '''
+    radius = int(np.floor(vision))
+    if radius < 0:
+        return
+    x, y = int(x), int(y)
+    ox, oy = int(origin[0]), int(origin[1])
+    x0, x1 = max(x - radius, 0, ox), min(x + radius + 1, source.shape[0], ox + out.shape[0])
+    y0, y1 = max(y - radius, 0, oy), min(y + radius + 1, source.shape[1], oy + out.shape[1])
+    if x0 >= x1 or y0 >= y1:
+        return
+    mask = diamond(radius)[x0 - x + radius:x1 - x + radius, y0 - y + radius:y1 - y + radius]
+    window = out[x0 - ox:x1 - ox, y0 - oy:y1 - oy]
+    window[mask] = source[x0:x1, y0:y1][mask]
+
+
+def window_origin(position: np.ndarray, radius: int) -> np.ndarray:
+    '''(n, 2) map cell at the corner of the (2r+1, 2r+1) window centered on every (x, y) of position.'''
+    return np.asarray(position).astype(np.int64) - radius
+
+
+def window_inside(origin: np.ndarray, side: int, map_size_x: int, map_size_y: int) -> np.ndarray:
+    '''(n, side, side) bool, whether every cell of the windows at origin lies on the map.'''
+    cells = np.arange(side)
+    inside_x = (origin[:, 0, None] + cells >= 0) & (origin[:, 0, None] + cells < map_size_x)
+    inside_y = (origin[:, 1, None] + cells >= 0) & (origin[:, 1, None] + cells < map_size_y)
+    return inside_x[:, :, None] & inside_y[:, None, :]
+
+
+def minimap_cell(cells: np.ndarray, size: int, map_size_x: int, map_size_y: int) -> np.ndarray:
+    '''(m, 2) cell of the (size, size) minimap each (x, y) map cell falls in.'''
+    cells = np.asarray(cells, dtype=np.int64)
+    return np.stack([cells[:, 0] * size // map_size_x, cells[:, 1] * size // map_size_y], axis=1)
+
+
+def minimap_center(cells: np.ndarray, size: int, map_size_x: int, map_size_y: int) -> np.ndarray:
+    '''(m, 2) map cell at the center of every (x, y) minimap cell, the inverse of minimap_cell.'''
+    cells = np.asarray(cells, dtype=np.int64)
+    return np.stack([(2 * cells[:, 0] + 1) * map_size_x // (2 * size),
+                     (2 * cells[:, 1] + 1) * map_size_y // (2 * size)], axis=1)
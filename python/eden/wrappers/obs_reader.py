@@ -1,6 +1,7 @@
 from gym import spaces
 from gym import ObservationWrapper
 import numpy as np
+from eden.obs_layout import BLOCK_INDEX
 
 
 class ObsReader(ObservationWrapper):
@@ -55,8 +56,10 @@ class ObsReader(ObservationWrapper):
             'Stone': -1, 'Branch': -1, 'Leather': -1, 'GodWeapon': -1, 'Tendon': -1, 'Wood': -1, 
             'Hair': -1}
         '''
-        obs = self.unwrapped.obs
-        self._block_milestone(obs)
+        layout = self.unwrapped.layout
+        self._block_milestone(layout)
+        # rows cut to their valid length, empty when dead
+        obs = [ob[:length] for ob, length in zip(layout.obs, layout.lengths)]
 
         self.obs_dict = {}
         for agent_typeid in self.agent_list:
@@ -107,71 +110,25 @@ class ObsReader(ObservationWrapper):
             
             last_index = next_index
 
-    def _block_milestone(self, obs):
-        if isinstance(obs,np.ndarray):
-            obs = obs.tolist()
+    def _block_milestone(self, layout):
+        assert np.all(layout.end == layout.lengths), "observation blocks do not add up to the row lengths"
+        # every milestone but map and agent is the index of the block's count
         self.block_milestone = {}
-        agent_id = 0
-        for ob in obs:
-            block_milestone = {}
-            
-            if len(ob) == 0:
-                self.block_milestone[agent_id] = block_milestone
-                agent_id += 1
+        for agent_id in range(len(layout)):
+            if not layout.alive[agent_id]:
+                self.block_milestone[agent_id] = {}
                 continue
-            
-            Cursor = 0
-            block_milestone['map'] = Cursor
-
-            # part 1: basic infomation of env
-            Cursor += 4
-            block_milestone['agent'] = Cursor
-
-            # part 2: basic infomation of agent
-            Cursor += 2
-            attr_num = round(ob[Cursor])
-            Cursor += 1
-            Cursor += attr_num
-            block_milestone['backpack'] = Cursor
-
-            # part 3: backpack and equipment
-            backpack_num = round(ob[Cursor] * 2)
-            Cursor += 1
-            Cursor += backpack_num
-            block_milestone['equipment'] = Cursor
-
-            equipment_num = round(ob[Cursor])
-            Cursor += 1
-            Cursor += equipment_num
-            block_milestone['other_agent'] = Cursor
-
-            # part 4: other agent      
-            agent_num = round(ob[Cursor] * 3)
-            Cursor += 1
-            Cursor += agent_num
-            block_milestone['being'] = Cursor
-
-            # part 5: being
-            being_num = round(ob[Cursor] * 3)
-            Cursor += 1
-            Cursor += being_num
-            block_milestone['resource'] = Cursor
-            
-            # part 6: resource
-            resource_num = round(ob[Cursor] * 3)
-            Cursor += 1
-            Cursor += resource_num
-            block_milestone['item'] = Cursor
-
-            # part 7: item
-            item_num = round(ob[Cursor] * 3)
-            Cursor += 1
-            Cursor += item_num
-            assert Cursor == len(ob)
-
-            self.block_milestone[agent_id] = block_milestone
-            agent_id += 1
-        assert agent_id == len(obs)
+            start = layout.start[agent_id]
+            self.block_milestone[agent_id] = {
+                'map':         0,
+                'agent':       4,
+                'backpack':    int(start[BLOCK_INDEX['backpack']]) - 1,
+                'equipment':   int(start[BLOCK_INDEX['equipment']]) - 1,
+                'other_agent': int(start[BLOCK_INDEX['agent']]) - 1,
+                'being':       int(start[BLOCK_INDEX['being']]) - 1,
+                'resource':    int(start[BLOCK_INDEX['resource']]) - 1,
+                'item':        int(start[BLOCK_INDEX['item']]) - 1,
+            }
 
     def _read_map(self, ob, agent_id=0):
         map = {}
@@ -1,160 +1,169 @@
 from gym import spaces
 from gym import ObservationWrapper
 import numpy as np
+from eden.obs_layout import ObsLayout
+from eden.running_stats import RunningStats
 
 class ObsScale(ObservationWrapper):
     """
-        Analyze observation protocol and scale
+        Analyze observation protocol and scale.
+
+        Every agent gets a row of fixed length, set by the BackendConfig:
+
+            season, daytime, weather, landform, x, y,
+            attributes,
+            (item, count) per backpack slot,
+            item per equipment slot,
+            (name_int, x, y) of the n_target nearest other agents,
+            (name_int, x, y) of the n_target nearest of every being, resource
+            and item type, in the order of the config lists,
+
+        nearest first and -1 where a block holds fewer entries. The row of a
+        dead agent is all -1. All agents are encoded at once. n_target=0, the
+        old default, is read as 1, the single nearest it always gave.
+
+        With normalize, the rows of alive agents are also standardized by the
+        running per-feature statistics in obs_stats, updated with every
+        observation in the same pass unless frozen, and clipped to
+        [-clip, clip]. clip is a number or one bound per feature.
     """
-    def __init__(self, env, n_target = 0, **kwargs):
+    def __init__(self, env, n_target = 1, normalize = False, clip = 10.0, epsilon = 1e-8, **kwargs):
         super().__init__(env)
+        assert n_target >= 0, f"ObsScale: n_target should not be negative, got {n_target}"
+        n_target = max(n_target, 1)
         self.n_target = n_target
         
         self.item_IDs     = self.backend_cfg.item_list
         self.being_IDs    = self.backend_cfg.being_list
         self.resource_IDs = self.backend_cfg.resource_list
-    
-    def reset(self, seed=0):
-        o = self.env.reset(seed=seed)
-        obs_len = 0
-        for single in o:
-            single_obs_len = 6
-            cursor = 6 # skip: season, daytime, weather, landform, x, y
-            # attribute
-            single_obs_len += int(single[cursor]) + 1
-            cursor += int(single[cursor]) + 1
-            # backpack
-            single_obs_len += int(single[cursor]) * 2 + 1
-            cursor += int(single[cursor]) * 2 + 1
-            # equipment
-            single_obs_len += int(single[cursor])
-            # other agent, being, resource, item
-            single_obs_len += 3 * 4
-            obs_len = max(obs_len, single_obs_len)
+
+        agents = list(self.backend_cfg.agent_dict.values())
+        self.attribute_size = max(len(names) for names in self.backend_cfg.attribute_dict.values())
+        self.backpack_size  = max(int(agent['BackpackSize']) for agent in agents)
+        self.equipment_size = max(len(agent['Slot'].split(';')) for agent in agents)
+        self._typed = (
+            ('being', np.array(self.being_IDs)),
+            ('resource', np.array(self.resource_IDs)),
+            ('item', np.array(self.item_IDs)),
+        )
+        n_types = 1 + len(self.being_IDs) + len(self.resource_IDs) + len(self.item_IDs)
+        obs_len = 6 + self.attribute_size + 2 * self.backpack_size + self.equipment_size + 3 * n_target * n_types
+
+        self.obs_stats = None
+        low, high = -10, 1000
+        if normalize:
+            self.clip = np.broadcast_to(np.asarray(clip, dtype=np.float32), (obs_len,))
+            assert np.all(self.clip > 0), "ObsScale: clip should be positive"
+            self.obs_stats = RunningStats(obs_len, epsilon)
+            low, high = np.broadcast_to(-self.clip, (self.backend.agent_count, obs_len)), \
+                np.broadcast_to(self.clip, (self.backend.agent_count, obs_len))
 
         self.observation_space = spaces.Box(
-            low=-10, 
-            high=1000, 
+            low=low, 
+            high=high, 
             shape=(
                 self.backend.agent_count,
                 obs_len
-            )
+            ),
+            dtype=np.float32
         )
-        return o
+
+    def freeze(self):
+        '''Keep normalizing with the statistics so far, e.g. for evaluation.'''
+        assert self.obs_stats is not None, "ObsScale: freeze() needs normalize=True"
+        self.obs_stats.frozen = True
+
+    def unfreeze(self):
+        assert self.obs_stats is not None, "ObsScale: unfreeze() needs normalize=True"
+        self.obs_stats.frozen = False
+    
+    def reset(self, seed=0):
+        o = self.env.reset(seed=seed)
+        return self.observation(o)
+
+    def step(self, action):
+        o, r, d, i = self.env.step(action)
+        return self.observation(o), r, d, i
 
     def observation(self, observation):
         return self._obs_scale(observation)
     
-    def _obs_scale(self,observations):
-        new_observations = []
-        for obs in observations:
-            new_observations.append(self._obs_scale_1d(obs))
-        return np.array(new_observations)
-
-    def _obs_scale_1d(self, observation):
-        if len(observation) < 1:
-            return np.array([])
-        if isinstance(observation,np.ndarray):
-            obs = observation.tolist()
+    def _layout(self, observations):
+        # the unwrapped env has already parsed its own observation this tick
+        eden = self.unwrapped
+        if observations is eden.curr_obs or observations.base is eden.curr_obs:
+            return eden.layout
+        return ObsLayout(observations, eden.lengths)
+
+    def _obs_scale(self, observations):
+        layout = self._layout(observations)
+        assert np.all(layout.end == layout.lengths), "observation blocks do not add up to the row lengths"
+        new_observations = np.full(self.observation_space.shape, -1, dtype=np.float32)
+        if not layout.alive.any():
+            return new_observations
+        n_agents = len(layout)
+        # part 1: env and position
+        new_observations[:, :6] = layout.obs[:, :6]
+        column = 6
+        # part 2 and 3: attributes, backpack and equipment, padded to the sizes of the config
+        for name, size in (('attribute', self.attribute_size),
+                           ('backpack', 2 * self.backpack_size),
+                           ('equipment', self.equipment_size)):
+            values = layout.gather(name).reshape(n_agents, -1)[:, :size]
+            new_observations[:, column:column + values.shape[1]] = values
+            column += size
+        # part 4: nearest agents, then nearest of every being, resource and item type
+        position = np.rint(layout.position).astype(np.int64)
+        blocks = (('agent', None),) + self._typed
+        for name, IDs in blocks:
+            nearest = self._nearest(layout.gather(name), layout.counts(name), position, IDs).reshape(n_agents, -1)
+            new_observations[:, column:column + nearest.shape[1]] = nearest
+            column += nearest.shape[1]
+        # part 5: normalization, in place on the rows just written
+        if self.obs_stats is not None:
+            alive = new_observations if layout.alive.all() else new_observations[layout.alive]
+            self.obs_stats.update(alive)
+            self.obs_stats.normalize(new_observations, self.clip)
+        new_observations[~layout.alive] = -1
+        return new_observations
+
+    def _nearest(self, entries, counts, position, IDs = None):
+        '''
+        The n_target sightings nearest to every agent, by manhattan distance.
+
+        [Args]
+            entries:  (n_agents, max_count, 3) sightings as (name_int, x, y)
+            counts:   (n_agents,) number of valid sightings of every agent
+            position: (n_agents, 2) agent positions
+            IDs:      name_ints to keep the nearest of separately, all sightings together if None
+
+        [Return]
+            (n_agents, n_types, n_target, 3) sightings, nearest first, ties going
+            to the earlier one in the row, -1 past the sightings found
+        '''
+        n_agents, max_count = entries.shape[:2]
+        valid = np.arange(max_count) < counts[:, None]
+        if IDs is None:
+            match = valid[:, None, :]
         else:
-            obs = observation
-        obs_scaled = []
-        Cursor = 0
-        # part 1:basic infomation of env
-        obs_scaled += obs[Cursor:Cursor+4]
-        Cursor += 4
-
-        # part 2: basic infomation of agent
-        obs_scaled += obs[Cursor:Cursor+2] #position
-        agent_posi = obs[Cursor:Cursor+2]
-        Cursor += 2
-
-        attr_num = round(obs[Cursor])
-        Cursor += 1
-        obs_scaled += obs[Cursor:Cursor+attr_num] #attribute
-        Cursor += attr_num
-
-        # part 3: backpack and equipment
-        backpack_num = round(obs[Cursor] * 2)
-        Cursor += 1
-        obs_scaled += obs[Cursor:Cursor+backpack_num] #backpack
-        Cursor += backpack_num
-
-        equipment_num = round(obs[Cursor])
-        Cursor += 1
-        obs_scaled += obs[Cursor:Cursor+equipment_num] #equipment
-        Cursor += equipment_num
-
-        # part 4: find nearest agent,being,resource       
-        agent_num = round(obs[Cursor] * 3)
-        Cursor += 1
-        obs_scaled += self.find_nearest(agent_posi,obs[Cursor:Cursor+agent_num]) #agent
-        Cursor += agent_num
-
-        being_num = round(obs[Cursor] * 3)
-        Cursor += 1
-        obs_scaled += self.find_nearest(agent_posi,obs[Cursor:Cursor+being_num],self.being_IDs) #being
-        Cursor += being_num
-
-        resource_num = round(obs[Cursor] * 3)
-        Cursor += 1
-        obs_scaled += self.find_nearest(agent_posi,obs[Cursor:Cursor+resource_num],self.resource_IDs) #resource
-        Cursor += resource_num
-
-        item_num = round(obs[Cursor] * 3)
-        Cursor += 1
-        obs_scaled += self.find_nearest(agent_posi,obs[Cursor:Cursor+item_num],self.item_IDs) #item
-        Cursor += item_num
-
-        assert Cursor == len(obs)
-        return np.array(obs_scaled)
-
-    def find_nearest(self, agent_posi, obs_slice, IDs = None):
-        if IDs is None: #agent
-            if len(obs_slice) == 0:
-                return [-1,-1,-1]
-            if len(obs_slice) == 3:
-                return obs_slice
-
-            assert len(obs_slice) % 3 == 0
-            minIndex = 0
-            minDistance = -1
-            for i in range(0,len(obs_slice),3):
-                distance = self.manhattan(agent_posi,obs_slice[i+1:i+3])
-                if minDistance == -1 or distance < minDistance:
-                    minIndex = i
-                    minDistance = distance
-            return obs_slice[minIndex:minIndex+3]
-            
-        elif isinstance(IDs,list): #being & resource
-            id = {}
-            for key in IDs:
-                if key in id.keys():
-                    print(f"[Warning in obs_scale] there is two same id")
-                    continue                    
-                id[key] = [-1,-1] #[minIndex,minDistance]
-            for i in range(0,len(obs_slice),3):
-                distance = self.manhattan(agent_posi,obs_slice[i+1:i+3])
-                nameInt = round(obs_slice[i])
-                if nameInt in id.keys():
-                    if id[nameInt][1] == -1 or distance < id[nameInt][1]:
-                        id[nameInt][0] = i
-                        id[nameInt][1] = distance
-            new_obs_slice = []
-            for key in IDs:
-                minIndex = id[key][0]
-                if minIndex != -1:
-                    new_obs_slice += obs_slice[minIndex:minIndex+3]
-                else:
-                    new_obs_slice += [-1,-1,-1]
-            return new_obs_slice         
-
+            match = valid[:, None, :] & (np.rint(entries[:, None, :, 0]) == IDs[None, :, None])
+        distance = np.abs(np.rint(entries[:, :, 1:3]).astype(np.int64) - position[:, None, :]).sum(axis=2)
+        # distance first, row order second, unmatched last
+        missing = np.iinfo(np.int64).max
+        key = np.where(match, (distance * max_count + np.arange(max_count))[:, None, :], missing)
+
+        k = self.n_target
+        if max_count > k:
+            index = np.argpartition(key, k - 1, axis=2)[:, :, :k]
         else:
-            print(f"[ERROR in obs_scale] IDs should be a list, but it's a {type(IDs)}") #just in case
-            return []
-
-    def manhattan(self, A, B):
-        return abs(A[0] - B[0]) + abs(A[1] - B[1])
+            index = np.broadcast_to(np.arange(max_count), key.shape)
+        index = np.take_along_axis(index, np.take_along_axis(key, index, axis=2).argsort(axis=2), axis=2)
+        found = np.take_along_axis(key, index, axis=2) != missing
+
+        nearest = np.full(key.shape[:2] + (k, 3), -1, dtype=np.float32)
+        rows = np.arange(n_agents)[:, None, None]
+        nearest[:, :, :index.shape[2]] = np.where(found[..., None], entries[rows, index], -1)
+        return nearest
 
 if __name__ == '__main__':
     import gym, eden
@@ -1,6 +1,8 @@
 import os
 import json
+import warnings
 from gym import Wrapper
+from eden.score_table import ScoreTable
 
 class Reward(Wrapper):
     def __init__(self, env, config_dir='./config'):
@@ -8,107 +10,22 @@ class Reward(Wrapper):
         score_filepath = os.path.join(config_dir, 'score.json')
         assert os.path.exists(score_filepath), f"{score_filepath} does not exist"
         self.reward_table = json.load(open(score_filepath, 'r'))
+        eden = self.unwrapped
+        self.score_table = ScoreTable(self.reward_table, eden.backend_cfg, eden.map_size_x, eden.map_size_y)
     
-    def step(self,action):
-        o, _, d, i = self.env.step(action)
-        return o, self.reward(i), d, i
+    def step(self, action, **kwargs):
+        o, _, d, i = self.env.step(action, **kwargs)
+        return o, self.reward(), d, i
 
-    def reward(self, info):
-        rewards = []
-        for action_result in info:
-            # action
-            reward = self.action_reward(action_result)
-            # attribute
-            attr_icrem = action_result['attr_increment']
-            for key in attr_icrem.keys():
-                if key in self.reward_table['Attribute'].keys():
-                    reward += attr_icrem[key] * self.reward_table['Attribute'][key]
-                else:
-                    reward += attr_icrem[key] * self.reward_table['Attribute']['default']
-            # dead
-            if action_result['dead'] is True:
-                reward += self.reward_table['Dead']
-            # position
-            if action_result['position'] in self.reward_table['ScorePoint'].keys():
-                reward += self.reward_table['ScorePoint'][action_result['position']]
-            rewards.append(reward)
-        return rewards
+    def reward(self, info=None):
+        """
+        Rewards of the last step under this wrapper's score.json, summed over
+        its ticks as the env sums its own (see Eden.step_rewards).
 
-    def action_reward(self, action_result):
-        reward = 0
-        if 'Idle' in action_result['action'] :
-            result = self.reward_table['Idle']
-            reward = result['default']
-        elif 'Attack' in action_result['action']:
-            result = self.reward_table['Attack']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default_' + action_result['result']]
-                else:
-                    reward = result[action_result['target']+'_'+action_result['result']]
-        elif 'Collect' in action_result['action']:
-            result = self.reward_table['Collect']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-        elif 'Discard' in action_result['action']:
-            result = self.reward_table['Discard']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-                reward *= float(action_result['result'])
-        elif 'Move' in action_result['action']:
-            result = self.reward_table['Move']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                reward = result['default']
-        elif 'Synthesize' in action_result['action']:
-            result = self.reward_table['Synthesize']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-                reward *= float(action_result['result'])
-        elif 'Pickup' in action_result['action']:
-            result = self.reward_table['Pickup']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default']
-                else:
-                    reward = result[action_result['target']]
-                reward *= float(action_result['result'])
-        elif 'Equip' in action_result['action']:
-            result = self.reward_table['Equip']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default_' + action_result['result']]
-                else:
-                    reward = result[action_result['target']+'_'+action_result['result']]
-        elif 'Consume' in action_result['action']:
-            result = self.reward_table['Consume']
-            if 'fail' in action_result['result']:
-                reward = result['fail']
-            else:
-                if action_result['target'] not in list(result.keys()):
-                    reward = result['default_' + action_result['result']]
-                else:
-                    reward = result[action_result['target']]
-        return reward
+        [Args]
+            info: deprecated and ignored, the rewards are computed from the rows
+                  of the step. Passing it warns.
+        """
+        if info is not None:
+            warnings.warn("Reward.reward(info) is deprecated, info is ignored", DeprecationWarning, stacklevel=2)
+        return self.unwrapped.step_rewards(self.score_table)
@@ -78,15 +78,15 @@ class SelectActionTarget(ActionWrapper):
 
     def action(self, action):
         new_actions = []
-        observations = self.unwrapped.obs
-        assert(len(observations)==len(action)), "action is the same length with observations"
+        layout = self.unwrapped.layout
+        assert(len(layout)==len(action)), "action is the same length with observations"
         for i in range(len(action)):
-            new_actions.append(self.target_function(action[i], observations[i]))
+            new_actions.append(self.target_function(action[i], layout, i))
         return np.array(new_actions)
         
-    def target_function(self, action, obs):
+    def target_function(self, action, layout, agent_id):
         # dead
-        if len(obs) < 1:
+        if not layout.alive[agent_id]:
             return [self.ACTION_IDLE, 0, 0]
         #0、idle
         if action == self.ACTION_IDLE:
@@ -95,7 +95,7 @@ class SelectActionTarget(ActionWrapper):
         #1、攻击pig
         elif action == self.ACTION_ATTACK:
             block_list = [self.BLOCK_BEING]
-            [beings] = self.find_block(obs, block_list) #like {0: [5.0, 4.0], 1: [4.0, 5.0]}
+            [beings] = self.find_block(layout, agent_id, block_list) #like {0: [5.0, 4.0], 1: [4.0, 5.0]}
 
             posi = beings[self.pig_id]
 
@@ -104,7 +104,7 @@ class SelectActionTarget(ActionWrapper):
         #2、尽可能采集背包里少的东西
         elif action == self.ACTION_COLLECT:
             block_list = [self.BLOCK_BACKPACK, self.BLOCK_BEING, self.BLOCK_RESOURCE, self.BLOCK_ATTRIBUTE, self.BLOCK_POSISION]
-            [backpack, beings, resource, attribute, agent_posi] = self.find_block(obs, block_list)
+            [backpack, beings, resource, attribute, agent_posi] = self.find_block(layout, agent_id, block_list)
             collectDistance = attribute[7]
             candidate = []
             collect_list = self.collect_list[:]
@@ -136,7 +136,7 @@ class SelectActionTarget(ActionWrapper):
         #3、pickup 尽可能捡起背包里没有的东西
         elif action == self.ACTION_PICKUP:
             block_list = [self.BLOCK_BACKPACK, self.BLOCK_ITEM]
-            [backpack, items] = self.find_block(obs, block_list)
+            [backpack, items] = self.find_block(layout, agent_id, block_list)
             candidate = []
             pickup_list = self.pickup_list[:]
             random.shuffle(pickup_list)
@@ -155,7 +155,7 @@ class SelectActionTarget(ActionWrapper):
         #4、consume
         elif action == self.ACTION_CONSUME:
             block_list = [self.BLOCK_ATTRIBUTE, self.BLOCK_BACKPACK]
-            [attribute, backpack] = self.find_block(obs, block_list)
+            [attribute, backpack] = self.find_block(layout, agent_id, block_list)
             candidate = []
             satiety = attribute[1]
             thirsty = attribute[2]
@@ -183,7 +183,7 @@ class SelectActionTarget(ActionWrapper):
         #5、equip
         elif action == self.ACTION_EQUIP:
             block_list = [self.BLOCK_BACKPACK, self.BLOCK_EQUIPMENT]
-            [backpack, equipment] = self.find_block(obs, block_list)
+            [backpack, equipment] = self.find_block(layout, agent_id, block_list)
             candidate = []
 
             for kindAndID in self.equip_list:
@@ -206,7 +206,7 @@ class SelectActionTarget(ActionWrapper):
         #7、discard 随机丢掉背包里有的东西
         elif action == self.ACTION_DISCARD:
             block_list = [self.BLOCK_BACKPACK]
-            [backpack] = self.find_block(obs, block_list)
+            [backpack] = self.find_block(layout, agent_id, block_list)
             candidate = []
 
             for itemId in self.item_list:
@@ -223,7 +223,7 @@ class SelectActionTarget(ActionWrapper):
         #8、move 饿了找pig、渴了找pool、否则随机，有其他的需求再改
         elif action == self.ACTION_MOVE:
             block_list = [self.BLOCK_POSISION,self.BLOCK_ATTRIBUTE, self.BLOCK_BEING, self.BLOCK_RESOURCE]
-            [agent_posi, attribute, beings, resource] = self.find_block(obs, block_list)
+            [agent_posi, attribute, beings, resource] = self.find_block(layout, agent_id, block_list)
             candidate = []
             satiety = attribute[1]
             thirsty = attribute[2]
@@ -259,68 +259,41 @@ class SelectActionTarget(ActionWrapper):
             raise Warning(f'there isnt action id {action}.')
         return [self.ACTION_IDLE,0,0]
     
-    def find_block(self, observation, block_index = [0]):
+    def find_block(self, layout, agent_id, block_index = [0]):
         '''
             get infomation of block needed
         '''
-        if isinstance(observation,np.ndarray):
-            obs = observation.tolist()
-        else:
-            obs = observation
-
         Blocks = {}
-        Cursor = 0
+        block = lambda name: layout.block(name, agent_id).tolist()
 
         if self.BlOCK_ENV in block_index:
-            Blocks[self.BlOCK_ENV] = obs[Cursor:Cursor+4]
-        Cursor += 4
+            Blocks[self.BlOCK_ENV] = block('env')
 
         if self.BLOCK_POSISION in block_index:
-            Blocks[self.BLOCK_POSISION] = obs[Cursor:Cursor+2] #position
-        Cursor += 2
+            Blocks[self.BLOCK_POSISION] = block('position') #position
 
-        attr_num = round(obs[Cursor])
-        Cursor += 1
         if self.BLOCK_ATTRIBUTE in block_index:
-            Blocks[self.BLOCK_ATTRIBUTE] = obs[Cursor:Cursor+attr_num] #attribute
-        Cursor += attr_num
+            Blocks[self.BLOCK_ATTRIBUTE] = block('attribute') #attribute
 
-        backpack_num = round(obs[Cursor] * 2)
-        Cursor += 1
         if self.BLOCK_BACKPACK in block_index:
-            Blocks[self.BLOCK_BACKPACK] = self.analyse_backpack(obs[Cursor:Cursor+backpack_num]) #backpack各种item数量的字典
-        Cursor += backpack_num
+            Blocks[self.BLOCK_BACKPACK] = self.analyse_backpack(block('backpack')) #backpack各种item数量的字典
 
-        equipment_num = round(obs[Cursor])
-        Cursor += 1
         if self.BLOCK_EQUIPMENT in block_index:
-            Blocks[self.BLOCK_EQUIPMENT] = obs[Cursor:Cursor+equipment_num] #equipment
-        Cursor += equipment_num
+            Blocks[self.BLOCK_EQUIPMENT] = block('equipment') #equipment
         
         #part3 使用find_near去返回{id:位置}的字典, (除了agent)
-        agent_num = round(obs[Cursor] * 3)
-        Cursor += 1
+        env = block('env')
         if self.BLOCK_AGENT in block_index:
-            Blocks[self.BLOCK_AGENT] = self.find_nearest(obs[0:2],obs[Cursor:Cursor+agent_num]) #agent
-        Cursor += agent_num
+            Blocks[self.BLOCK_AGENT] = self.find_nearest(env[0:2],block('agent')) #agent
 
-        being_num = round(obs[Cursor] * 3)
-        Cursor += 1
         if self.BLOCK_BEING in block_index:
-            Blocks[self.BLOCK_BEING] = self.find_nearest(obs[0:2],obs[Cursor:Cursor+being_num],self.being_list) #being
-        Cursor += being_num
+            Blocks[self.BLOCK_BEING] = self.find_nearest(env[0:2],block('being'),self.being_list) #being
 
-        resource_num = round(obs[Cursor] * 3)
-        Cursor += 1
         if self.BLOCK_RESOURCE in block_index:
-            Blocks[self.BLOCK_RESOURCE] = self.find_nearest(obs[0:2],obs[Cursor:Cursor+resource_num],self.resource_list) #resource
-        Cursor += resource_num
+            Blocks[self.BLOCK_RESOURCE] = self.find_nearest(env[0:2],block('resource'),self.resource_list) #resource
 
-        item_num = round(obs[Cursor] * 3)
-        Cursor += 1
         if self.BLOCK_ITEM in block_index:
-            Blocks[self.BLOCK_ITEM] = self.find_nearest(obs[0:2],obs[Cursor:Cursor+item_num],self.item_list) #item
-        Cursor += item_num
+            Blocks[self.BLOCK_ITEM] = self.find_nearest(env[0:2],block('item'),self.item_list) #item
 
         return [Blocks[id] for id in block_index]
 
@@ -6,8 +6,17 @@
 #include <boost/python/suite/indexing/vector_indexing_suite.hpp>
 #include <vector>
 #include "game/Game.h"
+#include <algorithm>
+#include <atomic>
+#include <condition_variable>
+#include <cstdint>
+#include <exception>
+#include <functional>
 #include <iostream>
+#include <memory>
+#include <mutex>
 #include <string>
+#include <thread>
 
 using namespace std;
 
@@ -93,52 +102,707 @@ boost::python::list vector_to_pylist_3d(vector<vector<vector<T>>> vec) {
     return l1;
 }
 
-void EnvUpdate(Game* game_ptr, boost::python::list py_ob) {
-    vector<vector<float>> action = py_to_vector_2d<float>(py_ob);
+// game_done.json as compiled by eden.done_condition.DoneCondition, so that
+// step_n can stop between ticks without going back to Python. row_done
+// follows DoneCondition.__call__ on a single observation row.
+class DoneTable {
+public:
+    void set(const vector<vector<float>>& position, const vector<vector<float>>& attribute,
+             const vector<float>& backpack, const vector<float>& equipment) {
+        map_y_ = position.empty() ? 0 : position[0].size();
+        position_.clear();
+        for (size_t i = 0; i < position.size(); ++i) {
+            position_.insert(position_.end(), position[i].begin(), position[i].end());
+        }
+        attr_cols_ = attribute.empty() ? 0 : attribute[0].size();
+        attribute_.clear();
+        for (size_t i = 0; i < attribute.size(); ++i) {
+            attribute_.insert(attribute_.end(), attribute[i].begin(), attribute[i].end());
+        }
+        backpack_ = backpack;
+        equipment_ = equipment;
+    }
+
+    bool row_done(const vector<float>& row, long name_int) const {
+        long width = static_cast<long>(row.size());
+        if (width < 7) {
+            return false;
+        }
+        auto at = [&](long index) { return row[min(index, width - 1)]; };
+
+        long map_x = map_y_ > 0 ? static_cast<long>(position_.size() / map_y_) : 0;
+        long x = static_cast<long>(row[4]);
+        long y = static_cast<long>(row[5]);
+        if (x >= 0 && x < map_x && y >= 0 && y < static_cast<long>(map_y_) && position_[x * map_y_ + y] != 0.f) {
+            return true;
+        }
+
+        long attr_count = static_cast<long>(row[6]);
+        long attr_rows = attr_cols_ > 0 ? static_cast<long>(attribute_.size() / attr_cols_) : 0;
+        if (name_int >= 0 && name_int < attr_rows) {
+            long n_attr = min(min(static_cast<long>(attr_cols_), width - 7), attr_count);
+            for (long i = 0; i < n_attr; ++i) {
+                if (row[7 + i] <= attribute_[name_int * attr_cols_ + i]) {
+                    return true;
+                }
+            }
+        }
+
+        long bp_offset = 7 + attr_count;
+        long bp_count = static_cast<long>(at(bp_offset));
+        for (long k = 0; k < bp_count; ++k) {
+            long item = static_cast<long>(at(bp_offset + 1 + 2 * k));
+            if (item >= 0 && item < static_cast<long>(backpack_.size()) && at(bp_offset + 2 + 2 * k) >= backpack_[item]) {
+                return true;
+            }
+        }
+
+        long eq_offset = bp_offset + 1 + 2 * bp_count;
+        long eq_count = static_cast<long>(at(eq_offset));
+        for (long k = 0; k < eq_count; ++k) {
+            long item = static_cast<long>(at(eq_offset + 1 + k));
+            if (item >= 0 && item < static_cast<long>(equipment_.size()) && equipment_[item] != 0.f) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+private:
+    size_t map_y_ = 0;
+    vector<float> position_;
+    size_t attr_cols_ = 0;
+    vector<float> attribute_;
+    vector<float> backpack_;
+    vector<float> equipment_;
+};
+
+// Game.h is not part of this tree, so nothing here verifies that a Game keeps
+// no global or static state (a shared random engine, id counters, caches).
+// Until that is checked, native calls into the Games of all Env and BatchEnv
+// instances take turns on game_mutex and a BatchEnv ticks its worlds one after
+// the other. set_concurrent_games(True) lifts this, letting distinct instances
+// tick at the same time; call it before any thread starts using them.
+atomic<bool> concurrent_games(false);
+mutex game_mutex;
+
+void SetConcurrentGames(bool enabled) {
+    concurrent_games = enabled;
+}
+
+bool ConcurrentGames() {
+    return concurrent_games;
+}
+
+// Holds game_mutex for its lifetime unless concurrent_games is set. Taken with
+// the GIL held only around calls that never wait for the GIL while holding it.
+class ScopedGameLock {
+public:
+    ScopedGameLock() {
+        lock();
+    }
+
+    void lock() {
+        if (!concurrent_games) {
+            lock_ = unique_lock<mutex>(game_mutex);
+        }
+    }
+
+    void unlock() {
+        if (lock_.owns_lock()) {
+            lock_.unlock();
+        }
+    }
+
+private:
+    unique_lock<mutex> lock_;
+};
+
+// Game plus the bytearrays its observations and results are exported through.
+// The bytearrays are reused between calls, so an array built on top of them
+// is only valid until the next call exporting into the same store. The
+// ScopedGameLock base is held while the Game is constructed and destroyed.
+class EnvBinding : private ScopedGameLock, public Game {
+public:
+    explicit EnvBinding(const string& config_dir) : ScopedGameLock(), Game(config_dir) {
+        ScopedGameLock::unlock();
+    }
+
+    ~EnvBinding() {
+        ScopedGameLock::lock();
+    }
+
+    DoneTable done_table;
+    boost::python::object obs_store;
+    boost::python::object obs_len_store;
+    boost::python::object result_store;
+    boost::python::object result_len_store;
+};
+
+// Writable pointer to `store`, which is grown to at least `nbytes` first.
+// A store that is too small is replaced rather than resized, since arrays
+// from a previous call may still hold a reference to it.
+char* reserve_store(boost::python::object& store, Py_ssize_t nbytes) {
+    if (store.is_none() || PyByteArray_GET_SIZE(store.ptr()) < nbytes) {
+        store = boost::python::object(boost::python::handle<>(
+            PyByteArray_FromStringAndSize(NULL, nbytes)));
+    }
+    return PyByteArray_AS_STRING(store.ptr());
+}
+
+// One dimensional memoryview of `format` over the first `nbytes` of `store`.
+boost::python::object store_view(boost::python::object& store, Py_ssize_t nbytes, const char* format) {
+    boost::python::object view(boost::python::handle<>(PyMemoryView_FromObject(store.ptr())));
+    return view[boost::python::slice(0, nbytes)].attr("cast")(format);
+}
+
+// Pack ragged rows into a zero padded float32 (rows, width) buffer and an
+// int32 length per row. Returns (data, lengths, width) as memoryviews.
+boost::python::tuple export_rows(const vector<vector<float>>& rows,
+                                 boost::python::object& store,
+                                 boost::python::object& len_store) {
+    size_t width = 0;
+    for (size_t i = 0; i < rows.size(); ++i) {
+        width = max(width, rows[i].size());
+    }
+    Py_ssize_t data_bytes = rows.size() * width * sizeof(float);
+    Py_ssize_t len_bytes = rows.size() * sizeof(int32_t);
+    float* data = reinterpret_cast<float*>(reserve_store(store, data_bytes));
+    int32_t* lengths = reinterpret_cast<int32_t*>(reserve_store(len_store, len_bytes));
+    for (size_t i = 0; i < rows.size(); ++i) {
+        float* row = data + i * width;
+        copy(rows[i].begin(), rows[i].end(), row);
+        fill(row + rows[i].size(), row + width, 0.f);
+        lengths[i] = static_cast<int32_t>(rows[i].size());
+    }
+    return boost::python::make_tuple(
+        store_view(store, data_bytes, "f"), store_view(len_store, len_bytes, "i"), width);
+}
+
+// Read rows from a C contiguous float32 or int32 buffer of `ndim` dimensions
+// in place. Every leading index becomes one row of the innermost dimension,
+// and the size of the first dimension is stored in `leading`.
+// Returns false when `py_ob` does not export a buffer at all.
+bool buffer_to_rows(boost::python::object py_ob, int ndim, vector<vector<float>>& rows, size_t& leading) {
+    if (!PyObject_CheckBuffer(py_ob.ptr())) {
+        return false;
+    }
+    Py_buffer view;
+    if (PyObject_GetBuffer(py_ob.ptr(), &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0) {
+        boost::python::throw_error_already_set();
+    }
+    const char* format = view.format;
+    while (*format == '@' || *format == '=' || *format == '<') {
+        ++format;
+    }
+    bool is_float = (*format == 'f');
+    bool is_int = (*format == 'i' || *format == 'l') && view.itemsize == 4;
+    if (view.ndim != ndim || !(is_float || is_int) || format[1] != '\0') {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, "actions should be a float32 or int32 array of the expected dimensions");
+        boost::python::throw_error_already_set();
+    }
+    size_t cols = view.shape[ndim - 1];
+    size_t count = 1;
+    for (int d = 0; d < ndim - 1; ++d) {
+        count *= view.shape[d];
+    }
+    leading = view.shape[0];
+    rows.assign(count, vector<float>(cols));
+    for (size_t i = 0; i < count; ++i) {
+        if (is_float) {
+            const float* src = static_cast<const float*>(view.buf) + i * cols;
+            copy(src, src + cols, rows[i].begin());
+        } else {
+            const int32_t* src = static_cast<const int32_t*>(view.buf) + i * cols;
+            copy(src, src + cols, rows[i].begin());
+        }
+    }
+    PyBuffer_Release(&view);
+    return true;
+}
+
+// Releases the GIL for its lifetime, letting other Python threads run while
+// a Game ticks, and then takes the ScopedGameLock. Members are destroyed in
+// reverse order, so the game lock is dropped before the GIL is taken back.
+//
+// Thread safety: distinct Env instances may be used from different threads;
+// their native calls overlap only with set_concurrent_games(True). A single
+// Env must not be used from two threads at the same time.
+class ScopedGILRelease {
+private:
+    struct Release {
+        Release() : state(PyEval_SaveThread()) {}
+        ~Release() { PyEval_RestoreThread(state); }
+
+        PyThreadState* state;
+    };
+
+    Release release_;
+    ScopedGameLock lock_;
+};
+
+vector<vector<float>> py_to_actions(boost::python::object py_ob) {
+    vector<vector<float>> action;
+    size_t agents = 0;
+    if (!buffer_to_rows(py_ob, 2, action, agents)) {
+        action = py_to_vector_2d<float>(boost::python::extract<boost::python::list>(py_ob));
+    }
+    return action;
+}
+
+void EnvUpdate(EnvBinding* game_ptr, boost::python::object py_ob) {
+    vector<vector<float>> action = py_to_actions(py_ob);
+    ScopedGILRelease nogil;
     game_ptr->update(action);
 }
 
-void EnvReset(Game* game_ptr, int seed) {
+// One tick plus the observation and result export in a single call, saving
+// the separate update/observe/result crossings of a step.
+boost::python::object EnvStep(EnvBinding* game_ptr, boost::python::object py_ob) {
+    vector<vector<float>> action = py_to_actions(py_ob);
+    vector<vector<float>> observation;
+    vector<vector<float>> result;
+    {
+        ScopedGILRelease nogil;
+        game_ptr->update(action);
+        observation = game_ptr->agentObserve();
+        result = game_ptr->agentResult();
+    }
+    boost::python::tuple obs = export_rows(observation, game_ptr->obs_store, game_ptr->obs_len_store);
+    boost::python::tuple res = export_rows(result, game_ptr->result_store, game_ptr->result_len_store);
+    return obs + res;
+}
+
+// Up to `repeat` ticks of the same actions in one call. It stops after a tick
+// in which an agent died or a done_table condition holds for a live agent.
+// With every_tick the rows of all ticks run are exported one tick after the
+// other, otherwise only those of the last tick. Returns the step() tuple
+// followed by the number of ticks run.
+boost::python::object EnvStepN(EnvBinding* game_ptr, boost::python::object py_ob, int repeat, bool every_tick) {
+    vector<vector<float>> action = py_to_actions(py_ob);
+    vector<vector<float>> observation;
+    vector<vector<float>> result;
+    vector<vector<float>> observations;
+    vector<vector<float>> results;
+    int ticks = 0;
+    {
+        ScopedGILRelease nogil;
+        observation = game_ptr->agentObserve();
+        vector<bool> alive(observation.size());
+        for (size_t i = 0; i < observation.size(); ++i) {
+            alive[i] = !observation[i].empty();
+        }
+        while (ticks < repeat) {
+            game_ptr->update(action);
+            ++ticks;
+            observation = game_ptr->agentObserve();
+            result = game_ptr->agentResult();
+            bool stop = false;
+            for (size_t i = 0; i < observation.size(); ++i) {
+                if (observation[i].empty()) {
+                    stop = stop || (i < alive.size() && alive[i]);
+                } else {
+                    long name_int = (i < result.size() && result[i].size() > 4) ? static_cast<long>(result[i][4]) : -1;
+                    stop = stop || game_ptr->done_table.row_done(observation[i], name_int);
+                }
+                if (i < alive.size()) {
+                    alive[i] = !observation[i].empty();
+                }
+            }
+            if (every_tick) {
+                observations.insert(observations.end(), observation.begin(), observation.end());
+                results.insert(results.end(), result.begin(), result.end());
+            }
+            if (stop) {
+                break;
+            }
+        }
+        if (!every_tick) {
+            observations = move(observation);
+            results = move(result);
+        }
+    }
+    boost::python::tuple obs = export_rows(observations, game_ptr->obs_store, game_ptr->obs_len_store);
+    boost::python::tuple res = export_rows(results, game_ptr->result_store, game_ptr->result_len_store);
+    return obs + res + boost::python::make_tuple(ticks);
+}
+
+void EnvSetDoneCondition(EnvBinding* game_ptr, boost::python::object position, boost::python::object attribute,
+                         boost::python::object backpack, boost::python::object equipment) {
+    vector<vector<float>> position_rows, attribute_rows, backpack_rows, equipment_rows;
+    size_t leading = 0;
+    if (!buffer_to_rows(position, 2, position_rows, leading) || !buffer_to_rows(attribute, 2, attribute_rows, leading) ||
+        !buffer_to_rows(backpack, 1, backpack_rows, leading) || !buffer_to_rows(equipment, 1, equipment_rows, leading)) {
+        PyErr_SetString(PyExc_TypeError, "done condition tables should be float32 arrays");
+        boost::python::throw_error_already_set();
+    }
+    game_ptr->done_table.set(position_rows, attribute_rows, backpack_rows[0], equipment_rows[0]);
+}
+
+void EnvReset(EnvBinding* game_ptr, int seed) {
+    ScopedGILRelease nogil;
     game_ptr->reset(seed);
 }
 
+// A copy of a whole Game, taken by Env.snapshot() and put back by Env.restore().
+// It relies on the Game copy constructor and assignment copying the complete
+// world, random state included, so a restored Game ticks exactly as the
+// original did from that point. A snapshot may be restored any number of
+// times, into any Env of the same config.
+class GameSnapshot {
+public:
+    explicit GameSnapshot(const Game& game) : game(new Game(game)) {}
+
+    ~GameSnapshot() {
+        ScopedGameLock lock;
+        game.reset();
+    }
+
+    unique_ptr<const Game> game;
+};
+
+GameSnapshot* EnvSnapshot(EnvBinding* game_ptr) {
+    ScopedGILRelease nogil;
+    return new GameSnapshot(*game_ptr);
+}
+
+void EnvRestore(EnvBinding* game_ptr, const GameSnapshot& snapshot) {
+    ScopedGILRelease nogil;
+    static_cast<Game&>(*game_ptr) = *snapshot.game;
+}
+
 // void EnvCreate(Game* game_ptr, const string& configDir) {
 //     game_ptr->CreateArea(configDir);
 // }
 
-boost::python::str EnvRunScript(Game* game_ptr, const string& script)
+boost::python::str EnvRunScript(EnvBinding* game_ptr, const string& script)
 {
-    return game_ptr->runScript(script).c_str();
+    string output;
+    {
+        ScopedGILRelease nogil;
+        output = game_ptr->runScript(script);
+    }
+    return output.c_str();
 }
 
-boost::python::object EnvAgentObserve(Game* game_ptr)
+boost::python::object EnvAgentObserve(EnvBinding* game_ptr)
 {
-    return vector_to_pylist_2d<float>(game_ptr->agentObserve());
+    vector<vector<float>> observation;
+    {
+        ScopedGILRelease nogil;
+        observation = game_ptr->agentObserve();
+    }
+    return export_rows(observation, game_ptr->obs_store, game_ptr->obs_len_store);
 }
 
-boost::python::object EnvAgentResult(Game* game_ptr)
+boost::python::object EnvAgentResult(EnvBinding* game_ptr)
 {
-    return vector_to_pylist_2d<float>(game_ptr->agentResult());
+    vector<vector<float>> result;
+    {
+        ScopedGILRelease nogil;
+        result = game_ptr->agentResult();
+    }
+    return export_rows(result, game_ptr->result_store, game_ptr->result_len_store);
 }
 
-boost::python::object EnvAgentCount(Game* game_ptr)
+boost::python::object EnvAgentCount(EnvBinding* game_ptr)
 {
-    return vector_to_pylist(vector<int>{game_ptr->agentCount()});
+    int count;
+    {
+        ScopedGameLock lock;
+        count = game_ptr->agentCount();
+    }
+    return vector_to_pylist(vector<int>{count});
 }
 
-boost::python::object EnvGetUI(Game* game_ptr, int agent_id)
+boost::python::object EnvGetUI(EnvBinding* game_ptr, int agent_id)
 {
-    return vector_to_pylist(game_ptr->getUI(agent_id));
+    vector<float> ui;
+    {
+        ScopedGameLock lock;
+        ui = game_ptr->getUI(agent_id);
+    }
+    return vector_to_pylist(ui);
+}
+
+// Fixed set of threads running the index range of one parallel_for at a time.
+class WorkerPool {
+public:
+    explicit WorkerPool(size_t num_threads) {
+        for (size_t i = 0; i < num_threads; ++i) {
+            threads_.emplace_back(&WorkerPool::run, this);
+        }
+    }
+
+    ~WorkerPool() {
+        {
+            lock_guard<mutex> lock(mutex_);
+            stop_ = true;
+        }
+        start_cv_.notify_all();
+        for (size_t i = 0; i < threads_.size(); ++i) {
+            threads_[i].join();
+        }
+    }
+
+    // Call fn(0) ... fn(count - 1) on the pool and wait for all of them.
+    // The first exception thrown by fn is rethrown here.
+    void parallel_for(size_t count, const function<void(size_t)>& fn) {
+        unique_lock<mutex> lock(mutex_);
+        job_ = &fn;
+        count_ = count;
+        next_ = 0;
+        remaining_ = count;
+        error_ = nullptr;
+        ++generation_;
+        start_cv_.notify_all();
+        done_cv_.wait(lock, [this] { return remaining_ == 0; });
+        job_ = nullptr;
+        if (error_) {
+            rethrow_exception(error_);
+        }
+    }
+
+private:
+    void run() {
+        size_t seen = 0;
+        unique_lock<mutex> lock(mutex_);
+        while (true) {
+            start_cv_.wait(lock, [&] { return stop_ || generation_ != seen; });
+            if (stop_) {
+                return;
+            }
+            seen = generation_;
+            while (next_ < count_) {
+                size_t index = next_++;
+                const function<void(size_t)>* job = job_;
+                lock.unlock();
+                exception_ptr error = nullptr;
+                try {
+                    (*job)(index);
+                } catch (...) {
+                    error = current_exception();
+                }
+                lock.lock();
+                if (error && !error_) {
+                    error_ = error;
+                }
+                if (--remaining_ == 0) {
+                    done_cv_.notify_all();
+                }
+            }
+        }
+    }
+
+    vector<thread> threads_;
+    mutex mutex_;
+    condition_variable start_cv_;
+    condition_variable done_cv_;
+    const function<void(size_t)>* job_ = nullptr;
+    size_t count_ = 0;
+    size_t next_ = 0;
+    size_t remaining_ = 0;
+    size_t generation_ = 0;
+    exception_ptr error_ = nullptr;
+    bool stop_ = false;
+};
+
+// K independent worlds of one config, ticked together on a WorkerPool. Rows
+// are exported world major, i.e. as (K * n_agents, width) arrays.
+class BatchEnv {
+public:
+    BatchEnv(const string& config_dir, size_t num_worlds, size_t num_threads) {
+        {
+            ScopedGameLock lock;
+            for (size_t i = 0; i < num_worlds; ++i) {
+                worlds_.emplace_back(new Game(config_dir));
+            }
+        }
+        if (num_threads == 0) {
+            num_threads = max<size_t>(1, thread::hardware_concurrency());
+        }
+        pool_.reset(new WorkerPool(min(num_threads, max<size_t>(1, num_worlds))));
+    }
+
+    ~BatchEnv() {
+        pool_.reset();
+        ScopedGameLock lock;
+        worlds_.clear();
+    }
+
+    size_t num_worlds() const {
+        return worlds_.size();
+    }
+
+    Game& world(size_t index) {
+        if (index >= worlds_.size()) {
+            PyErr_SetString(PyExc_IndexError, "world index out of range");
+            boost::python::throw_error_already_set();
+        }
+        return *worlds_[index];
+    }
+
+    void update(const vector<vector<vector<float>>>& actions, bool collect) {
+        if (actions.size() != worlds_.size()) {
+            PyErr_SetString(PyExc_ValueError, "one action batch per world is required");
+            boost::python::throw_error_already_set();
+        }
+        observations_.resize(worlds_.size());
+        results_.resize(worlds_.size());
+        ScopedGILRelease nogil;
+        for_each_world([&](size_t i) {
+            vector<vector<float>> action = actions[i];
+            worlds_[i]->update(action);
+            if (collect) {
+                observations_[i] = worlds_[i]->agentObserve();
+                results_[i] = worlds_[i]->agentResult();
+            }
+        });
+    }
+
+    void observe() {
+        observations_.resize(worlds_.size());
+        ScopedGILRelease nogil;
+        for_each_world([&](size_t i) {
+            observations_[i] = worlds_[i]->agentObserve();
+        });
+    }
+
+    boost::python::tuple export_observations() {
+        return export_rows(flatten(observations_), obs_store, obs_len_store);
+    }
+
+    boost::python::tuple export_results() {
+        return export_rows(flatten(results_), result_store, result_len_store);
+    }
+
+    boost::python::object obs_store;
+    boost::python::object obs_len_store;
+    boost::python::object result_store;
+    boost::python::object result_len_store;
+
+private:
+    // fn(i) for every world, on the pool only when Games may run concurrently.
+    void for_each_world(const function<void(size_t)>& fn) {
+        if (concurrent_games) {
+            pool_->parallel_for(worlds_.size(), fn);
+        } else {
+            for (size_t i = 0; i < worlds_.size(); ++i) {
+                fn(i);
+            }
+        }
+    }
+
+    static vector<vector<float>> flatten(vector<vector<vector<float>>>& per_world) {
+        vector<vector<float>> rows;
+        for (size_t i = 0; i < per_world.size(); ++i) {
+            for (size_t j = 0; j < per_world[i].size(); ++j) {
+                rows.push_back(move(per_world[i][j]));
+            }
+            per_world[i].clear();
+        }
+        return rows;
+    }
+
+    vector<unique_ptr<Game>> worlds_;
+    unique_ptr<WorkerPool> pool_;
+    vector<vector<vector<float>>> observations_;
+    vector<vector<vector<float>>> results_;
+};
+
+vector<vector<vector<float>>> py_to_batch_actions(boost::python::object py_ob) {
+    vector<vector<float>> rows;
+    size_t worlds = 0;
+    if (!buffer_to_rows(py_ob, 3, rows, worlds)) {
+        return py_to_vector_3d<float>(boost::python::extract<boost::python::list>(py_ob));
+    }
+    vector<vector<vector<float>>> actions(worlds);
+    size_t agents = worlds > 0 ? rows.size() / worlds : 0;
+    for (size_t i = 0; i < worlds; ++i) {
+        for (size_t j = 0; j < agents; ++j) {
+            actions[i].push_back(move(rows[i * agents + j]));
+        }
+    }
+    return actions;
+}
+
+// One tick per (n_agents, width) action of a (steps, n_agents, width) array,
+// all in one call, e.g. to replay an episode from its seed.
+void EnvReplay(EnvBinding* game_ptr, boost::python::object py_ob) {
+    vector<vector<vector<float>>> actions = py_to_batch_actions(py_ob);
+    ScopedGILRelease nogil;
+    for (size_t i = 0; i < actions.size(); ++i) {
+        game_ptr->update(actions[i]);
+    }
+}
+
+BatchEnv* BatchCreate(const string& config_dir, size_t num_worlds, size_t num_threads) {
+    return new BatchEnv(config_dir, num_worlds, num_threads);
+}
+
+void BatchUpdate(BatchEnv* batch_ptr, boost::python::object py_ob) {
+    batch_ptr->update(py_to_batch_actions(py_ob), false);
+}
+
+boost::python::object BatchStep(BatchEnv* batch_ptr, boost::python::object py_ob) {
+    batch_ptr->update(py_to_batch_actions(py_ob), true);
+    return batch_ptr->export_observations() + batch_ptr->export_results();
+}
+
+boost::python::object BatchObserve(BatchEnv* batch_ptr) {
+    batch_ptr->observe();
+    return batch_ptr->export_observations();
+}
+
+void BatchReset(BatchEnv* batch_ptr, size_t world, int seed) {
+    Game& game = batch_ptr->world(world);
+    ScopedGILRelease nogil;
+    game.reset(seed);
+}
+
+boost::python::object BatchAgentCount(BatchEnv* batch_ptr) {
+    Game& game = batch_ptr->world(0);
+    int count;
+    {
+        ScopedGameLock lock;
+        count = game.agentCount();
+    }
+    return vector_to_pylist(vector<int>{count});
+}
+
+size_t BatchNumWorlds(BatchEnv* batch_ptr) {
+    return batch_ptr->num_worlds();
 }
 
 BOOST_PYTHON_MODULE(eden_py) {
-    boost::python::class_<Game>("Env", boost::python::init<string>())
+    boost::python::def("set_concurrent_games", &SetConcurrentGames);
+    boost::python::def("concurrent_games", &ConcurrentGames);
+
+    boost::python::class_<EnvBinding, boost::noncopyable>("Env", boost::python::init<string>())
         .def("reset",       &EnvReset)
         .def("update",      &EnvUpdate)
+        .def("step",        &EnvStep)
         .def("result",      &EnvAgentResult)
         .def("observe",     &EnvAgentObserve)
         .def("agent_count", &EnvAgentCount)
 
         .def("get_ui",      &EnvGetUI)
-        .def("run_script",  &EnvRunScript);
-}
\ No newline at end of file
+        .def("run_script",  &EnvRunScript)
+        .def("snapshot",    &EnvSnapshot, boost::python::return_value_policy<boost::python::manage_new_object>())
+        .def("restore",     &EnvRestore)
+        .def("replay",      &EnvReplay)
+        .def("step_n",      &EnvStepN)
+        .def("set_done_condition", &EnvSetDoneCondition);
+
+    boost::python::class_<GameSnapshot, boost::noncopyable>("Snapshot", boost::python::no_init);
+
+    boost::python::class_<BatchEnv, boost::noncopyable>("BatchEnv", boost::python::no_init)
+        .def("__init__",    boost::python::make_constructor(&BatchCreate))
+        .def("reset",       &BatchReset)
+        .def("update",      &BatchUpdate)
+        .def("step",        &BatchStep)
+        .def("observe",     &BatchObserve)
+        .def("agent_count", &BatchAgentCount)
+        .def("num_worlds",  &BatchNumWorlds);
+}
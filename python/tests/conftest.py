@@ -0,0 +1,29 @@
+'''
+The tests run the Python side of eden on stub_eden_py in place of the native
+extension, with the config shipped in the repository.
+'''
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(TESTS_DIR)), 'config')
+
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, TESTS_DIR)
+
+import stub_eden_py  # noqa: E402
+
+sys.modules['eden.backend.eden_py'] = stub_eden_py
+
+
+@pytest.fixture
+def config_dir():
+    return CONFIG_DIR
+
+
+@pytest.fixture
+def backend_cfg():
+    from eden.backend.config import BackendConfig
+    return BackendConfig(CONFIG_DIR)
@@ -0,0 +1,52 @@
+'''Random raw rows for the tests, made by the stub backend.'''
+import numpy as np
+
+import stub_eden_py
+
+
+def pad(rows, width=None):
+    '''(n_agents, width) float32 array and lengths of variable length rows.'''
+    lengths = np.array([len(row) for row in rows])
+    width = int(lengths.max(initial=0)) if width is None else width
+    obs = np.zeros((len(rows), width), dtype=np.float32)
+    for index, row in enumerate(rows):
+        obs[index, :len(row)] = row
+    return obs, lengths
+
+
+def split_row(row):
+    '''
+    The blocks of a raw row, walked with a cursor as the encoders used to: env,
+    position, attribute, backpack (item, count pairs), equipment, then the
+    agent, being, resource and item sightings ((NameInt, x, y) triples), all
+    flat lists.
+    '''
+    row = list(row)
+    blocks = {'env': row[0:4], 'position': row[4:6]}
+    cursor = 6
+    for name, stride in (('attribute', 1), ('backpack', 2), ('equipment', 1),
+                         ('agent', 3), ('being', 3), ('resource', 3), ('item', 3)):
+        count = int(row[cursor])
+        blocks[name] = row[cursor + 1:cursor + 1 + stride * count]
+        cursor += 1 + stride * count
+    assert cursor == len(row)
+    return blocks
+
+
+def random_steps(config_dir, seed, steps):
+    '''
+    Yield (actions, prev_rows, rows, results) for every step of a stub world
+    run with random actions, rows being lists of floats and results an
+    (n_agents, 5) float32 array.
+    '''
+    world = stub_eden_py.Env(config_dir)
+    world.reset(seed)
+    rng = np.random.RandomState(seed)
+    n = stub_eden_py.AGENT_COUNT
+    for _ in range(steps):
+        actions = np.stack([rng.randint(0, 9, n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1)
+        prev_rows = world.rows
+        world.update(actions)
+        yield actions, prev_rows, world.rows, np.array(world.results, dtype=np.float32)
+        if not world.alive.any():
+            world.reset(seed + 1000)
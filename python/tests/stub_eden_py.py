@@ -0,0 +1,171 @@
+'''
+Stand-in for the native eden_py module, so the Python side of eden can be
+tested without building the Game. Every tick it makes up well-formed
+observation and result rows for the agents of the config from a generator
+seeded by reset(), so a world is reproduced exactly by its seed and actions,
+as the native one is. Rows follow the layout in eden.obs_layout.
+'''
+import copy
+import numpy as np
+
+AGENT_COUNT = 4
+# chance per tick that a live agent dies
+DEATH_RATE = 0.03
+# most sightings per block in a row
+MAX_SIGHTINGS = 6
+
+
+def _export(rows):
+    width = max([len(row) for row in rows] + [0])
+    data = np.zeros((len(rows), width), dtype=np.float32)
+    for index, row in enumerate(rows):
+        data[index, :len(row)] = row
+    lengths = np.array([len(row) for row in rows], dtype=np.int32)
+    return data.tobytes(), lengths.tobytes(), width
+
+
+class Snapshot:
+    def __init__(self, state):
+        self.state = state
+
+
+class Env:
+    def __init__(self, config_dir):
+        # imported here, as importing eden imports this module
+        from eden.backend.config import BackendConfig
+        cfg = BackendConfig(config_dir)
+        self.map_size = (int(cfg.general_dict['MapSizeX']), int(cfg.general_dict['MapSizeY']))
+        agents = list(cfg.agent_dict.values())
+        self.name_int = np.array([cfg.agent_list[i % len(cfg.agent_list)] for i in range(AGENT_COUNT)])
+        self.attribute_size = [len(cfg.attribute_dict[name_int]) for name_int in self.name_int]
+        self.backpack_size = [int(agents[i % len(agents)]['BackpackSize']) for i in range(AGENT_COUNT)]
+        self.equipment_size = [len(agents[i % len(agents)]['Slot'].split(';')) for i in range(AGENT_COUNT)]
+        self.sighted = [cfg.agent_list, cfg.being_list, cfg.resource_list, cfg.item_list]
+        self.landforms = cfg.landform_list
+        self.items = cfg.item_list
+        self.done_tables = None
+        self.reset(0)
+
+    def reset(self, seed):
+        self.rng = np.random.RandomState(seed)
+        # drawn apart from rng, so that the rows do not depend on the map size
+        self.landform = np.random.RandomState(seed + 1).choice(self.landforms, size=self.map_size)
+        self.tick = 0
+        self.alive = np.ones(AGENT_COUNT, dtype=bool)
+        self.position = self.rng.randint(0, min(self.map_size), size=(AGENT_COUNT, 2))
+        self.rows = [self._row(agent) for agent in range(AGENT_COUNT)]
+        self.results = [[0, 0, 0, 0, name_int] for name_int in self.name_int]
+
+    def update(self, actions):
+        actions = np.asarray(actions, dtype=np.float32)
+        self.tick += 1
+        for agent in range(AGENT_COUNT):
+            if self.alive[agent] and self.rng.rand() < DEATH_RATE:
+                self.alive[agent] = False
+            if self.alive[agent] and int(actions[agent, 0]) == 8:
+                self.position[agent] = np.clip(actions[agent, 1:3], 0, np.array(self.map_size) - 1)
+        self.rows = [self._row(agent) for agent in range(AGENT_COUNT)]
+        self.results = [self._result(agent, actions[agent]) for agent in range(AGENT_COUNT)]
+
+    def _row(self, agent):
+        if not self.alive[agent]:
+            return []
+        rng = self.rng
+        row = [self.tick % 4, self.tick % 2, rng.randint(0, 3), rng.randint(0, 3), *self.position[agent]]
+        row += [self.attribute_size[agent], *(rng.randint(0, 5, self.attribute_size[agent]) * 25)]
+        row += [self.backpack_size[agent]]
+        for _ in range(self.backpack_size[agent]):
+            row += [rng.choice(self.items), rng.randint(1, 60)] if rng.rand() < 0.3 else [-1, -1]
+        row += [self.equipment_size[agent]]
+        row += [rng.choice(self.items) if rng.rand() < 0.2 else -1 for _ in range(self.equipment_size[agent])]
+        for name_ints in self.sighted:
+            count = rng.randint(0, MAX_SIGHTINGS + 1)
+            row += [count]
+            for _ in range(count):
+                row += [rng.choice(name_ints), rng.randint(0, self.map_size[0]), rng.randint(0, self.map_size[1])]
+        return row
+
+    def _result(self, agent, action):
+        rng = self.rng
+        if not self.alive[agent]:
+            return [0, 0, 0, 0, self.name_int[agent]]
+        return [int(action[0]), rng.randint(-1, 4), rng.randint(-1, 6), rng.randint(-1, 5), self.name_int[agent]]
+
+    def step(self, actions):
+        self.update(actions)
+        return self.observe() + self.result()
+
+    def step_n(self, actions, repeat, every_tick):
+        observations, results, ticks = [], [], 0
+        while ticks < repeat:
+            alive = self.alive.copy()
+            self.update(actions)
+            ticks += 1
+            observations += self.rows
+            results += self.results
+            if np.any(alive & ~self.alive):
+                break
+        if not every_tick:
+            observations, results = self.rows, self.results
+        return _export(observations) + _export(results) + (ticks,)
+
+    def replay(self, actions):
+        for action in np.asarray(actions):
+            self.update(action)
+
+    def observe(self):
+        return _export(self.rows)
+
+    def result(self):
+        return _export(self.results)
+
+    def agent_count(self):
+        return [AGENT_COUNT]
+
+    def set_done_condition(self, position, attribute, backpack, equipment):
+        self.done_tables = (position, attribute, backpack, equipment)
+
+    def snapshot(self):
+        state = {name: value for name, value in self.__dict__.items() if name != 'done_tables'}
+        return Snapshot(copy.deepcopy(state))
+
+    def restore(self, snapshot):
+        self.__dict__.update(copy.deepcopy(snapshot.state))
+
+    def run_script(self, script):
+        return ''
+
+    def get_ui(self, agent_id):
+        # 6 floats per cell after a leading one, the landform NameInt first
+        cells = np.tile([0, 0, -1, -1, 0, 0], self.map_size[0] * self.map_size[1]).reshape(-1, 6)
+        cells[:, 0] = self.landform.reshape(-1)
+        return [1] + cells.reshape(-1).tolist()
+
+
+class BatchEnv:
+    def __init__(self, config_dir, num_worlds, num_threads):
+        self.worlds = [Env(config_dir) for _ in range(num_worlds)]
+
+    def reset(self, world, seed):
+        self.worlds[world].reset(seed)
+
+    def update(self, actions):
+        for world, action in zip(self.worlds, actions):
+            world.update(action)
+
+    def step(self, actions):
+        self.update(actions)
+        return self.observe() + _export([row for world in self.worlds for row in world.results])
+
+    def observe(self):
+        return _export([row for world in self.worlds for row in world.rows])
+
+    def agent_count(self):
+        return [AGENT_COUNT]
+
+    def num_worlds(self):
+        return len(self.worlds)
+
+
+def set_concurrent_games(enabled):
+    pass
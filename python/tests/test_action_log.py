@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import eden
+from eden.action_log import ActionLogWriter, episode_path, load_action_log
+
+
+def random_actions(rng, n):
+    return np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1).astype(np.float32)
+
+
+def test_episode_path():
+    assert episode_path('run.actlog', 0) == 'run.actlog'
+    assert episode_path('run.actlog', 2) == 'run.2.actlog'
+    assert episode_path('run_{episode}.actlog', 0) == 'run_0.actlog'
+
+
+def test_writer_round_trip(tmp_path):
+    path = str(tmp_path / 'run.actlog')
+    actions = np.random.RandomState(0).rand(10, 4, 3).astype(np.float32)
+    writer = ActionLogWriter(path, 5, 4, b'\1' * 32, chunk_steps=3)
+    for action in actions:
+        writer.write(action)
+    writer.close()
+    header, loaded = load_action_log(path)
+    assert header == {'seed': 5, 'n_agents': 4, 'width': 3, 'config_hash': b'\1' * 32}
+    assert np.array_equal(loaded, actions)
+
+
+def test_not_an_action_log(tmp_path):
+    path = tmp_path / 'run.actlog'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        load_action_log(str(path))
+
+
+def test_replay_reaches_logged_world(config_dir, tmp_path):
+    path = str(tmp_path / 'run.actlog')
+    env = eden.Eden(config_dir=config_dir, action_log=path)
+    env.reset(seed=9)
+    rng = np.random.RandomState(9)
+    for _ in range(20):
+        env.step(random_actions(rng, env.backend.agent_count))
+    env.reset(seed=10)
+    env.close()
+
+    header, actions = load_action_log(path)
+    assert header['seed'] == 9 and header['config_hash'] == env.config_hash
+    assert len(actions) == 20
+    assert len(load_action_log(episode_path(path, 1))[1]) == 0
+
+    stepped = eden.Eden(config_dir=config_dir)
+    stepped.reset(seed=9)
+    for action in actions:
+        expected = stepped.step(action)[0]
+    replayed = eden.Eden(config_dir=config_dir)
+    replayed.reset(seed=9)
+    obs = replayed.replay(actions)
+    assert replayed.total_step == 20
+    assert np.array_equal(replayed.lengths, stepped.lengths)
+    assert np.array_equal(obs, expected)
@@ -0,0 +1,40 @@
+import numpy as np
+
+import eden.backend.interface as game
+
+NUM_WORLDS = 3
+
+
+def test_batch_matches_single_backends(config_dir):
+    batch = game.create_batch(config_dir, NUM_WORLDS)
+    singles = [game.create(config_dir) for _ in range(NUM_WORLDS)]
+    for world, single in enumerate(singles):
+        batch.reset(world, seed=world)
+        single.reset(seed=world)
+    n = batch.agent_count
+    rng = np.random.RandomState(0)
+    for step in range(150):
+        actions = np.stack([rng.choice([0, 8], (NUM_WORLDS, n)), rng.randint(0, 40, (NUM_WORLDS, n)),
+                            rng.randint(0, 40, (NUM_WORLDS, n))], axis=2).astype(np.float32)
+        obs, lengths, results, alive = batch.step(actions)
+        assert obs.shape[:2] == (NUM_WORLDS, n) and lengths.shape == (NUM_WORLDS, n)
+        for world, single in enumerate(singles):
+            expected_obs, expected_lengths, expected_results, _ = single.step(actions[world])
+            assert np.array_equal(lengths[world], expected_lengths), f"step {step}"
+            assert np.array_equal(alive[world], expected_lengths > 0)
+            assert np.array_equal(obs[world, :, :expected_obs.shape[1]], expected_obs)
+            assert not obs[world, :, expected_obs.shape[1]:].any()
+            assert np.array_equal(results[world, :, :expected_results.shape[1]], expected_results)
+        observed, observed_lengths = batch.observe()
+        assert np.array_equal(observed, obs) and np.array_equal(observed_lengths, lengths)
+
+
+def test_batch_all_dead(config_dir):
+    batch = game.create_batch(config_dir, 2)
+    # every row is empty once all agents of every world died
+    batch._cppbackend.worlds[0].alive[:] = False
+    batch._cppbackend.worlds[1].alive[:] = False
+    batch.update(np.zeros((2, batch.agent_count, 3), dtype=np.float32))
+    obs, lengths = batch.observe()
+    assert obs.shape == (2, batch.agent_count, 0)
+    assert not lengths.any()
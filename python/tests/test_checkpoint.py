@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import eden
+
+
+def random_actions(rng, n):
+    return np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1).astype(np.float32)
+
+
+def run(env, rng, steps):
+    n = env.backend.agent_count
+    for _ in range(steps):
+        obs, reward, done, _ = env.step(random_actions(rng, n))
+    return obs
+
+
+def test_save_load_round_trip(config_dir, tmp_path):
+    path = str(tmp_path / 'episode.npz')
+    env = eden.Eden(config_dir=config_dir, checkpointable=True)
+    env.reset(seed=7)
+    env.run_script('noop')
+    rng = np.random.RandomState(0)
+    run(env, rng, 12)
+    env.step(random_actions(rng, env.backend.agent_count), repeat=3)
+    total_step = 12 + env.last_ticks + 60
+    # the history outgrows its first capacity
+    run(env, rng, 60)
+    assert env.total_step == total_step
+    env.save_checkpoint(path)
+    saved = env._raw_observation().copy()
+
+    # the same actions after the save lead to the same world in both envs
+    expected = run(env, np.random.RandomState(1), 5).copy()
+    expected_rewards = env._reward()
+
+    loaded = eden.Eden(config_dir=config_dir, checkpointable=True)
+    obs = loaded.load_checkpoint(path)
+    assert np.array_equal(obs, saved)
+    assert loaded.total_step == total_step
+    got = run(loaded, np.random.RandomState(1), 5)
+    assert np.array_equal(got, expected)
+    assert np.allclose(loaded._reward(), expected_rewards)
+
+    # a loaded checkpoint can be saved and loaded again
+    loaded.save_checkpoint(path)
+    again = eden.Eden(config_dir=config_dir, checkpointable=True)
+    assert np.array_equal(again.load_checkpoint(path), got)
+    assert again.total_step == total_step + 5
+
+
+def test_save_needs_checkpointable(config_dir, tmp_path):
+    env = eden.Eden(config_dir=config_dir)
+    env.reset(seed=0)
+    with pytest.raises(AssertionError):
+        env.save_checkpoint(str(tmp_path / 'episode.npz'))
+
+
+def test_restored_env_saves_only_fresh_episodes(config_dir, tmp_path):
+    path = str(tmp_path / 'episode.npz')
+    env = eden.Eden(config_dir=config_dir, checkpointable=True)
+    env.reset(seed=4)
+    fresh = env.clone_state()
+    run(env, np.random.RandomState(0), 3)
+    # states do not carry the actions
+    middle = env.clone_state()
+    assert 'actions' not in middle.fields
+
+    env.restore_state(middle)
+    with pytest.raises(AssertionError):
+        env.save_checkpoint(path)
+
+    env.restore_state(fresh)
+    expected = run(env, np.random.RandomState(1), 4).copy()
+    env.save_checkpoint(path)
+    loaded = eden.Eden(config_dir=config_dir, checkpointable=True)
+    assert np.array_equal(loaded.load_checkpoint(path), expected)
+
+
+@pytest.mark.parametrize('env_class', [eden.Eden, eden.MatEden])
+def test_clone_restore_state(config_dir, env_class):
+    env = env_class(config_dir=config_dir)
+    env.reset(seed=3)
+    run(env, np.random.RandomState(0), 4)
+    state = env.clone_state()
+    cloned = env._observation().copy()
+    expected = run(env, np.random.RandomState(5), 6).copy()
+    expected_rewards = env._reward()
+    assert np.array_equal(env.restore_state(state), cloned)
+    assert env.total_step == state.total_step == 4
+    assert np.array_equal(run(env, np.random.RandomState(5), 6), expected)
+    assert np.allclose(env._reward(), expected_rewards)
+
+    # a state may be restored again, into another env of the same config
+    other = env_class(config_dir=config_dir)
+    assert np.array_equal(other.restore_state(state), cloned)
+    assert np.array_equal(run(other, np.random.RandomState(5), 6), expected)
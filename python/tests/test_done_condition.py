@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from eden.done_condition import DONE_DEAD, DONE_NONE, DoneCondition
+from rows import pad, random_steps
+
+MAP_SIZE = 40
+
+
+def random_condition(backend_cfg, seed):
+    '''A game_done.json with random conditions, loose enough to fire now and then.'''
+    rng = np.random.RandomState(seed)
+    items = [backend_cfg.typeid2name[f'item:{item}'] for item in backend_cfg.item_list]
+    attributes = backend_cfg.attribute_dict[backend_cfg.agent_list[0]]
+    return {
+        'position': [[int(x), int(y)] for x, y in rng.randint(0, MAP_SIZE, size=(40, 2))] + [[-1, -1]],
+        'attribute': {name: int(rng.choice([0, 25])) for name in rng.choice(attributes, 2, replace=False)},
+        'backpack': {name: int(rng.randint(40, 70)) for name in rng.choice(items, 4, replace=False)},
+        'equipment': list(rng.choice(items, 2, replace=False)),
+    }
+
+
+def reference_done(condition, backend_cfg, rows, results, backpack_size, equipment_size):
+    '''Eden._done as it was before DoneCondition, on variable length rows.'''
+    done = np.zeros(len(rows), dtype=bool)
+    for agent_id, (obs, result) in enumerate(zip(rows, results)):
+        if len(obs) < 1:
+            done[agent_id] = True
+            continue
+        if list(obs[4:6]) in condition['position']:
+            done[agent_id] = True
+            continue
+        name_int = int(result[4])
+        for attr_id, attr_value in enumerate(obs[7:7 + int(obs[6])]):
+            attr_name = backend_cfg.attribute_dict[name_int][attr_id]
+            if attr_name in condition['attribute'] and attr_value <= condition['attribute'][attr_name]:
+                done[agent_id] = True
+                break
+        if done[agent_id]:
+            continue
+        cursor = 8 + int(obs[6])
+        for bp_slot in range(backpack_size):
+            item = int(obs[cursor + bp_slot * 2])
+            if item < 0:
+                continue
+            name = backend_cfg.typeid2name[f'item:{item}']
+            if name in condition['backpack'] and int(obs[cursor + bp_slot * 2 + 1]) >= condition['backpack'][name]:
+                done[agent_id] = True
+                break
+        if done[agent_id]:
+            continue
+        cursor += backpack_size * 2 + 1
+        for eq_slot in range(equipment_size):
+            item = int(obs[cursor + eq_slot])
+            if item >= 0 and backend_cfg.typeid2name[f'item:{item}'] in condition['equipment']:
+                done[agent_id] = True
+                break
+    return done
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_done_matches_reference(backend_cfg, config_dir, seed):
+    condition = random_condition(backend_cfg, seed)
+    table = DoneCondition(condition, backend_cfg, MAP_SIZE, MAP_SIZE)
+    agent = list(backend_cfg.agent_dict.values())[0]
+    backpack_size, equipment_size = int(agent['BackpackSize']), len(agent['Slot'].split(';'))
+    fired = 0
+    for step, (_, _, rows, results) in enumerate(random_steps(config_dir, seed, 300)):
+        obs, lengths = pad(rows)
+        alive = lengths > 0
+        expected = reference_done(condition, backend_cfg, rows, results, backpack_size, equipment_size)
+        done, code = table(obs, results, alive)
+        assert np.array_equal(done, expected), f"step {step}"
+        assert np.all((code == DONE_DEAD) == ~alive)
+        fired += int((done & alive).sum())
+    assert fired > 0
+
+
+def test_codes_follow_condition_order(backend_cfg):
+    item = backend_cfg.item_list[0]
+    item_name = backend_cfg.typeid2name[f'item:{item}']
+    condition = {'position': [[3, 4]], 'attribute': {}, 'backpack': {item_name: 2}, 'equipment': []}
+    table = DoneCondition(condition, backend_cfg, MAP_SIZE, MAP_SIZE)
+
+    def row(x, y, count):
+        return [0, 0, 0, 0, x, y, 1, 50, 1, item, count, 0, 0, 0, 0, 0]
+
+    obs, lengths = pad([row(3, 4, 5), row(5, 5, 5), [], row(5, 5, 1)])
+    results = np.zeros((4, 5), dtype=np.float32)
+    results[:, 4] = backend_cfg.agent_list[0]
+    done, code = table(obs, results, lengths > 0)
+    assert done.tolist() == [True, True, True, False]
+    assert code[0] != DONE_NONE and code[0] != code[1]
+    assert code[2] == DONE_DEAD and code[3] == DONE_NONE
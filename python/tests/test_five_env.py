@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+
+from eden.core import ENTITY_STRIDE
+from eden.five_env import FiveEden
+from eden.vision import decode_landform, minimap_cell, minimap_center
+from rows import split_row
+
+
+def reference_five(env, row, landform):
+    '''FiveEden._get_five_observation as it was, for one live agent's row.'''
+    blocks = split_row(row)
+    five_obs = np.zeros(env.obs_length, dtype=np.int64)
+    agent_x, agent_y = blocks['position']
+    five_obs[int(agent_x) * env.map_size_x + int(agent_y)] = 1
+    for name in ('agent', 'being', 'item', 'resource'):
+        sightings = blocks[name]
+        for index in range(0, len(sightings), 3):
+            x, y = sightings[index + 1:index + 3]
+            five_obs[int(x) * env.map_size_x + int(y)] = env.nameint_map[name][int(sightings[index])]
+    backpack, equipment = blocks['backpack'], blocks['equipment']
+    func_bar = [env._item_nameint_map[x] if x != -1 else 0 for x in backpack[::2]]
+    func_bar += [env._item_nameint_map[x] if x != -1 else 0 for x in equipment]
+    func_bar += [env._item_nameint_map[x] for x in env.synthesize_list]
+    attribute_section = blocks['attribute'] + [x if x != -1 else 0 for x in backpack[1::2]]
+    five_obs[env._object_map_length:env.obs_length - env.landform_section_length] = func_bar + attribute_section
+    if env.use_landform_map:
+        use_night_vision = blocks['env'][1] < 0.5
+        vision = blocks['attribute'][env.attribute_name.index('NightVision' if use_night_vision else 'Vision')]
+        start = env.unit_section_length + env.attribute_section_length
+        for i in range(env.map_size_x):
+            for j in range(env.map_size_y):
+                if abs(i - agent_x) + abs(j - agent_y) <= vision:
+                    five_obs[start + i * env.map_size_x + j] = env._landform_nameint_map[landform[i, j]]
+    return five_obs
+
+
+def reference_select(env, agent_idx, input_act_type, unit_idx):
+    '''FiveEden._select_action as it was.'''
+    act_type = int(input_act_type)
+    if unit_idx < env._object_map_length:
+        return [float(act_type), float(int(unit_idx) // env.map_size_y), float(int(unit_idx) % env.map_size_y)]
+    point = env._last_obs[agent_idx, unit_idx]
+    if point in (0, 1):
+        return [0.0, 0.0, 0.0]
+    if act_type not in [4, 5, 6, 7]:
+        act_type = 0
+    return [float(act_type), float(env._item_invmap[point]), 1.0]
+
+
+def random_actions(env, rng):
+    n = env.backend.agent_count
+    return np.stack([rng.randint(0, 9, n), rng.randint(0, env.action_space[0].nvec[1], n)], axis=1)
+
+
+def run(env, seed, steps=60):
+    '''Yield after the reset and after every step of env, driven by random actions.'''
+    env.reset(seed=seed)
+    rng = np.random.RandomState(seed)
+    for step in range(steps):
+        yield step
+        _, _, done, _ = env.step(random_actions(env, rng))
+        if np.all(done):
+            env.reset(seed=seed + step + 1)
+
+
+@pytest.mark.parametrize('use_landform_map', [False, True])
+def test_encoder_matches_reference(config_dir, use_landform_map):
+    env = FiveEden(config_dir=config_dir, use_landform_map=use_landform_map)
+    for step in run(env, 1):
+        landform = decode_landform(env.backend.ui(0), env.map_size_x, env.map_size_y)
+        for agent_id in range(env.backend.agent_count):
+            if env.alive[agent_id]:
+                expected = reference_five(env, env.curr_obs[agent_id, :env.lengths[agent_id]], landform)
+            else:
+                expected = np.zeros(env.obs_length, dtype=np.int64)
+            assert np.array_equal(env._last_obs[agent_id], expected), f"step {step} agent {agent_id}"
+
+
+def test_decoder_matches_reference(config_dir):
+    env = FiveEden(config_dir=config_dir)
+    rng = np.random.RandomState(2)
+    n = env.backend.agent_count
+    for step in run(env, 2):
+        # every unit section: map cells, backpack, equipment and synthesize slots
+        for section_start, section_end in ((0, env._object_map_length),
+                                           (env._object_map_length, env.unit_section_length)):
+            action = np.stack([rng.randint(0, 9, n), rng.randint(section_start, section_end, n)], axis=1)
+            decoded = env._decode_actions(action)
+            expected = [reference_select(env, agent_id, *action[agent_id]) for agent_id in range(n)]
+            assert np.array_equal(decoded, np.array(expected, dtype=np.float32)), f"step {step}"
+
+
+def assert_entity_table(table, object_map, position, message):
+    '''The live rows of a sparse entity table against the dense object map of the same agent.'''
+    table = table.reshape(-1, ENTITY_STRIDE).astype(np.int64)
+    live = table[table[:, 3] == 1]
+    assert np.all(table[len(live):, 3] == 0), message
+    # the agent itself first, then the sightings nearest first
+    assert list(live[0, :3]) == [1, *position], message
+    distance = np.abs(live[1:, 1:3] - position).sum(axis=1)
+    assert np.all(np.diff(distance) >= 0), message
+    assert {tuple(cell) for cell in live[:, 1:3]} == {tuple(cell) for cell in np.argwhere(object_map > 0)}, message
+
+
+def test_sparse_matches_dense(config_dir):
+    dense = FiveEden(config_dir=config_dir)
+    sparse = FiveEden(config_dir=config_dir, obs_mode='sparse')
+    rng = np.random.RandomState(4)
+    n = dense.backend.agent_count
+    for step, _ in zip(run(dense, 4), run(sparse, 4)):
+        message = f"step {step}"
+        assert np.array_equal(sparse._last_obs[:, sparse._map_section_length:],
+                              dense._last_obs[:, dense._object_map_length:]), message
+        for agent_id in np.flatnonzero(dense.alive):
+            object_map = dense._last_obs[agent_id, :dense._object_map_length].reshape(dense.map_size_x, -1)
+            assert_entity_table(sparse._last_obs[agent_id, :sparse._map_section_length], object_map,
+                                dense.layout.position[agent_id].astype(np.int64), f"{message} agent {agent_id}")
+        action = np.stack([rng.randint(0, 9, n), rng.randint(0, dense.unit_section_length, n)], axis=1)
+        assert np.array_equal(sparse._decode_actions(action), dense._decode_actions(action)), message
+
+
+def crop(full_map, origin, side, fill):
+    '''The (side, side) window of full_map with its corner at origin, fill off the map.'''
+    padded = np.pad(full_map, side, constant_values=fill)
+    x, y = np.asarray(origin) + side
+    return padded[x:x + side, y:y + side]
+
+
+def test_egocentric_matches_dense(config_dir):
+    dense = FiveEden(config_dir=config_dir, use_landform_map=True)
+    ego = FiveEden(config_dir=config_dir, use_landform_map=True, egocentric=True, window=5, minimap=4)
+    side, n = 11, dense.backend.agent_count
+    rng = np.random.RandomState(5)
+    dense.reset(seed=5)
+    ego.reset(seed=5)
+    for step in range(60):
+        message = f"step {step}"
+        dense_landform, ego_landform = (
+            env._last_obs[:, env._minimap_start - env.landform_section_length:][:, :env._object_map_length]
+            for env in (dense, ego))
+        for agent_id in np.flatnonzero(dense.alive):
+            position = dense.layout.position[agent_id].astype(np.int64)
+            origin = position - 5
+            assert np.array_equal(ego._origin[agent_id], origin), message
+            for dense_map, ego_map in ((dense._last_obs[agent_id, :dense._object_map_length],
+                                        ego._last_obs[agent_id, :ego._object_map_length]),
+                                       (dense_landform[agent_id], ego_landform[agent_id])):
+                expected = crop(dense_map.reshape(dense.map_size_x, -1), origin, side, -1)
+                assert np.array_equal(ego_map.reshape(side, side), expected), message
+            # the minimap holds the agent itself on top
+            minimap = ego._last_obs[agent_id, ego._minimap_start:].reshape(4, 4)
+            assert minimap[tuple(minimap_cell(position[None], 4, ego.map_size_x, ego.map_size_y)[0])] == 1, message
+
+        # a window click acts on the map cell under it, clipped to the map
+        action = np.stack([rng.randint(0, 9, n), rng.randint(0, ego._object_map_length, n)], axis=1)
+        cell = (np.stack(divmod(action[:, 1], side), axis=1) + ego._origin).clip(0, dense.map_size_x - 1)
+        dense_action = np.stack([action[:, 0], cell[:, 0] * dense.map_size_y + cell[:, 1]], axis=1)
+        assert np.array_equal(ego._decode_actions(action), dense._decode_actions(dense_action)), message
+        # a minimap click moves towards the center of the cell
+        action[:, 1] = ego.unit_section_length + rng.randint(0, 16, n)
+        cell = np.stack(divmod(action[:, 1] - ego.unit_section_length, 4), axis=1)
+        decoded = ego._decode_actions(action)
+        assert np.all(decoded[:, 0] == 8), message
+        assert np.array_equal(decoded[:, 1:3], minimap_center(cell, 4, ego.map_size_x, ego.map_size_y)), message
+
+        # both worlds move to the same cells, a window cell for ego
+        action[:, 0] = rng.choice([0, 8], n)
+        action[:, 1] = rng.randint(0, ego._object_map_length, n)
+        cell = (np.stack(divmod(action[:, 1], side), axis=1) + ego._origin).clip(0, dense.map_size_x - 1)
+        ego.step(action)
+        _, _, done, _ = dense.step(np.stack([action[:, 0], cell[:, 0] * dense.map_size_y + cell[:, 1]], axis=1))
+        if np.all(done):
+            dense.reset(seed=5 + step + 1)
+            ego.reset(seed=5 + step + 1)
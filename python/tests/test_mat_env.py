@@ -0,0 +1,202 @@
+import numpy as np
+import pytest
+
+from eden.core import MAT_OBS_DTYPES, MatEden
+from eden.vision import decode_landform, minimap_cell, minimap_center
+from rows import split_row
+from test_five_env import assert_entity_table, crop
+
+
+def reference_mat(env, row, landform):
+    '''MatEden._get_mat_observation as it was, for one live agent's row, before the obs_dtype cast.'''
+    blocks = split_row(row)
+    obs_mat = np.full((env.obs_height, env.obs_width), -1, dtype=np.int64)
+    attribute = blocks['attribute']
+    use_night_vision = blocks['env'][1] < 0.5
+    vision = attribute[env.attribute_name.index('NightVision' if use_night_vision else 'Vision')]
+    agent_x, agent_y = blocks['position']
+    for i in range(env.map_size_x):
+        for j in range(env.map_size_y):
+            if abs(i - agent_x) + abs(j - agent_y) <= vision:
+                obs_mat[i, j] = env._landform_nameint_map[landform[i, j]]
+    obs_mat[int(agent_x) + env.map_size_x, int(agent_y)] = 1
+    for name in ('agent', 'being', 'item', 'resource'):
+        sightings = blocks[name]
+        for index in range(0, len(sightings), 3):
+            x, y = sightings[index + 1:index + 3]
+            obs_mat[int(x) + env.map_size_x, int(y)] = env.nameint_map[name][int(sightings[index])]
+    backpack, equipment = blocks['backpack'], blocks['equipment']
+    func_bar = [env._item_nameint_map[x] if x != -1 else -1 for x in backpack[::2]]
+    func_bar += [env._item_nameint_map[x] if x != -1 else -1 for x in equipment]
+    func_bar += [env._item_nameint_map[x] for x in env.synthesize_list]
+    func_bar += [int(x) for x in attribute]
+    obs_mat[env.map_size_x * 2:].reshape(-1)[:len(func_bar)] = func_bar
+    return obs_mat
+
+
+def reference_select(env, index, input_x, input_y, act_bool_type):
+    '''MatEden._select_action as it was, reading the function bar from env._func_bar.'''
+    act_type, param1, param2 = 0, input_x, input_y
+    if input_x < env.map_size_x:
+        act_type = 8
+    elif input_x < env.map_size_x * 2:
+        point = int(env._last_obs[index, input_x, input_y])
+        if point == -1:
+            return [0., 0., 0.]
+        object_type = env.object_type_list[point // env.multiplier]
+        param1, param2 = input_x - env.map_size_x, input_y
+        if object_type in ('agent', 'being'):
+            act_type = 2 if act_bool_type == 0 else 1
+        elif object_type == 'item':
+            act_type = 3
+        elif object_type == 'resource':
+            act_type = 2
+    else:
+        func_bar = list(env._func_bar[index])
+        func_bar_index = (input_x - env.map_size_x * 2) * env.map_size_y + input_y
+        if func_bar_index >= len(func_bar):
+            return [0., 0., 0.]
+        point = func_bar[func_bar_index]
+        if point == -1:
+            return [0., 0., 0.]
+        if func_bar_index < env.backpack_size:
+            item_nameint = env._item_invmap[point]
+            param1, param2 = item_nameint, 1
+            if act_bool_type == 1:
+                act_type = 7
+            elif item_nameint in [int(x.split(':')[-1]) for x in env.backend_cfg.equip_list]:
+                act_type = 5
+            else:
+                act_type = 4
+        elif func_bar_index < env.backpack_size + env.equipment_size:
+            act_type, param1, param2 = 5, env._item_invmap[point], 1
+        elif func_bar_index < env.backpack_size + env.equipment_size + len(env.synthesize_list):
+            act_type, param1, param2 = 6, env._item_invmap[point], 1
+        else:
+            act_type, param1, param2 = 0, 0, 0
+    return [float(act_type), float(param1), float(param2)]
+
+
+def random_actions(env, rng, low=0):
+    n = env.backend.agent_count
+    return np.stack([rng.randint(0, 2, n), rng.randint(low, env.obs_height, n), rng.randint(0, env.obs_width, n)],
+                    axis=1)
+
+
+def run(env, seed, steps=60):
+    '''Yield after the reset and after every step of env, driven by random actions.'''
+    env.reset(seed=seed)
+    rng = np.random.RandomState(seed)
+    for step in range(steps):
+        yield step
+        _, _, done, _ = env.step(random_actions(env, rng))
+        if np.all(done):
+            env.reset(seed=seed + step + 1)
+
+
+@pytest.mark.parametrize('obs_dtype', MAT_OBS_DTYPES)
+def test_encoder_matches_reference(config_dir, obs_dtype):
+    env = MatEden(config_dir=config_dir, obs_dtype=obs_dtype)
+    assert env._last_obs.dtype == np.dtype(obs_dtype)
+    for step in run(env, 1):
+        landform = decode_landform(env.backend.ui(0), env.map_size_x, env.map_size_y)
+        for agent_id in range(env.backend.agent_count):
+            if env.alive[agent_id]:
+                expected = reference_mat(env, env.curr_obs[agent_id, :env.lengths[agent_id]], landform)
+            else:
+                expected = np.full((env.obs_height, env.obs_width), -1, dtype=np.int64)
+            # attributes saturate at the range of obs_dtype
+            expected = expected.clip(env._obs_low, env._obs_high).astype(obs_dtype)
+            assert np.array_equal(env._last_obs[agent_id], expected), f"step {step} agent {agent_id}"
+
+
+def test_decoder_matches_reference(config_dir):
+    env = MatEden(config_dir=config_dir)
+    rng = np.random.RandomState(3)
+    n = env.backend.agent_count
+    for step in run(env, 3):
+        # the landform map, the object map and the function bar rows, then the objects on the map
+        for low in (0, env.map_size_x, 2 * env.map_size_x, None):
+            if low is None:
+                action = random_actions(env, rng)
+                for agent_id in np.flatnonzero(env.alive):
+                    cells = np.argwhere(env._last_obs[agent_id, env.map_size_x:2 * env.map_size_x] >= 0)
+                    action[agent_id, 1:3] = cells[rng.randint(len(cells))] + [env.map_size_x, 0]
+            else:
+                action = random_actions(env, rng, low)
+            decoded = env._decode_actions(action)
+            expected = [reference_select(env, agent_id, action[agent_id, 1], action[agent_id, 2], action[agent_id, 0])
+                        for agent_id in range(n)]
+            assert np.array_equal(decoded, np.array(expected, dtype=np.float32)), f"step {step}"
+
+
+def test_sparse_matches_dense(config_dir):
+    dense = MatEden(config_dir=config_dir)
+    sparse = MatEden(config_dir=config_dir, obs_mode='sparse')
+    rng = np.random.RandomState(4)
+    map_rows = dense.map_size_x
+    for step, _ in zip(run(dense, 4), run(sparse, 4)):
+        message = f"step {step}"
+        func_bar = dense._last_obs[:, dense._func_row:].reshape(len(dense._last_obs), -1)[:, :dense._func_bar_length]
+        assert np.array_equal(sparse._last_obs[:, sparse._entity_length:], func_bar), message
+        for agent_id in np.flatnonzero(dense.alive):
+            # the dense object map holds -1 where empty, class ids start at 0
+            object_map = dense._last_obs[agent_id, map_rows:2 * map_rows] + 1
+            assert_entity_table(sparse._last_obs[agent_id, :sparse._entity_length], object_map,
+                                dense.layout.position[agent_id].astype(np.int64), f"{message} agent {agent_id}")
+        # random clicks, then clicks on the objects, the last entity on a shared cell as in the dense map
+        action = random_actions(dense, rng)
+        assert np.array_equal(sparse._decode_actions(action), dense._decode_actions(action)), message
+        for agent_id in np.flatnonzero(dense.alive):
+            cells = np.argwhere(dense._last_obs[agent_id, map_rows:2 * map_rows] >= 0)
+            action[agent_id, 1:3] = cells[rng.randint(len(cells))] + [map_rows, 0]
+        assert np.array_equal(sparse._decode_actions(action), dense._decode_actions(action)), message
+
+
+def test_egocentric_matches_dense(config_dir):
+    dense = MatEden(config_dir=config_dir)
+    ego = MatEden(config_dir=config_dir, egocentric=True, window=5, minimap=4)
+    side, map_rows, n = 11, dense.map_size_x, dense.backend.agent_count
+    rng = np.random.RandomState(5)
+    dense.reset(seed=5)
+    ego.reset(seed=5)
+    for step in range(60):
+        message = f"step {step}"
+        for agent_id in np.flatnonzero(dense.alive):
+            position = dense.layout.position[agent_id].astype(np.int64)
+            origin = position - 5
+            assert np.array_equal(ego._origin[agent_id], origin), message
+            for section in range(2):
+                dense_map = dense._last_obs[agent_id, section * map_rows:(section + 1) * map_rows]
+                ego_map = ego._last_obs[agent_id, section * side:(section + 1) * side, :side]
+                assert np.array_equal(ego_map, crop(dense_map, origin, side, -2)), message
+            # the minimap holds the agent itself on top
+            minimap = ego._last_obs[agent_id, ego._minimap_row:, :4]
+            assert minimap[tuple(minimap_cell(position[None], 4, ego.map_size_x, ego.map_size_y)[0])] == 1, message
+
+        # a window click acts on the map cell under it, clipped to the map; off the map
+        # the object window holds -2, which is no object
+        action = np.stack([rng.randint(0, 2, n), rng.randint(0, 2 * side, n), rng.randint(0, side, n)], axis=1)
+        on_objects = action[:, 1] >= side
+        cell = np.stack([action[:, 1] % side, action[:, 2]], axis=1) + ego._origin
+        on_map = np.all((cell >= 0) & (cell < map_rows), axis=1)
+        cell = cell.clip(0, map_rows - 1)
+        dense_action = np.stack([action[:, 0], cell[:, 0] + np.where(on_objects, map_rows, 0), cell[:, 1]], axis=1)
+        expected = dense._decode_actions(dense_action).copy()
+        expected[on_objects & ~on_map] = 0
+        assert np.array_equal(ego._decode_actions(action), expected), message
+        # a minimap click moves towards the center of the cell
+        cell = rng.randint(0, 4, (n, 2))
+        action[:, 1:3] = cell + [ego._minimap_row, 0]
+        decoded = ego._decode_actions(action)
+        assert np.all(decoded[:, 0] == 8), message
+        assert np.array_equal(decoded[:, 1:3], minimap_center(cell, 4, ego.map_size_x, ego.map_size_y)), message
+
+        # both worlds move to the same cells, a window cell for ego
+        action = np.stack([rng.randint(0, 2, n), rng.randint(0, side, n), rng.randint(0, side, n)], axis=1)
+        cell = (action[:, 1:3] + ego._origin).clip(0, map_rows - 1)
+        ego.step(action)
+        _, _, done, _ = dense.step(np.concatenate([action[:, :1], cell], axis=1))
+        if np.all(done):
+            dense.reset(seed=5 + step + 1)
+            ego.reset(seed=5 + step + 1)
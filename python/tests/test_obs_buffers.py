@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import eden
+from eden.vec_env import EdenThreadVecEnv
+
+
+def random_actions(rng, n):
+    return np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1).astype(np.float32)
+
+
+def test_step_returns_rows_up_to_the_longest(config_dir):
+    env = eden.Eden(config_dir=config_dir)
+    obs = env.reset(seed=1)
+    rng = np.random.RandomState(1)
+    kept = []
+    for step in range(30):
+        assert obs.shape == (env.backend.agent_count, int(env.lengths.max(initial=0)))
+        rows, lengths = env.backend.observe()
+        assert np.array_equal(env.lengths, lengths)
+        assert np.array_equal(obs, rows[:, :obs.shape[1]])
+        # two buffers in turn: the obs of two steps ago is overwritten, not copied
+        kept.append(obs)
+        if len(kept) == 3:
+            assert np.shares_memory(kept[0], kept[2]) and not np.shares_memory(kept[1], kept[2])
+            kept.pop(0)
+        obs, _, done, _ = env.step(random_actions(rng, env.backend.agent_count))
+        if np.all(done):
+            break
+
+
+def test_buffers_grow_for_longer_rows(config_dir):
+    wide = eden.Eden(config_dir=config_dir)
+    narrow = eden.Eden(config_dir=config_dir, max_obs_len=8)
+    assert narrow.max_obs_len == 8 and wide.max_obs_len > 8
+    expected = wide.reset(seed=2)
+    obs = narrow.reset(seed=2)
+    rng = np.random.RandomState(2)
+    for step in range(30):
+        assert np.array_equal(obs, expected), f"step {step}"
+        action = random_actions(rng, wide.backend.agent_count)
+        expected, expected_reward, done, _ = wide.step(action)
+        obs, reward, _, _ = narrow.step(action)
+        # the previous rows survive the growth, so the attribute deltas do too
+        assert np.array_equal(reward, expected_reward)
+        if np.all(done):
+            break
+    assert narrow._obs_buffers[0].shape[1] > 8
+
+
+def test_vec_env_rejects_rows_past_max_obs_len(config_dir):
+    vec_env = EdenThreadVecEnv(config_dir=config_dir, num_envs=1, max_obs_len=8)
+    try:
+        with pytest.raises(ValueError):
+            vec_env.reset()
+    finally:
+        vec_env.close()
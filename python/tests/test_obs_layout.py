@@ -0,0 +1,83 @@
+import numpy as np
+
+from eden.obs_layout import BLOCKS, ObsLayout
+
+ENV = [1, 0, 2, 3]
+POSITION = [5, 7]
+ATTRIBUTE = [100, 90, 80]
+BACKPACK = [[12, 3], [-1, -1]]
+EQUIPMENT = [4, -1, 9]
+SIGHTINGS = {
+    'agent': [[0, 6, 7]],
+    'being': [],
+    'resource': [[2, 1, 1], [3, 9, 9]],
+    'item': [[15, 5, 8]],
+}
+
+
+def hand_built_row():
+    row = ENV + POSITION
+    row += [len(ATTRIBUTE)] + ATTRIBUTE
+    row += [len(BACKPACK)] + [value for slot in BACKPACK for value in slot]
+    row += [len(EQUIPMENT)] + EQUIPMENT
+    for name in ('agent', 'being', 'resource', 'item'):
+        row += [len(SIGHTINGS[name])] + [value for entry in SIGHTINGS[name] for value in entry]
+    return row
+
+
+def padded(rows, width):
+    obs = np.zeros((len(rows), width), dtype=np.float32)
+    for index, row in enumerate(rows):
+        obs[index, :len(row)] = row
+    return obs, np.array([len(row) for row in rows])
+
+
+def test_blocks_of_hand_built_row():
+    row = hand_built_row()
+    obs, lengths = padded([row, [], row], len(row) + 5)
+    layout = ObsLayout(obs, lengths)
+
+    assert list(layout.alive) == [True, False, True]
+    assert list(layout.end) == [len(row), 0, len(row)]
+    for agent_id in (0, 2):
+        assert layout.block('env', agent_id).tolist() == ENV
+        assert layout.block('position', agent_id).tolist() == POSITION
+        assert layout.block('attribute', agent_id).tolist() == ATTRIBUTE
+        assert layout.table('backpack', agent_id).tolist() == BACKPACK
+        assert layout.block('equipment', agent_id).tolist() == EQUIPMENT
+        for name, entries in SIGHTINGS.items():
+            assert layout.table(name, agent_id).tolist() == entries
+    assert layout.counts('resource').tolist() == [2, 0, 2]
+    assert np.array_equal(layout.position[0], POSITION)
+
+
+def test_blocks_are_views():
+    row = hand_built_row()
+    obs, lengths = padded([row], len(row))
+    layout = ObsLayout(obs, lengths)
+    layout.table('resource', 0)[1, 0] = 42
+    assert obs[0, layout.start[0, BLOCKS.index('resource')] + 3] == 42
+
+
+def test_single_row():
+    row = hand_built_row()
+    layout = ObsLayout(np.array(row, dtype=np.float32))
+    assert len(layout) == 1
+    assert layout.end[0] == len(row)
+    assert layout.table('item', 0).tolist() == SIGHTINGS['item']
+
+
+def test_entries_and_gather():
+    row = hand_built_row()
+    other = ENV + POSITION + [0] + [0] + [0] + [2, 1, 2, 3, 0, 4, 5] + [0, 0, 0]
+    obs, lengths = padded([row, other], len(row))
+    layout = ObsLayout(obs, lengths)
+
+    owner, values = layout.entries('agent')
+    assert owner.tolist() == [0, 1, 1]
+    assert values.tolist() == SIGHTINGS['agent'] + [[1, 2, 3], [0, 4, 5]]
+
+    gathered = layout.gather('agent')
+    assert gathered.shape == (2, 2, 3)
+    assert gathered[0].tolist() == SIGHTINGS['agent'] + [[-1, -1, -1]]
+    assert gathered[1].tolist() == [[1, 2, 3], [0, 4, 5]]
@@ -0,0 +1,138 @@
+import functools
+
+import numpy as np
+import pytest
+
+import eden
+from eden.vec_env import EdenThreadVecEnv, EdenVecEnv
+from eden.wrappers.obs_scale import ObsScale
+from rows import split_row
+
+
+def reference_nearest(position, sightings, IDs=None):
+    '''ObsScale.find_nearest as it was before the vectorized encoding.'''
+    def manhattan(a, b):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+    if IDs is None:
+        if len(sightings) == 0:
+            return [-1, -1, -1]
+        best = min(range(0, len(sightings), 3), key=lambda i: manhattan(position, sightings[i + 1:i + 3]))
+        return sightings[best:best + 3]
+    nearest = []
+    for name_int in IDs:
+        best, distance = -1, -1
+        for i in range(0, len(sightings), 3):
+            if round(sightings[i]) != name_int:
+                continue
+            d = manhattan(position, sightings[i + 1:i + 3])
+            if distance == -1 or d < distance:
+                best, distance = i, d
+        nearest += sightings[best:best + 3] if best != -1 else [-1, -1, -1]
+    return nearest
+
+
+def reference_scale(row, backend_cfg):
+    '''ObsScale._obs_scale_1d as it was, for n_target=1.'''
+    blocks = split_row(row)
+    position = blocks['position']
+    scaled = blocks['env'] + position + blocks['attribute'] + blocks['backpack'] + blocks['equipment']
+    scaled += reference_nearest(position, blocks['agent'])
+    scaled += reference_nearest(position, blocks['being'], backend_cfg.being_list)
+    scaled += reference_nearest(position, blocks['resource'], backend_cfg.resource_list)
+    scaled += reference_nearest(position, blocks['item'], backend_cfg.item_list)
+    return np.array(scaled, dtype=np.float32)
+
+
+def random_actions(rng, n):
+    return np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1).astype(np.float32)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_scale_matches_reference(config_dir, seed):
+    env = eden.Eden(config_dir=config_dir)
+    wrapper = ObsScale(env)
+    rng = np.random.RandomState(seed)
+    n = env.backend.agent_count
+    scaled = wrapper.reset(seed=seed)
+    for step in range(80):
+        for agent_id in range(n):
+            if env.alive[agent_id]:
+                row = env.curr_obs[agent_id, :env.lengths[agent_id]].tolist()
+                assert np.array_equal(scaled[agent_id], reference_scale(row, env.backend_cfg)), f"step {step}"
+            else:
+                assert np.all(scaled[agent_id] == -1)
+        scaled, _, done, _ = wrapper.step(random_actions(rng, n))
+        if np.all(done):
+            scaled = wrapper.reset(seed=seed + step)
+
+
+def test_zero_targets_reads_as_one(config_dir):
+    env = eden.Eden(config_dir=config_dir)
+    one, zero = ObsScale(env), ObsScale(env, n_target=0)
+    assert zero.n_target == 1 and zero.observation_space.shape == one.observation_space.shape
+    obs = env.reset(seed=3)
+    assert np.array_equal(zero.observation(obs), one.observation(obs))
+
+
+def test_nearest_several_targets(config_dir):
+    env = eden.Eden(config_dir=config_dir)
+    wrapper = ObsScale(env, n_target=3)
+    env.reset(seed=4)
+    position = np.array([[10, 10]])
+    entries = np.array([[[1, 12, 10], [2, 10, 11], [3, 30, 30], [4, 11, 10], [5, 0, 0]]], dtype=np.float32)
+    nearest = wrapper._nearest(entries, np.array([4]), position)
+    # by distance, ties to the earlier sighting, the fifth one is past the count
+    assert nearest[0, 0].tolist() == [[2, 10, 11], [4, 11, 10], [1, 12, 10]]
+
+
+def test_normalize_matches_numpy(config_dir):
+    env = eden.Eden(config_dir=config_dir)
+    plain = ObsScale(env)
+    normalized = ObsScale(env, normalize=True, clip=5.0)
+    rng = np.random.RandomState(2)
+    n = env.backend.agent_count
+    env.reset(seed=2)
+    seen = []
+    for step in range(40):
+        obs, _, done, _ = env.step(random_actions(rng, n))
+        if np.all(done):
+            break
+        rows = plain.observation(obs)
+        seen.append(rows[env.alive].astype(np.float64))
+        got = normalized.observation(obs)
+        x = np.concatenate(seen)
+        expected = np.clip((rows - x.mean(axis=0)) / np.sqrt(x.var(axis=0) + 1e-8), -5, 5)
+        expected[~env.alive] = -1
+        np.testing.assert_allclose(got, expected, atol=2e-3)
+
+
+def test_freeze_needs_normalize(config_dir):
+    wrapper = ObsScale(eden.Eden(config_dir=config_dir))
+    with pytest.raises(AssertionError):
+        wrapper.freeze()
+
+
+@pytest.mark.parametrize('vec_env_class', [EdenThreadVecEnv, EdenVecEnv])
+def test_vec_env_syncs_obs_stats(config_dir, vec_env_class):
+    vec_env = vec_env_class(config_dir=config_dir, num_envs=2, wrapper=functools.partial(ObsScale, normalize=True))
+    try:
+        rng = np.random.RandomState(3)
+        n = eden.Eden(config_dir=config_dir).backend.agent_count
+        base_count, base_mean = 0.0, 0.0
+        vec_env.reset()
+        for _ in range(2):
+            for _ in range(10):
+                vec_env.step([random_actions(rng, n) for _ in range(2)])
+            states = vec_env.get_obs_stats()
+            merged = vec_env.sync_obs_stats()
+            # every worker adds what it saw since the last sync, on top of the state it was handed
+            count = sum(state['count'] for state in states) - (len(states) - 1) * base_count
+            mean = sum(state['count'] * state['mean'] for state in states) - (len(states) - 1) * base_count * base_mean
+            assert merged['count'] == count > base_count
+            np.testing.assert_allclose(merged['mean'], mean / count, rtol=1e-4, atol=1e-4)
+            for state in vec_env.get_obs_stats():
+                assert state['count'] == merged['count'] and np.array_equal(state['mean'], merged['mean'])
+            base_count, base_mean = float(merged['count']), merged['mean']
+    finally:
+        vec_env.close()
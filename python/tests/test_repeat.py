@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import eden
+from eden.score_table import ScoreTable
+from test_score_table import MAP_SIZE, random_score
+
+
+def single_steps(env, action, repeat, tables):
+    '''step(action, repeat) as up to repeat single steps, stopping after a death.'''
+    rewards = [0.0] * len(tables)
+    for tick in range(repeat):
+        alive = env.alive.copy()
+        obs, _, done, _ = env.step(action)
+        rewards = [reward + env.step_rewards(table) for reward, table in zip(rewards, tables)]
+        if np.any(alive & ~env.alive):
+            break
+    return obs.copy(), done, tick + 1, rewards
+
+
+@pytest.mark.parametrize('fast_forward', [False, True])
+def test_repeat_matches_single_steps(backend_cfg, config_dir, fast_forward):
+    score = random_score(backend_cfg, 8)
+    full = ScoreTable(score, backend_cfg, MAP_SIZE, MAP_SIZE)
+    # fast forward does not see the attribute changes of an agent dying on the last tick
+    del score['Attribute']
+    no_attribute = ScoreTable(score, backend_cfg, MAP_SIZE, MAP_SIZE)
+    env = eden.Eden(config_dir=config_dir)
+    env.reset(seed=8)
+    rng = np.random.RandomState(8)
+    n = env.backend.agent_count
+    for step in range(40):
+        message = f"step {step}"
+        if fast_forward:
+            action = np.zeros((n, 3), dtype=np.float32)
+        else:
+            action = np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1)
+        repeat = rng.randint(2, 6)
+        alive = env.alive.copy()
+        state = env.clone_state()
+        expected_obs, expected_done, ticks, expected = single_steps(env, action, repeat, (full, no_attribute))
+        total_step = env.total_step
+
+        env.restore_state(state)
+        obs, _, done, _ = env.step(action, repeat=repeat, fast_forward=fast_forward)
+        assert env.last_ticks == ticks and env.total_step == total_step, message
+        assert np.array_equal(obs, expected_obs) and np.array_equal(done, expected_done), message
+        assert np.allclose(env.step_rewards(no_attribute), expected[1]), message
+        survived = ~(alive & ~env.alive)
+        assert np.allclose(env.step_rewards(full)[survived], expected[0][survived]), message
+        if np.all(done):
+            env.reset(seed=step)
@@ -0,0 +1,94 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+import eden
+from eden.reset_pool import ResetPool
+
+
+def random_actions(rng, n):
+    return np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1).astype(np.float32)
+
+
+def wait_for(pool, seed, timeout=10.0):
+    '''Wait until the pool has generated seed, failing if it never does.'''
+    deadline = time.time() + timeout
+    while seed not in pool:
+        assert time.time() < deadline, f"seed {seed} was never generated"
+        time.sleep(0.005)
+
+
+def world_bytes(config_dir, seeds):
+    '''EnvState.nbytes of the largest of the worlds of seeds.'''
+    env = eden.Eden(config_dir=config_dir)
+    sizes = []
+    for seed in seeds:
+        env.reset(seed)
+        sizes.append(env.clone_state().nbytes)
+    return max(sizes)
+
+
+@pytest.mark.parametrize('env_class', [eden.Eden, eden.MatEden])
+def test_pooled_world_matches_reset(config_dir, env_class):
+    pool = ResetPool(lambda: env_class(config_dir=config_dir), seeds=itertools.count())
+    try:
+        env = env_class(config_dir=config_dir)
+        env.reset_pool = pool
+        fresh = env_class(config_dir=config_dir)
+        rng = np.random.RandomState(0)
+        n = env.backend.agent_count
+        for seed in range(4):
+            wait_for(pool, seed)
+            assert np.array_equal(env.reset(seed), fresh.reset(seed)), f"seed {seed}"
+            assert env.total_step == 0
+            for step in range(5):
+                action = random_actions(rng, n) if env_class is eden.Eden else \
+                    np.stack([rng.randint(0, 2, n), rng.randint(0, env.obs_height, n), rng.randint(0, env.obs_width, n)],
+                             axis=1)
+                obs, reward, done, _ = env.step(action)
+                expected_obs, expected_reward, expected_done, _ = fresh.step(action)
+                assert np.array_equal(obs, expected_obs) and np.array_equal(reward, expected_reward), f"seed {seed}"
+                assert np.array_equal(done, expected_done), f"seed {seed}"
+        assert pool.hits == 4 and pool.misses == 0
+        # a seed the pool does not hold is generated by the env itself
+        assert np.array_equal(env.reset(1000), fresh.reset(1000))
+        assert pool.misses == 1
+    finally:
+        pool.close()
+
+
+def test_skipped_worlds_are_evicted(config_dir):
+    # room for six worlds, while an env resetting to seed += 4 skips three of every four
+    pool = ResetPool(lambda: eden.Eden(config_dir=config_dir), seeds=itertools.count(),
+                     max_bytes=6 * world_bytes(config_dir, range(45)))
+    try:
+        env = eden.Eden(config_dir=config_dir)
+        env.reset_pool = pool
+        for seed in range(0, 40, 4):
+            wait_for(pool, seed)
+            env.reset(seed)
+            assert pool.nbytes <= pool.max_bytes
+        assert pool.hits == 10
+    finally:
+        pool.close()
+
+
+def test_missed_reset_evicts_pending_worlds(config_dir):
+    pool = ResetPool(lambda: eden.Eden(config_dir=config_dir), seeds=itertools.count(),
+                     max_bytes=3 * world_bytes(config_dir, range(6)))
+    try:
+        wait_for(pool, 2)
+        time.sleep(0.05)
+        # full of worlds not handed out yet, generation waits
+        assert 3 not in pool
+        env = eden.Eden(config_dir=config_dir)
+        env.reset_pool = pool
+        env.reset(100)
+        assert pool.misses == 1
+        # those worlds were skipped, so they make room for the next ones
+        wait_for(pool, 5)
+        assert 0 not in pool and len(pool) == 3
+    finally:
+        pool.close()
@@ -0,0 +1,71 @@
+import numpy as np
+
+from eden.running_stats import RunningStats
+
+
+def samples(seed, n, size=7):
+    rng = np.random.RandomState(seed)
+    return (rng.rand(n, size) * 100 - 20).astype(np.float32)
+
+
+def test_update_matches_numpy():
+    x = samples(0, 500)
+    stats = RunningStats(x.shape[1])
+    for chunk in np.array_split(x, 9):
+        stats.update(chunk)
+    assert stats.count == len(x)
+    np.testing.assert_allclose(stats.mean, x.mean(axis=0), rtol=1e-5)
+    np.testing.assert_allclose(stats.var, x.var(axis=0), rtol=1e-4)
+
+
+def test_merge_matches_numpy():
+    x = samples(1, 1000)
+    parts = np.split(x, [130, 600, 610])
+    workers = []
+    for part in parts:
+        stats = RunningStats(x.shape[1])
+        for chunk in np.array_split(part, 4):
+            stats.update(chunk)
+        workers.append(stats.state())
+    merged = RunningStats(x.shape[1])
+    merged.merge(*workers)
+    assert merged.count == len(x)
+    np.testing.assert_allclose(merged.mean, x.mean(axis=0), rtol=1e-5)
+    np.testing.assert_allclose(merged.var, x.var(axis=0), rtol=1e-4)
+
+
+def test_remove_takes_back_a_merged_state():
+    x = samples(2, 900)
+    base = RunningStats(x.shape[1])
+    base.update(x[:300])
+    worker = RunningStats(x.shape[1])
+    worker.load_state(base.state())
+    worker.update(x[300:])
+    worker.remove(base.state())
+    assert worker.count == 600
+    np.testing.assert_allclose(worker.mean, x[300:].mean(axis=0), rtol=1e-4)
+    np.testing.assert_allclose(worker.var, x[300:].var(axis=0), rtol=1e-3)
+
+
+def test_frozen_and_save_load(tmp_path):
+    x = samples(3, 50)
+    stats = RunningStats(x.shape[1])
+    stats.update(x)
+    stats.frozen = True
+    stats.update(samples(4, 50))
+    assert stats.count == 50
+    path = str(tmp_path / 'stats.npz')
+    stats.save(path)
+    loaded = RunningStats(x.shape[1])
+    loaded.load(path)
+    assert loaded.count == stats.count
+    assert np.array_equal(loaded.mean, stats.mean) and np.array_equal(loaded.m2, stats.m2)
+
+
+def test_normalize_clips():
+    stats = RunningStats(3)
+    stats.update(np.array([[0, 0, 0], [2, 4, 6]], dtype=np.float32))
+    x = np.array([[1, 2, 300]], dtype=np.float32)
+    out = stats.normalize(x, 5.0)
+    assert out is x
+    np.testing.assert_allclose(x, [[0, 0, 5]], atol=1e-5)
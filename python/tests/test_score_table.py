@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+import eden
+from eden.score_table import ScoreTable
+from eden.wrappers.reward import Reward
+from rows import pad, random_steps
+
+MAP_SIZE = 40
+
+
+def random_score(backend_cfg, seed):
+    '''A score.json with random rewards, some for named targets.'''
+    rng = np.random.RandomState(seed)
+    names = list(backend_cfg.typeid2name.values())
+
+    def value():
+        return float(np.round(rng.uniform(-5, 5), 2))
+
+    score = {'Idle': {'default': value()}, 'Move': {'fail': value(), 'default': value()}}
+    for action in ('Attack', 'Equip'):
+        results = ('hit', 'kill') if action == 'Attack' else ('equip', 'undress')
+        entries = {'fail': value()}
+        entries.update({'default_' + result: value() for result in results})
+        for name in rng.choice(names, 6, replace=False):
+            entries.update({f'{name}_{result}': value() for result in results})
+            # "<target>_<result>" is only used when "<target>" is a key too
+            if rng.rand() < 0.5:
+                entries[name] = value()
+        score[action] = entries
+    for action in ('Collect', 'Discard', 'Synthesize', 'Pickup', 'Consume'):
+        entries = {'fail': value(), 'default': value()}
+        entries.update({name: value() for name in rng.choice(names, 6, replace=False)})
+        score[action] = entries
+    attributes = backend_cfg.attribute_dict[backend_cfg.agent_list[0]]
+    score['Attribute'] = {name: value() for name in rng.choice(attributes, 5, replace=False)}
+    score['Attribute']['default'] = value()
+    score['Dead'] = value()
+    score['ScorePoint'] = {f'{x}-{y}': value() for x, y in rng.randint(0, MAP_SIZE, size=(600, 2))}
+    return score
+
+
+def reference_info(backend_cfg, results, curr_rows, prev_rows, actions):
+    '''Eden._info as it was before ScoreTable, on variable length rows.'''
+    info = []
+    for agent_id, result in enumerate(results):
+        obs = curr_rows[agent_id]
+        if len(obs) < 1:
+            info.append({'position': 'None', 'action': 'None', 'attr_increment': {}, 'dead': True})
+            continue
+        position = f"{int(obs[4])}-{int(obs[5])}"
+        action_name = backend_cfg.action_list[int(result[0])]
+        target = 'None'
+        if action_name == 'Move':
+            target = f"({int(actions[agent_id][1])},{int(actions[agent_id][2])})"
+        elif action_name != 'Idle':
+            type_id = f"{backend_cfg.type_list[int(result[1])]}:{int(result[2])}"
+            if type_id in backend_cfg.typeid2name.keys():
+                target = backend_cfg.typeid2name[type_id]
+        result_int = int(result[3])
+        result_str = 'fail'
+        if action_name == 'Attack':
+            result_str = {1: 'hit', 2: 'kill'}.get(result_int, 'fail')
+        elif action_name == 'Equip':
+            result_str = {1: 'equip', 2: 'undress'}.get(result_int, 'fail')
+        elif action_name in ['Pickup', 'Discard', 'Synthesize']:
+            if result_int > 0:
+                result_str = str(result_int)
+        elif result_int > 0:
+            result_str = 'success'
+        name_int = int(result[4])
+        increment = {}
+        if prev_rows is not None:
+            for attribute_id in range(int(obs[6])):
+                delta = float(obs[7 + attribute_id]) - float(prev_rows[agent_id][7 + attribute_id])
+                if abs(delta) > 1e-4:
+                    increment[backend_cfg.attribute_dict[name_int][attribute_id]] = delta
+        info.append({'position': position, 'action': action_name, 'target': target, 'result': result_str,
+                     'attr_increment': increment, 'dead': False})
+    return info
+
+
+def reference_action_reward(score, action_result):
+    '''Eden._action_reward as it was before ScoreTable.'''
+    action = action_result['action']
+    if action not in score:
+        return 0
+    entries = score[action]
+    if action == 'Idle':
+        return entries['default']
+    if 'fail' in action_result['result']:
+        return entries['fail']
+    target, result = action_result['target'], action_result['result']
+    if action == 'Move':
+        return entries['default']
+    if action in ('Attack', 'Equip'):
+        return entries[target + '_' + result] if target in entries else entries['default_' + result]
+    reward = entries[target] if target in entries else entries['default']
+    if action in ('Discard', 'Synthesize', 'Pickup'):
+        reward *= float(result)
+    return reward
+
+
+def reference_rewards(score, info):
+    '''Eden._reward as it was before ScoreTable.'''
+    rewards = []
+    for action_result in info:
+        reward = reference_action_reward(score, action_result)
+        for key, delta in action_result['attr_increment'].items():
+            reward += delta * score['Attribute'].get(key, score['Attribute']['default'])
+        if action_result['dead'] is True:
+            reward += score['Dead']
+        if action_result['position'] in score['ScorePoint'].keys():
+            reward += score['ScorePoint'][action_result['position']]
+        rewards.append(reward)
+    return np.array(rewards, dtype=np.float64)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_rewards_match_reference(backend_cfg, config_dir, seed):
+    score = random_score(backend_cfg, seed)
+    table = ScoreTable(score, backend_cfg, MAP_SIZE, MAP_SIZE)
+    checked = 0
+    for step, (actions, prev_rows, rows, results) in enumerate(random_steps(config_dir, seed, 300)):
+        # the first step of every check has no previous observation
+        prev = None if step % 50 == 0 else prev_rows
+        width = max(len(row) for row in rows + prev_rows)
+        curr_obs, lengths = pad(rows, width)
+        prev_obs = None if prev is None else pad(prev_rows, width)[0]
+        expected = reference_rewards(score, reference_info(backend_cfg, results, rows, prev, actions))
+        got = table.rewards(results, curr_obs, prev_obs, lengths > 0)
+        np.testing.assert_allclose(got, expected, atol=1e-9, err_msg=f"step {step}")
+        checked += int((lengths > 0).sum())
+    assert checked > 0
+
+
+def test_targets(backend_cfg):
+    table = ScoreTable(random_score(backend_cfg, 0), backend_cfg, MAP_SIZE, MAP_SIZE)
+    results = np.zeros((3, 5), dtype=np.float32)
+    results[0, 1:3] = [backend_cfg.type_list.index('item'), backend_cfg.item_list[0]]
+    results[1, 1:3] = [-1, 2]
+    results[2, 1:3] = [backend_cfg.type_list.index('item'), 999]
+    names = [table.target_names[index] for index in table.targets(results)]
+    assert names == [backend_cfg.typeid2name[f'item:{backend_cfg.item_list[0]}'], 'None', 'None']
+
+
+@pytest.mark.parametrize('repeat', [1, 3])
+def test_reward_wrapper_matches_env(config_dir, repeat):
+    env = eden.Eden(config_dir=config_dir)
+    wrapper = Reward(env, config_dir=config_dir)
+    wrapper.reset(seed=repeat)
+    rng = np.random.RandomState(repeat)
+    n = env.backend.agent_count
+    for step in range(40):
+        action = np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1)
+        _, expected, done, _ = env.step(action, repeat=repeat)
+        assert np.array_equal(wrapper.reward(), expected), f"step {step}"
+        _, reward, done, _ = wrapper.step(action, repeat=repeat, fast_forward=True)
+        assert env.last_ticks <= repeat
+        assert np.array_equal(reward, env.step_rewards(env.score_table))
+        if np.all(done):
+            wrapper.reset(seed=step)
+    with pytest.warns(DeprecationWarning):
+        wrapper.reward([])
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import eden
+from eden.score_table import ScoreTable
+from eden.step_info import COLUMNS, StepInfo
+from rows import pad, random_steps
+from test_score_table import MAP_SIZE, random_score, reference_info
+
+
+def assert_same_dicts(got, expected, message=''):
+    assert len(got) == len(expected), message
+    for got_dict, expected_dict in zip(got, expected):
+        got_dict, expected_dict = dict(got_dict), dict(expected_dict)
+        got_increment, expected_increment = got_dict.pop('attr_increment'), expected_dict.pop('attr_increment')
+        assert got_dict == expected_dict, message
+        assert got_increment.keys() == expected_increment.keys(), message
+        for key, delta in expected_increment.items():
+            assert got_increment[key] == pytest.approx(delta, abs=1e-3), message
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_dicts_match_reference(backend_cfg, config_dir, seed):
+    table = ScoreTable(random_score(backend_cfg, seed), backend_cfg, MAP_SIZE, MAP_SIZE)
+    info = StepInfo(backend_cfg, table, 4)
+    for step, (actions, prev_rows, rows, results) in enumerate(random_steps(config_dir, seed, 200)):
+        prev = None if step % 50 == 0 else prev_rows
+        width = max(len(row) for row in rows + prev_rows)
+        curr_obs, lengths = pad(rows, width)
+        prev_obs = None if prev is None else pad(prev_rows, width)[0]
+        info.update(actions, results, curr_obs, prev_obs, lengths > 0)
+        expected = reference_info(backend_cfg, results, rows, prev, actions)
+        # indexing builds a single dict, to_dicts all of them
+        assert_same_dicts([info[agent_id] for agent_id in range(len(info))], expected, f"step {step}")
+        assert_same_dicts(info.to_dicts(), expected, f"step {step}")
+        assert info[-1] is info.to_dicts()[-1]
+
+
+def test_array_info_matches_dict_info(config_dir):
+    dict_env = eden.Eden(config_dir=config_dir)
+    array_env = eden.Eden(config_dir=config_dir, info_format='array')
+    dict_env.reset(seed=6)
+    array_env.reset(seed=6)
+    rng = np.random.RandomState(6)
+    n = dict_env.backend.agent_count
+    for step in range(60):
+        action = np.stack([rng.randint(0, 9, n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1)
+        _, _, _, expected = dict_env.step(action)
+        _, _, _, info = array_env.step(action)
+        assert isinstance(info, StepInfo)
+        assert_same_dicts(list(info), expected, f"step {step}")
+        columns = info.columns()
+        assert sorted(columns) == sorted(COLUMNS)
+        assert np.array_equal(columns['dead'], ~array_env.alive)
+        assert columns['action'] is not info.action
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import eden
+from eden.step_info import COLUMNS
+from eden.vec_env import EdenThreadVecEnv, EdenVecEnv
+
+NUM_ENVS = 3
+
+
+def random_actions(rng, n):
+    return np.stack([rng.choice([0, 8], n), rng.randint(0, 40, n), rng.randint(0, 40, n)], axis=1).astype(np.float32)
+
+
+def check_against_single_envs(vec_env, config_dir, steps=120, **env_kwargs):
+    '''Step vec_env alongside NUM_ENVS single envs reset the way vec envs reset theirs.'''
+    envs = [eden.Eden(config_dir=config_dir, **env_kwargs) for _ in range(NUM_ENVS)]
+    seeds = [10 * index for index in range(NUM_ENVS)]
+    obs = vec_env.reset(seeds)
+    for env, seed in zip(envs, seeds):
+        env.reset(seed)
+    rng = np.random.RandomState(0)
+    n = envs[0].backend.agent_count
+    terminal = 0
+    for step in range(steps):
+        actions = [random_actions(rng, n) for _ in range(NUM_ENVS)]
+        obs, rewards, dones, infos = vec_env.step(actions)
+        for index, env in enumerate(envs):
+            expected_obs, reward, done, info = env.step(actions[index])
+            assert np.array_equal(rewards[index], reward.astype(np.float32)), f"step {step}"
+            assert np.array_equal(dones[index], done)
+            if env_kwargs.get('info_format') == 'array':
+                assert sorted(infos[index]['info']) == sorted(COLUMNS)
+                for name in COLUMNS:
+                    assert np.array_equal(infos[index]['info'][name], getattr(info, name))
+            if np.all(done):
+                width = int(env.lengths.max(initial=0))
+                assert np.array_equal(infos[index]['terminal_observation'], expected_obs[:, :width])
+                seeds[index] += NUM_ENVS
+                expected_obs = env.reset(seeds[index])
+                terminal += 1
+            else:
+                assert 'terminal_observation' not in infos[index]
+            assert np.array_equal(vec_env.obs_lengths[index], env.lengths)
+            # eden-v0 pads the rows to max_obs_len, env.step returns them up to the longest
+            width = expected_obs.shape[1]
+            assert np.array_equal(obs[index, :, :width], expected_obs)
+            assert not obs[index, :, width:].any()
+    assert terminal > 0
+
+
+@pytest.mark.parametrize('info_format', ['dict', 'array'])
+def test_process_vec_env_matches_single_envs(config_dir, info_format):
+    vec_env = EdenVecEnv(config_dir=config_dir, num_envs=NUM_ENVS, start_method='fork', info_format=info_format)
+    try:
+        check_against_single_envs(vec_env, config_dir, info_format=info_format)
+    finally:
+        vec_env.close()
+
+
+def test_process_vec_env_reports_worker_errors(config_dir):
+    vec_env = EdenVecEnv(config_dir=config_dir, num_envs=1, start_method='fork')
+    try:
+        vec_env.reset()
+        with pytest.raises(RuntimeError):
+            vec_env.step([np.zeros((1, 3))])
+    finally:
+        vec_env.close()
+
+
+@pytest.mark.parametrize('info_format', ['dict', 'array'])
+def test_thread_vec_env_matches_single_envs(config_dir, info_format):
+    vec_env = EdenThreadVecEnv(config_dir=config_dir, num_envs=NUM_ENVS, num_threads=2, info_format=info_format)
+    try:
+        check_against_single_envs(vec_env, config_dir, info_format=info_format)
+    finally:
+        vec_env.close()
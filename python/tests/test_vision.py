@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from eden.vision import paste_diamond
+
+
+def reference_paste(out, source, x, y, vision, origin):
+    # the cell by cell loop the observation encoders used before paste_diamond
+    radius = int(np.floor(vision))
+    for i in range(x - radius, x + radius + 1):
+        for j in range(y - radius, y + radius + 1):
+            if abs(i - x) + abs(j - y) > radius:
+                continue
+            if not (0 <= i < source.shape[0] and 0 <= j < source.shape[1]):
+                continue
+            u, v = i - origin[0], j - origin[1]
+            if 0 <= u < out.shape[0] and 0 <= v < out.shape[1]:
+                out[u, v] = source[i, j]
+
+
+@pytest.mark.parametrize('x, y, vision, origin', [
+    (10, 10, 3, (0, 0)),
+    (10, 10, 3.7, (7, 8)),
+    (1, 2, 4, (-3, -3)),
+    (18, 19, 5, (14, 15)),
+    (10, 10, 6, (12, 2)),
+    (5, 5, 0, (5, 5)),
+    (5, 5, 2, (30, 30)),
+])
+def test_paste_diamond_with_origin(x, y, vision, origin):
+    rng = np.random.RandomState(0)
+    source = rng.randint(0, 100, size=(20, 20))
+    out = np.full((9, 7), -1)
+    expected = out.copy()
+    reference_paste(expected, source, x, y, vision, origin)
+    paste_diamond(out, source, x, y, vision, origin)
+    assert np.array_equal(out, expected)
+
+
+def test_paste_diamond_whole_map():
+    rng = np.random.RandomState(1)
+    source = rng.randint(0, 100, size=(12, 15))
+    for x, y, vision in [(0, 0, 5), (11, 14, 3), (6, 7, 20), (3, 3, -1)]:
+        out = np.zeros_like(source)
+        expected = out.copy()
+        reference_paste(expected, source, x, y, vision, (0, 0))
+        paste_diamond(out, source, x, y, vision)
+        assert np.array_equal(out, expected)